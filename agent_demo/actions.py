@@ -0,0 +1,85 @@
+"""
+The tool vocabulary shared by the planner, executor and adapters.
+
+Keeps the default parameters of each action in one place so that every
+consumer (per-step execution, the plan compiler, ...) fills in missing
+params the same way.
+"""
+
+from typing import Dict, Any, FrozenSet, Tuple
+
+# Default params for every action the executor understands
+DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "adjust_color_eq": {"brightness": 0.0, "contrast": 1.0, "saturation": 1.0, "temperature": "cool"},
+    "add_keyframe_zoom": {"from_scale": 1.0, "to_scale": 1.05, "duration_s": 5.0, "size": None},
+    "duck_music": {"music_file": None, "duck_db": 10, "attack_ms": 200, "release_ms": 800},
+    "slog3_to_rec709": {"contrast": 1.1, "saturation": 1.05, "brightness": 0.02},
+    "slog3_with_lut": {"lut_file": None, "intensity": 1.0},
+    "export_preview": {"quality": "medium"},
+}
+
+# The values a string param can take (anything else is rejected). An
+# adjust_color_eq temperature adds a cool or warm tint, or none ("neutral")
+CHOICES: Dict[str, Dict[str, Tuple[str, ...]]] = {
+    "adjust_color_eq": {"temperature": ("cool", "warm", "neutral")},
+}
+
+# Short labels used in output filenames (outputs/step_NN_<label>.mp4)
+LABELS: Dict[str, str] = {
+    "adjust_color_eq": "color",
+    "add_keyframe_zoom": "zoom",
+    "duck_music": "duck",
+    "slog3_to_rec709": "slog3_corrected",
+    "slog3_with_lut": "slog3_lut",
+    "export_preview": "preview",
+}
+
+# Actions that are a pure video filter chain on a single input (audio passes
+# through untouched), so several of them can share one decode/encode pass
+VIDEO_FILTER_ACTIONS = {"adjust_color_eq", "add_keyframe_zoom", "slog3_to_rec709", "slog3_with_lut"}
+
+# Pure per-pixel color transforms: a run of them can be baked into one 3D
+# LUT (see lut_bake.py). Zoom moves pixels around, so it can't.
+COLOR_ACTIONS = {"adjust_color_eq", "slog3_to_rec709", "slog3_with_lut"}
+
+# Streams each action reads and writes ("v" video, "a" audio). The graph
+# scheduler uses these to find steps that can render side by side.
+STREAMS: Dict[str, Tuple[FrozenSet[str], FrozenSet[str]]] = {
+    **{a: (frozenset("v"), frozenset("v")) for a in VIDEO_FILTER_ACTIONS},
+    "duck_music": (frozenset("a"), frozenset("a")),     # video is only stream-copied
+    "export_preview": (frozenset("va"), frozenset("va")),
+}
+
+# Params measured in pixels ("WxH" strings or plain numbers). Zoom factors,
+# contrast etc. are ratios and carry over between resolutions unchanged;
+# these have to be scaled when a plan made on a proxy is conformed.
+PIXEL_PARAMS: Dict[str, tuple] = {
+    "add_keyframe_zoom": ("size",),
+}
+
+
+def normalize_params(action: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Return params with the action's defaults filled in (None values count as missing).
+
+    Raises:
+        ValueError: A param has a value outside its CHOICES
+    """
+    merged = dict(DEFAULTS.get(action, {}))
+    merged.update({k: v for k, v in (params or {}).items() if v is not None})
+    for k, allowed in CHOICES.get(action, {}).items():
+        if merged.get(k) not in allowed:
+            raise ValueError(f"{action}: unknown {k} {merged.get(k)!r} (use one of {allowed})")
+    return merged
+
+
+def scale_pixel_params(action: str, params: Dict[str, Any], factor: float) -> Dict[str, Any]:
+    """Return params with the action's pixel-valued params multiplied by factor (sizes kept even)."""
+    scaled = dict(params or {})
+    for k in PIXEL_PARAMS.get(action, ()):
+        v = scaled.get(k)
+        if isinstance(v, str) and "x" in v:
+            w, h = (int(round(int(d) * factor / 2)) * 2 for d in v.split("x"))
+            scaled[k] = f"{w}x{h}"
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            scaled[k] = type(v)(v * factor)
+    return scaled
@@ -0,0 +1,393 @@
+"""
+Single-pass media analysis with pluggable analyzers.
+
+    python -m agent_demo.analysis clip.mp4 [--keyframes-only] [--analyzers scenes,loudness]
+
+analyze() decodes a clip once, scaled down to a small yuv420p frame
+(ANALYSIS_HEIGHT lines; optionally keyframes only) and hands every frame
+to each analyzer as NumPy luma/chroma planes. Analyzers can also hang
+their own ffmpeg filter off the same decode: loudness reads ebur128's log
+of the audio, thumbnails writes JPEGs from a split of the video. The
+built-in analyzers are:
+
+    scenes      shot cuts (luma histogram distance between frames)
+    histograms  per-shot luma / chroma histograms and exposure percentiles
+    loudness    EBU R128 integrated loudness, range, true peak, and
+                momentary loudness per second
+    thumbnails  a filmstrip and evenly spaced thumbnails
+
+The results are cached per file content as JSON in .analysis_cache/ (with
+the thumbnails next to them); load() returns the cached index without
+decoding anything, so the planner, the executor and the frontend can all
+ask for facts about the footage after one pass (chunked renders, for one,
+start their chunks at the shot cuts). Running further analyzers later adds
+them to the same index (a different decode height or keyframe mode starts
+a new one). Analyzers of a stream the clip lacks are recorded as None
+without decoding.
+"""
+
+import argparse, json, os, re, subprocess, sys, threading, time
+from typing import Any, Dict, List, Optional, Sequence
+from agent_demo import ffmpeg_adapter as fx
+from . import lut, media_index, metrics
+from .render_cache import file_fingerprint
+
+DEFAULT_CACHE_DIR = os.environ.get("VIBE_ANALYSIS_CACHE", ".analysis_cache")
+ANALYSIS_HEIGHT = 180
+INDEX_VERSION = 1  # bump when an analyzer's results change shape
+
+_SHOWINFO = re.compile(r"\bn:\s*(\d+)\s+pts:\s*\S+\s+pts_time:\s*([-\d.e]+)")
+_EBUR128_FRAME = re.compile(r"\bt:\s*([\d.]+)\s+TARGET:.*?\bM:\s*([-\d.inf]+)")
+_EBUR128_SUMMARY = {"integrated_lufs": re.compile(r"\bI:\s*([-\d.]+) LUFS"),
+                    "range_lu": re.compile(r"\bLRA:\s*([-\d.]+) LU\b"),
+                    "true_peak_dbfs": re.compile(r"\bPeak:\s*([-\d.inf]+) dBFS")}
+
+
+class Analyzer:
+    """
+    Base of the pluggable analyzers.
+
+    frame() gets every decoded frame (time in seconds, uint8 y / u / v
+    planes); log() gets every line ffmpeg logs, for analyzers that add a
+    filter (audio_filter, video_filter) and read what it reports. result()
+    is called once at the end with the results of the analyzers listed in
+    `needs`, and returns what goes into the index under `name`.
+    """
+    name = ""
+    needs: Sequence[str] = ()
+    audio_filter: Optional[str] = None  # filter over the first audio stream, its output discarded
+
+    def config(self) -> Dict[str, Any]:
+        """Settings that change the result (part of the cache key)."""
+        return {}
+
+    def video_filter(self, out_dir: str) -> Optional[tuple]:
+        """(filter chain, output args) applied to a split of the decoded video, if any."""
+        return None
+
+    def frame(self, t: float, y, u, v):
+        pass
+
+    def log(self, line: str):
+        pass
+
+    def result(self, results: Dict[str, Any]) -> Any:
+        return None
+
+
+class SceneCuts(Analyzer):
+    """Times where a new shot starts: the luma histogram jumps by more than `threshold`."""
+    name = "scenes"
+
+    def __init__(self, threshold: float = 0.35, min_shot_s: float = 0.5):
+        self.threshold, self.min_shot_s = threshold, min_shot_s
+        self.cuts: List[float] = []
+        self.scores: List[float] = []
+        self._prev = None
+
+    def config(self):
+        return {"threshold": self.threshold, "min_shot_s": self.min_shot_s}
+
+    def frame(self, t, y, u, v):
+        np = lut._np()
+        hist = np.bincount(y.ravel() >> 2, minlength=64) / y.size
+        if self._prev is not None:
+            score = float(np.abs(hist - self._prev).sum() / 2)  # 0 = same histogram, 1 = disjoint
+            self.scores.append(score)
+            if score > self.threshold and t - (self.cuts[-1] if self.cuts else 0.0) >= self.min_shot_s:
+                self.cuts.append(round(t, 3))
+        self._prev = hist
+
+    def result(self, results):
+        if self._prev is None:
+            return None  # no video
+        return {"cuts": self.cuts, "max_score": round(max(self.scores), 3) if self.scores else None}
+
+
+class ShotHistograms(Analyzer):
+    """Luma (32 bins) and chroma (16 bins each) histograms and exposure per shot."""
+    name = "histograms"
+    needs = ("scenes",)
+
+    def __init__(self):
+        self._frames = []  # (t, luma hist, u hist, v hist) per frame: small, grouped into shots at the end
+
+    def frame(self, t, y, u, v):
+        np = lut._np()
+        self._frames.append((t, np.bincount(y.ravel() >> 3, minlength=32),
+                             np.bincount(u.ravel() >> 4, minlength=16), np.bincount(v.ravel() >> 4, minlength=16)))
+
+    def result(self, results):
+        np = lut._np()
+        if not self._frames:
+            return []
+        cuts = (results.get("scenes") or {}).get("cuts", [])
+        bounds = [0.0] + cuts + [float("inf")]
+        shots = []
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            frames = [f for f in self._frames if start <= f[0] < end]
+            if not frames:
+                continue
+            luma, cb, cr = (np.sum([f[k] for f in frames], axis=0).astype("float64") for k in (1, 2, 3))
+            cdf = np.cumsum(luma) / luma.sum()
+            centers = np.arange(32) * 8 + 4
+            shots.append({
+                "start": start, "end": None if end == float("inf") else end, "frames": len(frames),
+                "luma": (luma / luma.sum()).round(4).tolist(),
+                "cb": (cb / cb.sum()).round(4).tolist(), "cr": (cr / cr.sum()).round(4).tolist(),
+                "luma_mean": round(float((luma * centers).sum() / luma.sum()), 1),
+                # Exposure: luma below which 5 / 50 / 95% of the pixels are
+                "luma_p5": int(centers[np.searchsorted(cdf, 0.05)]),
+                "luma_p50": int(centers[np.searchsorted(cdf, 0.50)]),
+                "luma_p95": int(centers[min(np.searchsorted(cdf, 0.95), 31)]),
+            })
+        return shots
+
+
+class Loudness(Analyzer):
+    """EBU R128 loudness of the first audio stream (ffmpeg's ebur128 filter)."""
+    name = "loudness"
+    audio_filter = "ebur128=peak=true:framelog=info"
+
+    def __init__(self):
+        self.summary: Dict[str, float] = {}
+        self.momentary: Dict[int, float] = {}  # second -> loudest momentary loudness in it
+
+    def log(self, line):
+        m = _EBUR128_FRAME.search(line)
+        if m:
+            second, value = int(float(m.group(1))), float(m.group(2))
+            if value != float("-inf"):  # digital silence: the second stays None
+                self.momentary[second] = max(self.momentary.get(second, value), value)
+            return
+        for key, pattern in _EBUR128_SUMMARY.items():
+            m = pattern.search(line)
+            if m and m.group(1) != "-inf":
+                self.summary[key] = float(m.group(1))  # the summary comes last, after the frame lines
+
+    def result(self, results):
+        if not self.summary and not self.momentary:
+            return None  # no audio
+        seconds = range(max(self.momentary) + 1) if self.momentary else ()
+        return dict(self.summary, momentary_lufs=[self.momentary.get(s) for s in seconds])
+
+
+class Thumbnails(Analyzer):
+    """`count` evenly spaced thumbnails, and all of them side by side as a filmstrip."""
+    name = "thumbnails"
+
+    def __init__(self, count: int = 10, height: int = 90, duration: float = None):
+        self.count, self.height, self.duration = count, height, duration
+        self.out_dir = None
+
+    def config(self):
+        return {"count": self.count, "height": self.height}
+
+    def video_filter(self, out_dir):
+        self.out_dir = out_dir
+        rate = self.count / max(self.duration or 1.0, 1e-3)
+        chain = (f"fps={rate:.6f}:start_time=0,scale=-2:{self.height},split=2[thumbs][strip];"
+                 f"[strip]tile={self.count}x1")
+        # The split's first branch goes to the numbered thumbnails, the tile to the filmstrip
+        outputs = [("[thumbs]", ["-fps_mode", "passthrough", "-q:v", "4", os.path.join(out_dir, "thumb_%03d.jpg")]),
+                   (None, ["-frames:v", "1", "-update", "1", "-q:v", "4", os.path.join(out_dir, "filmstrip.jpg")])]
+        return chain, outputs
+
+    def result(self, results):
+        if not self.out_dir:
+            return None
+        thumbs = sorted(f for f in os.listdir(self.out_dir) if f.startswith("thumb_"))
+        return {"filmstrip": os.path.join(self.out_dir, "filmstrip.jpg"),
+                "thumbnails": [os.path.join(self.out_dir, f) for f in thumbs]}
+
+
+ANALYZERS = {cls.name: cls for cls in (SceneCuts, ShotHistograms, Loudness, Thumbnails)}
+
+
+def _index_path(path: str, cache_dir: str) -> str:
+    return os.path.join(cache_dir, f"{file_fingerprint(path)[:32]}.json")
+
+
+def load(path: str, cache_dir: str = DEFAULT_CACHE_DIR) -> Optional[Dict[str, Any]]:
+    """The cached analysis index of path (None if it was never analyzed)."""
+    try:
+        with open(_index_path(path, cache_dir)) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return index if index.get("version") == INDEX_VERSION else None
+
+
+def analyze(path: str, analyzers: Sequence = None, height: int = ANALYSIS_HEIGHT, keyframes_only: bool = False,
+            cache_dir: str = DEFAULT_CACHE_DIR) -> Dict[str, Any]:
+    """
+    Run analyzers over path in one decode, reusing whatever is cached.
+
+    Args:
+        path: Clip to analyze
+        analyzers: Names from ANALYZERS or Analyzer instances (default: all)
+        height: Lines of the frames the analyzers see
+        keyframes_only: Decode only keyframes (much faster; shot cuts then
+            land on the keyframe after the real cut)
+        cache_dir: Where indexes are cached
+
+    Returns:
+        The index: {"version", "duration", "decode", "config", "results",
+        "errors"}, results keyed by analyzer name
+    """
+    info = media_index.probe(path)
+    if not info:
+        raise RuntimeError(f"could not probe {path}")
+    decode = {"height": height, "keyframes_only": keyframes_only}
+    wanted = [ANALYZERS[a](**({"duration": info.duration} if a == "thumbnails" else {}))
+              if isinstance(a, str) else a for a in (analyzers or list(ANALYZERS))]
+    for a in wanted:
+        if isinstance(a, Thumbnails) and a.duration is None:
+            a.duration = info.duration
+    index = load(path, cache_dir)
+    if not index or index["decode"] != decode:
+        index = {"version": INDEX_VERSION, "duration": info.duration, "decode": decode,
+                 "config": {}, "results": {}, "errors": []}
+    todo = [a for a in wanted if index["config"].get(a.name) != a.config() or a.name not in index["results"]]
+    # An analyzer that needs another gets it run along (or takes it from the index)
+    for a in list(todo):
+        for need in a.needs:
+            if need not in index["results"] and all(b.name != need for b in todo):
+                todo.insert(0, ANALYZERS[need]())
+    # Analyzers of a stream the clip doesn't have have nothing to look at
+    missing = [a for a in todo if not _streams(a) <= _clip_streams(info)]
+    for a in missing:
+        index["results"][a.name], index["config"][a.name] = None, a.config()
+    todo = [a for a in todo if a not in missing]
+    if not todo:
+        if missing:
+            _save(index, path, cache_dir)
+        return index
+
+    out_dir = os.path.join(cache_dir, f"{file_fingerprint(path)[:32]}")
+    os.makedirs(out_dir, exist_ok=True)
+    errors = _run(path, info, todo, height, keyframes_only, out_dir)
+    results = dict(index["results"])
+    for a in sorted(todo, key=lambda a: len(a.needs)):  # dependencies first
+        results[a.name] = a.result(results)
+        index["config"][a.name] = a.config()
+    index.update(results=results, errors=errors, analyzed=time.time())
+    _save(index, path, cache_dir)
+    return index
+
+
+def _save(index: Dict[str, Any], path: str, cache_dir: str):
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f"{_index_path(path, cache_dir)}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp, _index_path(path, cache_dir))
+
+
+# Streams an analyzer reads ("v", "a") and the streams a clip has
+def _streams(a: Analyzer) -> set:
+    video = type(a).frame is not Analyzer.frame or type(a).video_filter is not Analyzer.video_filter
+    return ({"v"} if video else set()) | ({"a"} if a.audio_filter else set())
+
+
+def _clip_streams(info: media_index.MediaInfo) -> set:
+    return ({"v"} if info.has_video else set()) | ({"a"} if info.has_audio else set())
+
+
+# The one decode: raw frames on stdout, analyzer filters on the side, ffmpeg's log on stderr
+def _run(path: str, info: media_index.MediaInfo, analyzers: List[Analyzer], height: int,
+         keyframes_only: bool, out_dir: str) -> List[str]:
+    np = lut._np()
+    video = [a for a in analyzers if type(a).frame is not Analyzer.frame] if info.has_video else []
+    side = [(a, a.video_filter(out_dir)) for a in analyzers] if info.has_video else []
+    side = [(a, f) for a, f in side if f]
+    audio = [a for a in analyzers if a.audio_filter] if info.has_audio else []
+    h = min(height, info.height or height) // 2 * 2
+    w = max(2, round((info.width or 16) * h / (info.height or 9) / 2) * 2)
+
+    graph, maps = [], []
+    if video or side:
+        branches = (["[raw]"] if video else []) + [f"[side{k}]" for k in range(len(side))]
+        split = f",split={len(branches)}{''.join(branches)}" if len(branches) > 1 else branches[0]
+        graph.append(f"[0:v:0]showinfo,scale={w}:{h},format=yuv420p{split}")
+        for k, (a, (chain, outputs)) in enumerate(side):
+            graph.append(f"[side{k}]{chain}[side{k}out]")
+            for label, args in outputs:
+                maps += ["-map", label or f"[side{k}out]"] + args
+    if audio:
+        graph.append(f"[0:a:0]{','.join(a.audio_filter for a in audio)}[aout]")
+        maps += ["-map", "[aout]", "-f", "null", os.devnull]
+    argv = [fx.FFMPEG, "-y", "-nostdin", "-nostats", "-loglevel", "level+info"]
+    argv += (["-skip_frame", "nokey"] if keyframes_only else []) + ["-i", path, "-filter_complex", ";".join(graph)]
+    if video:
+        argv += ["-map", "[raw]", "-fps_mode", "passthrough", "-f", "rawvideo", "pipe:1"]
+    argv += maps
+    argv = fx._thread_args(argv)
+
+    times: List[float] = []   # pts of the decoded frames, in decode order (from showinfo)
+    errors: List[str] = []
+    cond = threading.Condition()
+
+    def read_log(stream):
+        for raw in stream:
+            line = raw.decode("utf-8", "replace").rstrip()
+            m = _SHOWINFO.search(line)
+            if m:
+                with cond:
+                    times.append(float(m.group(2)))
+                    cond.notify_all()
+                continue
+            if "[error]" in line or "[fatal]" in line:
+                errors.append(line)
+            for a in audio:
+                a.log(line)
+        with cond:
+            times.append(None)  # end of log
+            cond.notify_all()
+
+    start = time.time()
+    proc = subprocess.Popen(argv, stdout=subprocess.PIPE if video else subprocess.DEVNULL, stderr=subprocess.PIPE)
+    reader = threading.Thread(target=read_log, args=(proc.stderr,), daemon=True)
+    reader.start()
+    n = 0
+    if video:
+        size = w * h * 3 // 2
+        with proc.stdout:
+            while True:
+                buf = proc.stdout.read(size)
+                if len(buf) < size:
+                    break
+                with cond:  # the frame's showinfo line comes before its bytes, but wait to be sure
+                    cond.wait_for(lambda: len(times) > n or (times and times[-1] is None))
+                    t = times[n] if len(times) > n and times[n] is not None else n / (info.fps or 30)
+                frame = np.frombuffer(buf, dtype=np.uint8)
+                y = frame[:w * h].reshape(h, w)
+                u = frame[w * h:w * h + size // 6].reshape(h // 2, w // 2)
+                v = frame[w * h + size // 6:].reshape(h // 2, w // 2)
+                for a in video:
+                    a.frame(t, y, u, v)
+                n += 1
+    code = proc.wait()
+    reader.join()
+    metrics.record(metrics.measure(argv, start, time.time(), f"frame={n}"))
+    if code != 0 and not errors:
+        errors.append(f"ffmpeg exited with {code}")
+    return errors
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Analyze a clip in one decode and cache the results")
+    ap.add_argument("input", help="Clip to analyze")
+    ap.add_argument("--analyzers", default=",".join(ANALYZERS), help=f"Comma-separated, from {', '.join(ANALYZERS)}")
+    ap.add_argument("--height", type=int, default=ANALYSIS_HEIGHT, help="Analysis frame height")
+    ap.add_argument("--keyframes-only", action="store_true", help="Decode only keyframes (fast, coarser cuts)")
+    ap.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Where analysis indexes are cached")
+    args = ap.parse_args()
+    start = time.time()
+    index = analyze(args.input, args.analyzers.split(","), args.height, args.keyframes_only, args.cache_dir)
+    print(json.dumps(index, indent=2))
+    print(f"analyzed in {time.time() - start:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Asyncio front end for the Executor.
+
+AsyncExecutor runs a plan without blocking the event loop: the Executor's
+logic (fusion, cache, checkpoints, proxies) runs in a worker thread, while
+every ffmpeg process it needs is spawned as an asyncio subprocess on the
+loop. ffmpeg is started with `-progress pipe:1`, and its key=value progress
+blocks are turned into ProgressEvents (frame, fps, speed, out_time, ETA,
+and for a streamed preview its playlist and the segments written so far).
+
+    run = AsyncExecutor("clip.mp4").start(plan)
+    async for ev in run.events():
+        print(ev.step_ids, ev.frame, ev.eta_s)
+    results = await run.results()
+
+run.cancel() kills the ffmpeg process in flight; the remaining steps are
+reported as cancelled. Chunk renders (workers > 1) run in a process pool
+and are not streamed.
+"""
+
+import asyncio, os, shlex
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional
+from .types import Plan, ExecResult
+from .actions import LABELS
+from .compiler import Stage
+from .executor import Executor
+from agent_demo import ffmpeg_adapter as fx
+
+
+# One progress report from a running ffmpeg process
+@dataclass
+class ProgressEvent:
+    step_ids: List[str]            # the step(s) being rendered (several for a fused stage)
+    frame: int = 0
+    fps: float = 0.0
+    speed: Optional[float] = None  # realtime factor, None until ffmpeg knows it
+    out_time_s: float = 0.0        # position of the output so far
+    eta_s: Optional[float] = None
+    done: bool = False             # last event of this ffmpeg process
+    manifest: Optional[str] = None # HLS playlist of a streamed preview (see Executor)
+    segments: int = 0              # segments it lists so far
+
+
+class AsyncRun:
+    """Handle for one plan execution started with AsyncExecutor.start()."""
+
+    def __init__(self, executor: "AsyncExecutor", plan: Plan):
+        self._executor = executor
+        self._queue: "asyncio.Queue[Optional[ProgressEvent]]" = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(executor._execute_async(plan, self._queue))
+
+    async def events(self) -> AsyncIterator[ProgressEvent]:
+        while True:
+            ev = await self._queue.get()
+            if ev is None:
+                return
+            yield ev
+
+    async def results(self) -> List[ExecResult]:
+        return await self._task
+
+    def cancel(self):
+        self._executor.cancel()
+
+
+class AsyncExecutor(Executor):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cancelled = False
+        self._procs = set()
+        self._step_ids: List[str] = []
+        self._expected_s: Optional[float] = None
+        self._manifest: Optional[str] = None
+
+    def start(self, plan: Plan) -> AsyncRun:
+        """Start executing plan on the running loop (call from a coroutine)."""
+        return AsyncRun(self, plan)
+
+    async def execute_async(self, plan: Plan) -> List[ExecResult]:
+        """Execute plan and return its results, ignoring progress."""
+        return await self.start(plan).results()
+
+    def cancel(self):
+        self._cancelled = True
+        for proc in list(self._procs):
+            if proc.returncode is None:
+                proc.kill()
+
+    async def _execute_async(self, plan: Plan, queue: asyncio.Queue) -> List[ExecResult]:
+        loop = asyncio.get_running_loop()
+        self._cancelled = False
+
+        # Runs in the worker thread: hand each command to the loop and wait for it
+        def runner(cmd: str, capture):
+            return asyncio.run_coroutine_threadsafe(self._spawn(cmd, queue, capture), loop).result()
+
+        def work():
+            fx._local.runner = runner
+            try:
+                return self.execute(plan)
+            finally:
+                fx._local.runner = None
+
+        try:
+            return await asyncio.to_thread(work)
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+        finally:
+            queue.put_nowait(None)
+
+    # Stage hook: stop after a cancel and remember what is being rendered for the events
+    def _run_stage(self, stage: Stage, src: str) -> List[ExecResult]:
+        if self._cancelled:
+            return [ExecResult(step_id=f"S{i}", status="error", outputs={}, error="cancelled")
+                    for i, _ in stage.steps]
+        self._step_ids = [f"S{i}" for i, _ in stage.steps]
+        self._expected_s = fx.segment_seconds(self.segment) if self.segment else fx.probe_duration(src)
+        last_i, last = stage.steps[-1]
+        self._manifest = None
+        if self._stream(last.action, last.params) and not self._renditions(last.action, last.params, ""):
+            out = self._outfile(LABELS[last.action], last_i, self._target(stage.final)[1])
+            self._manifest = fx.stream_manifest(out)
+        results = super()._run_stage(stage, src)
+        if self._cancelled:
+            for r in results:
+                if r.status != "ok":
+                    r.error = "cancelled"
+        return results
+
+    async def _spawn(self, cmd: str, queue: asyncio.Queue, capture) -> int:
+        argv = shlex.split(cmd)
+        is_ffmpeg = os.path.basename(argv[0]) == os.path.basename(fx.FFMPEG)
+        if self._cancelled:
+            capture.feed("cancelled\n")
+            return -1
+        if is_ffmpeg:
+            argv[1:1] = ["-progress", "pipe:1", "-nostats"]
+        proc = await asyncio.create_subprocess_exec(*argv, stdout=asyncio.subprocess.PIPE,
+                                                    stderr=asyncio.subprocess.PIPE)
+        self._procs.add(proc)
+
+        async def drain_stderr():
+            async for raw in proc.stderr:
+                capture.feed(raw.decode(errors="replace"))
+
+        try:
+            stderr_task = asyncio.ensure_future(drain_stderr())
+            block, last = {}, {}
+            async for raw in proc.stdout:
+                line = raw.decode(errors="replace")
+                key, sep, value = line.strip().partition("=")
+                if not (is_ffmpeg and sep):
+                    capture.feed(line)
+                    continue
+                block[key] = value
+                if key == "progress":
+                    queue.put_nowait(self._event(block))
+                    last, block = block, {}
+            code = await proc.wait()
+            await stderr_task
+            if last:  # -nostats: restore the final stats line for metrics.parse_progress()
+                capture.feed(f"\nframe={last.get('frame', '')} fps={last.get('fps', '')} "
+                             f"speed={last.get('speed', '')}\n")
+            return code
+        finally:
+            self._procs.discard(proc)
+
+    def _event(self, block: dict) -> ProgressEvent:
+        def num(key, cast=float, default=0):
+            try:
+                return cast(block.get(key, "").strip().rstrip("x"))
+            except ValueError:
+                return default
+        out_time_s = num("out_time_us", int, 0) / 1e6
+        speed = num("speed", float, None)
+        eta = None
+        if self._expected_s and speed:
+            eta = max(0.0, (self._expected_s - out_time_s) / speed)
+        segments = fx.stream_progress(self._manifest)[0] if self._manifest else 0
+        return ProgressEvent(step_ids=list(self._step_ids), frame=num("frame", int, 0),
+                             fps=num("fps", float, 0.0), speed=speed, out_time_s=out_time_s,
+                             eta_s=eta, done=block.get("progress") == "end",
+                             manifest=self._manifest, segments=segments)
@@ -0,0 +1,167 @@
+"""
+Batch mode: run one plan over a whole directory (or glob) of clips.
+
+    python -m agent_demo.batch --inputs "cards/A001/*.MP4" \
+        --goal "cold cinematic look" --jobs 4
+
+Clips are scheduled largest-first on a pool of worker processes, so the
+long clips start early and the short ones fill the gaps at the end. Every
+clip renders into its own directory under --out-dir, and a failing clip
+only fails itself. batch_report.json is rewritten after each clip, so an
+interrupted batch can simply be started again: finished clips are skipped
+and half-finished ones resume from their step checkpoints.
+"""
+
+import argparse, glob, hashlib, json, os, tempfile, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Any, List
+from agent_demo.types import TaskSpec, Plan
+from agent_demo.planner_stub import plan_from_prompt
+from agent_demo.executor import Executor
+from agent_demo.render_cache import RenderCache
+from agent_demo.verifier import verify
+from agent_demo.optimizer import optimize
+from agent_demo import media_index, metrics
+
+REPORT = "batch_report.json"
+VIDEO_EXTS = {".mp4", ".mov", ".mxf", ".mkv", ".avi", ".m4v"}
+
+
+def find_clips(inputs: str) -> List[str]:
+    """Video files in a directory, or the files matching a glob pattern."""
+    if os.path.isdir(inputs):
+        paths = [os.path.join(inputs, f) for f in os.listdir(inputs)]
+    else:
+        paths = glob.glob(inputs, recursive=True)
+    return [p for p in paths if os.path.isfile(p) and os.path.splitext(p)[1].lower() in VIDEO_EXTS]
+
+
+# Per-clip output dir: the stem keeps it readable, the path hash keeps
+# same-named clips from different cards apart
+def clip_out_dir(out_dir: str, clip: str) -> str:
+    stem = os.path.splitext(os.path.basename(clip))[0]
+    tag = hashlib.sha1(os.path.abspath(clip).encode()).hexdigest()[:8]
+    return os.path.join(out_dir, f"{stem}_{tag}")
+
+
+def load_report(out_dir: str) -> Dict[str, Any]:
+    path = os.path.join(out_dir, REPORT)
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {"clips": {}}
+
+
+def save_report(out_dir: str, report: Dict[str, Any]):
+    fd, tmp = tempfile.mkstemp(dir=out_dir, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp, os.path.join(out_dir, REPORT))
+
+
+# Worker: runs in a pool process, so it takes and returns plain data only
+def _run_clip(job: Dict[str, Any]) -> Dict[str, Any]:
+    started = time.time()
+    record = {"input": job["input"], "out_dir": job["out_dir"], "started": started}
+    try:
+        if job["plan"] is not None:
+            plan = Plan.from_dict(job["plan"])
+        else:
+            task = TaskSpec(goal=job["goal"],
+                            targets={"input": job["input"], "segment": job["segment"], "music": job["music"]})
+            plan = plan_from_prompt(task)
+        cache = RenderCache(job["cache_dir"]) if job["cache_dir"] else None
+        ex = Executor(input_file=job["input"], segment=job["segment"], music=job["music"],
+                      out_dir=job["out_dir"], cache=cache, profile=job["profile"], threads=job["threads"])
+        if job.get("optimize", True):
+            # Per clip: what can be remuxed depends on the clip's codec
+            plan, record["optimizer"] = optimize(plan, media_index.probe(job["input"]), segment=job["segment"],
+                                                 fuse=ex.fuse, exclude=ex.native_actions)
+        results = ex.execute(plan)
+        ok, issues = verify(results)
+        record.update(status="ok" if ok else "error",
+                      steps=[{"step_id": r.step_id, "status": r.status, "file": r.outputs.get("file"),
+                              "error": r.error, "metrics": metrics.public(r.metrics)} for r in results],
+                      issues=[list(i) for i in issues])
+    except Exception as e:  # isolate the failure to this clip
+        record.update(status="error", issues=[["batch", f"{type(e).__name__}: {e}"]])
+    record["seconds"] = round(time.time() - started, 3)
+    return record
+
+
+def run_batch(clips: List[str], out_dir: str, goal: str = None, plan: Plan = None,
+              segment: str = None, music: str = None, jobs: int = 2,
+              cache_dir: str = ".render_cache", force: bool = False, profile: str = "review",
+              threads: int = None, optimize: bool = True) -> Dict[str, Any]:
+    os.makedirs(out_dir, exist_ok=True)
+    report = load_report(out_dir)
+    done = {c for c, r in report["clips"].items() if r.get("status") == "ok"}
+    todo = [c for c in clips if force or os.path.abspath(c) not in done]
+    # Largest first: a long clip started last would otherwise set the makespan
+    todo.sort(key=lambda c: os.path.getsize(c), reverse=True)
+
+    # Clips render side by side, so each one gets an equal share of the cores
+    share = max(1, (threads or os.cpu_count() or 1) // jobs)
+    batch_started = time.time()
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {}
+        for clip in todo:
+            job = {"input": clip, "out_dir": clip_out_dir(out_dir, clip), "goal": goal,
+                   "plan": plan.to_dict() if plan else None, "segment": segment,
+                   "music": music, "cache_dir": cache_dir, "profile": profile, "threads": share, "optimize": optimize}
+            futures[pool.submit(_run_clip, job)] = clip
+        for fut in as_completed(futures):
+            clip = futures[fut]
+            try:
+                record = fut.result()
+            except Exception as e:  # the worker process itself died
+                record = {"input": clip, "status": "error", "issues": [["batch", f"{type(e).__name__}: {e}"]]}
+            report["clips"][os.path.abspath(clip)] = record
+            save_report(out_dir, report)
+            print(f"[{record['status']}] {clip} ({record.get('seconds', 0):.1f}s)")
+
+    statuses = [r.get("status") for r in report["clips"].values()]
+    report["summary"] = {"clips": len(statuses), "ok": statuses.count("ok"),
+                         "failed": len(statuses) - statuses.count("ok"),
+                         "skipped": len(clips) - len(todo),
+                         "wall_seconds": round(time.time() - batch_started, 3)}
+    save_report(out_dir, report)
+    return report
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run one edit plan over many clips")
+    ap.add_argument("--inputs", required=True, help="Directory of clips or a glob such as 'card/*.MP4'")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--goal", help="Natural language goal, planned once per clip")
+    src.add_argument("--plan", help="Serialized plan JSON ({\"steps\": [...]})")
+    ap.add_argument("--segment", default=None, help="Time range applied to every clip")
+    ap.add_argument("--music", default=None, help="Optional background music file")
+    ap.add_argument("--out-dir", default="outputs/batch", help="Root for per-clip outputs and the report")
+    ap.add_argument("--jobs", type=int, default=2, help="Clips rendered concurrently")
+    ap.add_argument("--cache-dir", default=".render_cache", help="Shared render cache ('' to disable)")
+    ap.add_argument("--profile", choices=["draft", "review", "master"], default="review",
+                    help="Render profile: encoder settings of final and intermediate renders")
+    ap.add_argument("--threads", type=int, default=None, help="CPU threads for the whole batch (default: all cores)")
+    ap.add_argument("--force", action="store_true", help="Re-run clips that already succeeded")
+    ap.add_argument("--no-optimize", action="store_true", help="Run the plan as planned (see optimizer.py)")
+    args = ap.parse_args()
+
+    clips = find_clips(args.inputs)
+    if not clips:
+        ap.error(f"no video files found for {args.inputs}")
+    plan = None
+    if args.plan:
+        with open(args.plan) as f:
+            plan = Plan.from_dict(json.load(f))
+    report = run_batch(clips, args.out_dir, goal=args.goal, plan=plan, segment=args.segment,
+                       music=args.music, jobs=args.jobs, cache_dir=args.cache_dir or None,
+                       force=args.force, profile=args.profile, threads=args.threads,
+                       optimize=not args.no_optimize)
+    s = report["summary"]
+    print(f"\n{s['ok']}/{s['clips']} clips ok, {s['skipped']} skipped, {s['wall_seconds']:.1f}s "
+          f"→ {os.path.join(args.out_dir, REPORT)}")
+
+
+if __name__ == "__main__":
+    main()
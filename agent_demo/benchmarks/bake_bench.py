@@ -0,0 +1,55 @@
+"""
+Benchmark: a color chain rendered filter by filter vs baked into one 3D LUT
+(lut_bake.py).
+
+    python -m agent_demo.benchmarks.bake_bench --sizes 1920x1080,3840x2160 --seconds 3
+
+For each frame size a synthetic testsrc2 clip is rendered through the chain
+(slog3_to_rec709 + a warm adjust_color_eq by default) both ways with the
+same fast encoder. The one-off bake time is reported separately, and the
+accuracy of the baked render is measured as CIEDE2000 against the unbaked one.
+"""
+
+import argparse, os, tempfile
+from agent_demo import ffmpeg_adapter as fx
+from agent_demo import lut_bake
+from agent_demo.benchmarks.lut_bench import BENCH_VENC, make_clip
+from agent_demo.benchmarks.suite import timed
+
+CHAIN = [("slog3_to_rec709", {}),
+         ("adjust_color_eq", {"brightness": 0.02, "contrast": 1.08, "saturation": 1.1, "temperature": "warm"})]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark baked color LUTs against the filter chain")
+    ap.add_argument("--sizes", default="1920x1080,3840x2160", help="Comma-separated test clip frame sizes")
+    ap.add_argument("--seconds", type=float, default=3.0, help="Test clip length")
+    ap.add_argument("--lattice", type=int, default=lut_bake.DEFAULT_SIZE, help="Baked LUT points per axis")
+    args = ap.parse_args()
+
+    frames = int(args.seconds * 30)
+    with tempfile.TemporaryDirectory() as work:
+        cache_dir = os.path.join(work, "luts")
+        for size in args.sizes.split(","):
+            clip = os.path.join(work, f"clip_{size}.mp4")
+            make_clip(clip, size, args.seconds)
+            chain_s, chain = timed(lambda: fx.render_fused(clip, os.path.join(work, "chain.mp4"), CHAIN,
+                                                            venc=BENCH_VENC))
+            bake_s, cube = timed(lambda: lut_bake.bake(CHAIN, args.lattice, cache_dir))
+            baked_s, baked = timed(lambda: fx.render_fused(clip, os.path.join(work, "baked.mp4"), CHAIN,
+                                                            venc=BENCH_VENC, bake=args.lattice,
+                                                            bake_dir=cache_dir))
+            if chain["code"] != 0 or baked["code"] != 0 or not cube:
+                print(f"{size}: render failed")
+                continue
+            de = lut_bake.measure_delta_e(clip, CHAIN, args.lattice, cache_dir=cache_dir)
+            print(f"{size} ({frames} frames, {args.lattice}^3 lattice)")
+            print(f"  filter chain  {chain_s:7.2f}s {frames / chain_s:8.1f} fps")
+            print(f"  baked lut3d   {baked_s:7.2f}s {frames / baked_s:8.1f} fps  "
+                  f"{chain_s / baked_s:5.2f}x  (+{bake_s:.2f}s one-off bake)")
+            if de:
+                print(f"  CIEDE2000     max {de['max']:.2f}  p99 {de['p99']:.2f}  mean {de['mean']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
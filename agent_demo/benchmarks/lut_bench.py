@@ -0,0 +1,83 @@
+"""
+Benchmark: the native NumPy LUT engine (lut.py) against ffmpeg's lut3d,
+which needs an extra split/blend graph when intensity < 1.
+
+    python -m agent_demo.benchmarks.lut_bench --size 1920x1080 --seconds 5 --intensity 0.7
+
+Every path renders the same synthetic testsrc2 clip with the same fast
+encoder, so the differences come from the LUT stage. A plain decode+encode
+pass is timed as the floor, and the NumPy interpolation is also timed on
+in-memory frames (no ffmpeg at all).
+"""
+
+import argparse, os, tempfile
+from agent_demo import ffmpeg_adapter as fx
+from agent_demo import lut
+from agent_demo.benchmarks.suite import timed
+
+BENCH_VENC = "-c:v libx264 -preset ultrafast -crf 18"
+
+
+def make_clip(path: str, size: str, seconds: float, fps: int = 30):
+    cmd = (f'{fx.FFMPEG} -y -f lavfi -i testsrc2=size={size}:rate={fps}:duration={seconds} '
+           f'-c:v libx264 -preset ultrafast -pix_fmt yuv420p "{path}"')
+    code, log = fx._run(cmd)
+    if code != 0:
+        raise RuntimeError(f"could not generate the test clip:\n{log}")
+
+
+# A warm, contrasty look with cross-channel terms, so it's a real 3D LUT
+def make_cube(path: str, size: int = 33):
+    np = lut._np()
+    r, g, b = np.moveaxis(lut.identity(size).table, -1, 0)
+    luma = 0.2126 * r + 0.7152 * g + 0.0722 * b
+    s_curve = lambda v: v * v * (3 - 2 * v)
+    table = np.stack([s_curve(0.85 * r + 0.15 * luma) * 1.04,
+                      s_curve(0.9 * g + 0.1 * luma),
+                      s_curve(0.8 * b + 0.2 * luma) * 0.93], axis=-1)
+    lut.write_cube(path, lut.Lut3D(size=size, table=np.clip(table, 0, 1).astype(np.float32), title="bench"))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the native LUT engine against ffmpeg lut3d")
+    ap.add_argument("--size", default="1920x1080", help="Test clip frame size")
+    ap.add_argument("--seconds", type=float, default=5.0, help="Test clip length")
+    ap.add_argument("--intensity", type=float, default=0.7, help="LUT intensity (< 1 adds ffmpeg's blend)")
+    ap.add_argument("--lut-size", type=int, default=33, help="Grid points per axis of the test LUT")
+    args = ap.parse_args()
+
+    np = lut._np()
+    w, h = (int(v) for v in args.size.split("x"))
+    frames = int(args.seconds * 30)
+    with tempfile.TemporaryDirectory() as work:
+        clip, cube = os.path.join(work, "clip.mp4"), os.path.join(work, "look.cube")
+        make_clip(clip, args.size, args.seconds)
+        make_cube(cube, args.lut_size)
+        out = lambda name: os.path.join(work, f"{name}.mp4")
+
+        rows = [("decode+encode only", *timed(lambda: fx.export_preview(clip, out("copy"), venc=BENCH_VENC)))]
+        ffmpeg_name = "ffmpeg lut3d" + (" + blend" if args.intensity < 1.0 else "")
+        rows.append((ffmpeg_name, *timed(lambda: fx.slog3_with_lut(
+            clip, out("ffmpeg"), cube, intensity=args.intensity, venc=BENCH_VENC))))
+        for interp in lut.INTERPOLATIONS:
+            lut._load.cache_clear()  # include parsing and pre-blending in the run
+            rows.append((f"numpy {interp}", *timed(lambda: lut.apply_lut_file(
+                clip, out(interp), cube, intensity=args.intensity, interp=interp, venc=BENCH_VENC))))
+
+        print(f"{frames} frames at {args.size}, {args.lut_size}^3 LUT, intensity {args.intensity}\n")
+        ffmpeg_s = rows[1][1]
+        for name, secs, meta in rows:
+            status = "" if meta["code"] == 0 else "  (failed)"
+            print(f"{name:<22} {secs:7.2f}s {frames / secs:8.1f} fps  {ffmpeg_s / secs:5.2f}x{status}")
+
+        # Interpolation alone, on frames already in memory
+        table = lut.load_lut(cube, args.intensity)
+        frame = np.random.default_rng(0).integers(0, 256, (h, w, 3), dtype=np.uint8)
+        print()
+        for interp in lut.INTERPOLATIONS:
+            secs, _ = timed(lambda: [lut.apply_lut(frame, table, interp) for _ in range(10)])
+            print(f"apply_lut {interp:<12} {secs / 10 * 1000:7.1f} ms/frame {10 / secs:8.1f} fps")
+
+
+if __name__ == "__main__":
+    main()
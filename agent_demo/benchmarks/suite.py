@@ -0,0 +1,218 @@
+"""
+Benchmark suite: every ffmpeg_adapter action and whole planner plans on
+synthetic media, with a baseline comparison.
+
+    python -m agent_demo.benchmarks.suite run --sizes 640x360,1920x1080 --seconds 2,5 --out bench.json
+    python -m agent_demo.benchmarks.suite compare bench.json baseline.json --tolerance 0.15
+
+The clips are generated by ffmpeg alone (testsrc2 video, a sine tone as the
+dialogue track, a second tone as the music bed) and the test LUT in pure
+Python, so the suite runs offline with nothing but ffmpeg installed. Every
+case is run --repeat times and the fastest run is kept; fps and the realtime
+factor are relative to the clip, peak memory is the largest ffmpeg process
+(see metrics.py).
+
+compare matches cases by name and flags a regression when a case got slower
+or bigger in memory by more than the tolerance, or stopped working; it exits
+non-zero if anything regressed.
+"""
+
+import argparse, json, os, platform, sys, tempfile, time
+from typing import Any, Callable, Dict, List
+from agent_demo import ffmpeg_adapter as fx
+from agent_demo import metrics
+from agent_demo.executor import Executor
+from agent_demo.planner_stub import plan_from_prompt
+from agent_demo.types import TaskSpec
+
+FPS = 30
+# Goals whose plans are timed end to end
+GOALS = ["cold cinematic look",
+         "cold cinematic look with slow zoom",
+         "cinematic slow zoom and duck the music under dialogue"]
+
+
+def make_media(work: str, size: str, seconds: float) -> Dict[str, str]:
+    """Generate the test clip (video + dialogue tone) and the music bed."""
+    clip = os.path.join(work, f"clip_{size}_{seconds:g}s.mp4")
+    music = os.path.join(work, f"music_{seconds:g}s.m4a")
+    cmds = [(clip, f'{fx.FFMPEG} -y -f lavfi -i testsrc2=size={size}:rate={FPS}:duration={seconds} '
+                   f'-f lavfi -i sine=frequency=440:sample_rate=48000:duration={seconds} '
+                   f'-c:v libx264 -preset ultrafast -pix_fmt yuv420p -g {FPS} -c:a aac "{clip}"'),
+            (music, f'{fx.FFMPEG} -y -f lavfi -i sine=frequency=220:sample_rate=48000:duration={seconds} '
+                    f'-c:a aac "{music}"')]
+    for path, cmd in cmds:
+        if not os.path.exists(path):
+            code, log = fx._run(cmd)
+            if code != 0:
+                raise RuntimeError(f"could not generate {path}:\n{log}")
+    return {"clip": clip, "music": music}
+
+
+# A warm 17^3 look, written without numpy
+def make_cube(path: str, size: int = 17):
+    lines = ["TITLE \"bench\"", f"LUT_3D_SIZE {size}"]
+    for b in range(size):
+        for g in range(size):
+            for r in range(size):
+                v = [c / (size - 1) for c in (r, g, b)]
+                lines.append(f"{min(1.0, v[0] * 1.05):.6f} {v[1]:.6f} {v[2] * 0.93:.6f}")
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def action_cases(media: Dict[str, str], cube: str, out: Callable[[str], str]) -> Dict[str, Callable]:
+    """One call per adapter action, with the params the planner would use."""
+    clip = media["clip"]
+    cold = {"brightness": 0.0, "contrast": 1.15, "saturation": 0.85, "temperature": "cool"}
+    zoom = {"from_scale": 1.0, "to_scale": 1.08, "duration_s": 5.0}
+    return {
+        "adjust_color_eq": lambda: fx.adjust_color_eq(clip, out("color"), **cold),
+        "add_keyframe_zoom": lambda: fx.add_keyframe_zoom(clip, out("zoom"), **zoom),
+        "duck_music": lambda: fx.duck_music(clip, media["music"], out("duck"), 10, 200, 800),
+        "slog3_to_rec709": lambda: fx.slog3_to_rec709(clip, out("slog3")),
+        "slog3_with_lut": lambda: fx.slog3_with_lut(clip, out("lut"), cube, intensity=0.7),
+        "export_preview": lambda: fx.export_preview(clip, out("preview")),
+        "make_proxy": lambda: fx.make_proxy(clip, out("proxy")),
+        "render_fused": lambda: fx.render_fused(clip, out("fused"), [("adjust_color_eq", cold),
+                                                                     ("add_keyframe_zoom", zoom),
+                                                                     ("export_preview", {})]),
+    }
+
+
+def plan_case(media: Dict[str, str], goal: str, out_dir: str) -> Callable:
+    def run():
+        task = TaskSpec(goal=goal, targets={"input": media["clip"], "segment": None, "music": media["music"]})
+        results = Executor(media["clip"], music=media["music"], out_dir=out_dir, resume=False).execute(
+            plan_from_prompt(task))
+        failed = [r for r in results if r.status != "ok"]
+        return {"code": 1 if failed else 0, "log": failed[0].error if failed else ""}
+    return run
+
+
+def timed(fn: Callable):
+    """(seconds, result) of one call of fn; the one-off timer the other benchmarks share."""
+    start = time.perf_counter()
+    meta = fn()
+    return time.perf_counter() - start, meta
+
+
+def measure_case(fn: Callable, repeat: int, frames: int, seconds: float) -> Dict[str, Any]:
+    """Fastest of `repeat` runs of fn, with its ffmpeg resource use."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with metrics.collect() as runs:
+            meta = fn()
+        wall = time.perf_counter() - start
+        if meta["code"] != 0:
+            return {"status": "error", "error": (meta.get("log") or "").strip().splitlines()[-1:]}
+        if best is None or wall < best[0]:
+            best = (wall, runs)
+    wall, runs = best
+    rss = [r["peak_rss_mb"] for r in runs if r.get("peak_rss_mb") is not None]
+    cpu = sum((r.get("cpu_user_s") or 0) + (r.get("cpu_sys_s") or 0) for r in runs)
+    return {"status": "ok", "wall_s": round(wall, 3), "fps": round(frames / wall, 2),
+            "realtime": round(seconds / wall, 3), "peak_rss_mb": max(rss) if rss else None,
+            "cpu_s": round(cpu, 3), "commands": len(runs)}
+
+
+def run_suite(sizes: List[str], durations: List[float], repeat: int = 3,
+              only: List[str] = None) -> Dict[str, Any]:
+    """Run every case on every clip and return the results document."""
+    results = []
+    with tempfile.TemporaryDirectory() as work:
+        cube = os.path.join(work, "bench.cube")
+        make_cube(cube)
+        for size in sizes:
+            for seconds in durations:
+                media = make_media(work, size, seconds)
+                out = lambda name: os.path.join(work, f"{name}.mp4")
+                cases = {f"action/{name}": fn for name, fn in action_cases(media, cube, out).items()}
+                cases.update({f"plan/{goal}": plan_case(media, goal, os.path.join(work, "plan"))
+                              for goal in GOALS})
+                for name, fn in cases.items():
+                    if only and not any(o in name for o in only):
+                        continue
+                    row = {"case": f"{name} @ {size} {seconds:g}s", "size": size, "seconds": seconds}
+                    row.update(measure_case(fn, repeat, int(seconds * FPS), seconds))
+                    results.append(row)
+                    print(_line(row))
+    return {"meta": {"ffmpeg": fx.ffmpeg_version(), "adapter": fx.ADAPTER_VERSION,
+                     "python": platform.python_version(), "platform": platform.platform(),
+                     "cpus": os.cpu_count(), "repeat": repeat, "created": time.strftime("%Y-%m-%dT%H:%M:%S")},
+            "results": results}
+
+
+def _line(row: Dict[str, Any]) -> str:
+    if row["status"] != "ok":
+        return f"{row['case']:<70} FAILED {row.get('error')}"
+    rss = f"{row['peak_rss_mb']:7.1f} MiB" if row.get("peak_rss_mb") is not None else "      - MiB"
+    return (f"{row['case']:<70} {row['wall_s']:7.2f}s {row['fps']:8.1f} fps "
+            f"{row['realtime']:6.2f}x realtime {rss}")
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.15) -> List[str]:
+    """
+    Regressions of current against baseline.
+
+    Args:
+        current, baseline: Documents written by run_suite()
+        tolerance: Allowed relative increase of wall time and peak memory
+
+    Returns:
+        One message per regressed case (empty if none)
+    """
+    base = {r["case"]: r for r in baseline["results"]}
+    issues = []
+    for row in current["results"]:
+        ref = base.get(row["case"])
+        if not ref or ref["status"] != "ok":
+            continue
+        if row["status"] != "ok":
+            issues.append(f"{row['case']}: now fails ({row.get('error')})")
+            continue
+        for key, label in (("wall_s", "wall time"), ("peak_rss_mb", "peak memory")):
+            if ref.get(key) and row.get(key) and row[key] > ref[key] * (1 + tolerance):
+                issues.append(f"{row['case']}: {label} {ref[key]} -> {row[key]} "
+                              f"(+{(row[key] / ref[key] - 1) * 100:.0f}%)")
+    return issues
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark adapter actions and planner plans on synthetic media")
+    sub = ap.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="Run the suite and write the results as JSON")
+    run.add_argument("--sizes", default="640x360,1920x1080", help="Comma-separated test clip frame sizes")
+    run.add_argument("--seconds", default="2,5", help="Comma-separated test clip lengths")
+    run.add_argument("--repeat", type=int, default=3, help="Runs per case; the fastest is kept")
+    run.add_argument("--only", default=None, help="Comma-separated substrings of the cases to run")
+    run.add_argument("--out", default="bench.json", help="Where to write the results")
+    cmp_ = sub.add_parser("compare", help="Flag regressions of a results file against a baseline")
+    cmp_.add_argument("current", help="Results of the run under test")
+    cmp_.add_argument("baseline", help="Stored baseline results")
+    cmp_.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative slowdown / memory growth")
+    args = ap.parse_args()
+
+    if args.command == "run":
+        doc = run_suite(args.sizes.split(","), [float(s) for s in args.seconds.split(",")], args.repeat,
+                        args.only.split(",") if args.only else None)
+        with open(args.out, "w") as f:
+            json.dump(doc, f, indent=2)
+        print(f"\n{len(doc['results'])} cases → {args.out}")
+        return
+    with open(args.current) as f:
+        current = json.load(f)
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if current["meta"].get("ffmpeg") != baseline["meta"].get("ffmpeg"):
+        print(f"note: different ffmpeg builds ({baseline['meta'].get('ffmpeg')} -> {current['meta'].get('ffmpeg')})")
+    issues = compare(current, baseline, args.tolerance)
+    for issue in issues:
+        print(f"REGRESSION {issue}")
+    print(f"{len(issues)} regression(s) in {len(current['results'])} cases (tolerance {args.tolerance:.0%})")
+    sys.exit(1 if issues else 0)
+
+
+if __name__ == "__main__":
+    main()
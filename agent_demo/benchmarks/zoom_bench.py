@@ -0,0 +1,71 @@
+"""
+Benchmark: the add_keyframe_zoom engines (ffmpeg_adapter.ZOOM_ENGINES)
+against each other, with a parity check against zoompan.
+
+    python -m agent_demo.benchmarks.zoom_bench --sizes 1920x1080,3840x2160 --seconds 3 --to-scale 1.3
+
+Each engine zooms the same synthetic testsrc2 clip with the same fast
+encoder. Parity means the same number of frames and the same duration as
+zoompan's render (every engine follows the same per-frame zoom schedule),
+with the per-frame PSNR against zoompan showing how far the pixels differ.
+zoompan steps its crop by whole pixels while the others resample subpixel,
+so they are close but never bit-identical.
+"""
+
+import argparse, os, re, tempfile
+from agent_demo import ffmpeg_adapter as fx
+from agent_demo import media_index
+from agent_demo.benchmarks.lut_bench import BENCH_VENC, make_clip
+from agent_demo.benchmarks.suite import timed
+
+
+# (average, min) PSNR over all frames of a against reference b
+def _psnr(a: str, b: str):
+    code, log = fx._run(f'{fx.FFMPEG} -i "{a}" -i "{b}" -lavfi psnr -f null -')
+    m = re.search(r"PSNR .*average:(\S+) min:(\S+)", log) if code == 0 else None
+    return (float(m.group(1)), float(m.group(2))) if m else None
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the zoom engines against zoompan")
+    ap.add_argument("--sizes", default="1920x1080,3840x2160", help="Comma-separated test clip frame sizes")
+    ap.add_argument("--seconds", type=float, default=3.0, help="Test clip length")
+    ap.add_argument("--to-scale", type=float, default=1.3, help="Zoom factor reached after --seconds")
+    ap.add_argument("--engines", default=",".join(fx.ZOOM_ENGINES), help="Comma-separated engines to run")
+    args = ap.parse_args()
+
+    frames = int(args.seconds * 30)
+    with tempfile.TemporaryDirectory() as work:
+        for size in args.sizes.split(","):
+            clip = os.path.join(work, f"clip_{size}.mp4")
+            make_clip(clip, size, args.seconds)
+            rows = []
+            for engine in args.engines.split(","):
+                out = os.path.join(work, f"{engine}_{size}.mp4")
+                secs, meta = timed(lambda: fx.add_keyframe_zoom(clip, out, 1.0, args.to_scale, args.seconds,
+                                                                 venc=BENCH_VENC, engine=engine))
+                rows.append((engine, secs, meta, out))
+
+            print(f"{size} ({frames} frames, zoom 1.0 -> {args.to_scale})")
+            ref = next((r for r in rows if r[0] == "zoompan" and r[2]["code"] == 0), None)
+            ref_info = media_index.probe(ref[3]) if ref else None
+            for engine, secs, meta, out in rows:
+                if meta["code"] != 0:
+                    print(f"  {engine:<8} failed: {meta['log'].strip().splitlines()[-1:]}")
+                    continue
+                line = f"  {engine:<8} {secs:7.2f}s {frames / secs:8.1f} fps"
+                if ref:
+                    line += f"  {ref[1] / secs:5.2f}x"
+                if ref and engine != "zoompan":
+                    info = media_index.probe(out)
+                    same = (info and ref_info and info.frame_count == ref_info.frame_count
+                            and abs((info.duration or 0) - (ref_info.duration or 0)) < 1e-3)
+                    psnr = _psnr(out, ref[3])
+                    line += f"  frames {'match' if same else 'DIFFER'}"
+                    if psnr:
+                        line += f"  PSNR vs zoompan avg {psnr[0]:.1f} dB, min {psnr[1]:.1f} dB"
+                print(line)
+
+
+if __name__ == "__main__":
+    main()
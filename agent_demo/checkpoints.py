@@ -0,0 +1,68 @@
+"""
+Step checkpoints for incremental re-execution.
+
+Every step gets a fingerprint that covers the input file, the segment and
+the step itself plus everything upstream of it, so changing one param
+changes the fingerprint of that step and of all steps after it, and nothing
+before it. The Executor records the fingerprint and output file of each
+finished stage in <out_dir>/checkpoints.json; when a plan is submitted again
+it skips every stage whose checkpoint still matches and resumes rendering
+from the first one that changed.
+"""
+
+import hashlib, json, os, tempfile, threading
+from typing import Dict, Any, List, Optional, Tuple
+from .render_cache import file_fingerprint, step_signature
+from agent_demo import ffmpeg_adapter as fx
+
+MANIFEST = "checkpoints.json"
+
+
+def chain_fingerprints(input_file: str, steps: List[Tuple[str, Dict[str, Any]]],
+                       segment: str = None, variant: str = "") -> List[str]:
+    """One fingerprint per step, each folding in the one before it."""
+    prev = json.dumps({"input": file_fingerprint(input_file), "segment": segment,
+                       "variant": variant, "adapter": fx.ADAPTER_VERSION}, sort_keys=True)
+    fps = []
+    for action, params in steps:
+        blob = json.dumps([prev, step_signature(action, params)], sort_keys=True, default=str)
+        prev = hashlib.sha256(blob.encode()).hexdigest()
+        fps.append(prev)
+    return fps
+
+
+class CheckpointStore:
+    def __init__(self, out_dir: str):
+        self.path = os.path.join(out_dir, MANIFEST)
+        self.entries: Dict[str, Dict[str, str]] = {}
+        self._lock = threading.Lock()  # graph branches record concurrently
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    self.entries = json.load(f).get("steps", {})
+            except (OSError, ValueError):
+                self.entries = {}  # unreadable manifest: just re-render
+
+    def lookup(self, step_id: str, fingerprint: str) -> Optional[str]:
+        """Output file recorded for step_id if its fingerprint still matches and the file is there."""
+        entry = self.entries.get(step_id)
+        if entry and entry["fingerprint"] == fingerprint and os.path.exists(entry["file"]):
+            return entry["file"]
+        return None
+
+    def record(self, step_id: str, fingerprint: str, file: str):
+        with self._lock:
+            self.entries[step_id] = {"fingerprint": fingerprint, "file": file}
+            self._save()
+
+    def forget(self, step_id: str):
+        with self._lock:
+            if self.entries.pop(step_id, None) is not None:
+                self._save()
+
+    # Written to a temp file and renamed, so a crash never leaves half a manifest
+    def _save(self):
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"steps": self.entries}, f, indent=2)
+        os.replace(tmp, self.path)
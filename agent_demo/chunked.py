@@ -0,0 +1,173 @@
+"""
+Chunked rendering: spread one video-filter stage across CPU cores.
+
+The source is split at keyframe (GOP) boundaries with a stream copy, every
+chunk is rendered by its own ffmpeg process in a process pool, and the
+rendered chunks are stitched back together with a stream-copy concat. The
+audio is never chunked; it is muxed back from the source in one go so there
+are no gaps or encoder priming at the chunk seams.
+
+Chunks prefer to start at a shot cut when the clip has been analyzed
+(analysis.py), so any seam lands where the picture changes anyway. The
+Executor renders from a trimmed segment, a proxy or an intermediate, none
+of which is analyzed itself, so it passes the cuts of its analyzed source
+in (shifted to the segment, see scene_cuts).
+
+Time-dependent filters (the zoompan ramp) get each chunk's frame offset, and
+because every chunk maps input frames 1:1 the stitched result has exactly
+the frame count of a single-pass render.
+"""
+
+import glob, os, shutil, tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Tuple
+from agent_demo import ffmpeg_adapter as fx
+from . import analysis, media_index, metrics
+
+DEFAULT_CHUNK_S = 30.0
+
+# Utility: pick cut points from the probed keyframe list, roughly chunk_s apart.
+# With shot cuts (scene times from analysis.py), a keyframe on a shot cut
+# ends a chunk already after chunk_s / 2, so seams hide in the cuts.
+# Returns (cut times, frame number of each cut) or None without keyframe data.
+def plan_cuts(info: media_index.MediaInfo, chunk_s: float, scenes: List[float] = ()):
+    if not info or len(info.keyframes) < 2:
+        return None
+    tolerance = 1.5 / (info.fps or 30)
+    times, frames, last = [], [], info.keyframes[0]
+    for t, n in zip(info.keyframes[1:], info.keyframe_frames[1:]):
+        at_shot = any(abs(t - s) <= tolerance for s in scenes)
+        if t - last >= chunk_s or (at_shot and t - last >= chunk_s / 2):
+            times.append(t)
+            frames.append(n)
+            last = t
+    return times, frames
+
+# Utility: shot cuts of a clip from its cached analysis index (see
+# analysis.py), none if it wasn't analyzed. With a segment, the cuts inside
+# it in seconds from the segment start (the timeline of the trimmed clip)
+def scene_cuts(path: str, segment: str = None) -> List[float]:
+    index = analysis.load(path)
+    scenes = (index or {}).get("results", {}).get("scenes")
+    cuts = scenes["cuts"] if scenes else []
+    if segment:
+        start = fx.parse_timestamp(segment.split("-")[0])
+        end = start + fx.segment_seconds(segment)
+        cuts = [t - start for t in cuts if start < t < end]
+    return cuts
+
+# Worker entry point; must be top-level so the process pool can pickle it
+def _render_chunk(job: Tuple[str, str, List[Tuple[str, Dict[str, Any]]], int, Dict[str, Any]]) -> Dict[str, Any]:
+    chunk, out, steps, frame_offset, opts = job
+    opts = dict(opts)
+    with fx.thread_budget(opts.pop("threads")), fx.log_to(opts.pop("log_file")), metrics.collect() as runs:
+        meta = fx.render_fused(chunk, out, steps, frame_offset=frame_offset, audio=False, **opts)
+    meta["runs"] = runs  # measured in this process; the parent adds them to its own
+    return meta
+
+def render_chunked(input_file: str, out_file: str, steps: List[Tuple[str, Dict[str, Any]]],
+                   segment: str = None, workers: int = None,
+                   chunk_s: float = DEFAULT_CHUNK_S, venc: str = None, bake: int = None,
+                   zoom_engine: str = "zoompan", threads: int = None,
+                   scenes: List[float] = None) -> Dict[str, Any]:
+    """
+    Render video filter steps (optionally ending in export_preview) chunk by
+    chunk in parallel.
+
+    Args:
+        input_file: Input clip
+        out_file: Output file path
+        steps: (action, params) pairs, same as render_fused()
+        segment: Optional time segment
+        workers: Process pool size (defaults to the CPU count)
+        chunk_s: Target chunk length; actual cuts land on the next keyframe
+        venc: Optional encoder args, passed on to render_fused()
+        bake: Optional LUT lattice size, passed on to render_fused()
+        zoom_engine: Passed on to render_fused()
+        threads: CPU thread budget shared by the workers (defaults to the
+            calling thread's fx.thread_budget, else the CPU count)
+        scenes: Shot cuts in seconds on the rendered timeline (defaults to
+            input_file's own analysis, see scene_cuts)
+
+    Returns:
+        Dict with execution status and the number of chunks rendered
+    """
+    work = tempfile.mkdtemp(prefix=".chunks_", dir=os.path.dirname(os.path.abspath(out_file)))
+    logs = []
+    try:
+        source = input_file
+        if segment:
+            # A stream-copy trim would snap to a keyframe and change the
+            # frame count, so cut the segment once, losslessly
+            source = os.path.join(work, "source.mkv")
+            cmd = (f'{fx.FFMPEG} -y {fx._segment_filter(segment)}-i "{input_file}" -map 0 '
+                   f'-c:v libx264 -preset ultrafast -qp 0 -c:a copy "{source}"')
+            code, log = fx._run(cmd)
+            logs.append(log)
+            if code != 0:
+                return {"code": code, "log": "\n".join(logs), "file": out_file}
+
+        # 1) Split the video at keyframes without re-encoding. With the probed
+        # keyframe list we cut exactly there and already know every chunk's
+        # first frame; otherwise let the muxer pick and count frames afterwards
+        if scenes is None:
+            scenes = scene_cuts(input_file, segment)
+        cuts = plan_cuts(media_index.probe(source), chunk_s, scenes)
+        pattern = os.path.join(work, "chunk_%05d.mkv")
+        if cuts and cuts[0]:
+            # nudge back by 1ms so float rounding can't push a cut to the next keyframe
+            split = "-segment_times " + ",".join(f"{t - 0.001:.6f}" for t in cuts[0])
+        else:
+            split = f"-segment_time {chunk_s}"
+        cmd = (f'{fx.FFMPEG} -y -i "{source}" -map 0:v:0 -c copy -f segment '
+               f'{split} -reset_timestamps 1 "{pattern}"')
+        code, log = fx._run(cmd)
+        logs.append(log)
+        chunks = sorted(glob.glob(os.path.join(work, "chunk_*.mkv")))
+        if code != 0 or not chunks:
+            return {"code": code or 1, "log": "\n".join(logs), "file": out_file}
+
+        # 2) Render every chunk with its frame offset into the whole clip
+        if cuts and len(cuts[1]) + 1 == len(chunks):
+            offsets = [0] + cuts[1]
+        else:
+            offsets, offset = [], 0
+            for chunk in chunks:
+                offsets.append(offset)
+                info = media_index.probe(chunk)
+                offset += (info.frame_count or 0) if info else 0
+        if bake:
+            from . import lut_bake
+            lut_bake.bake_runs(steps, bake)  # once here, so the workers all find it cached
+        # Every worker gets an equal share of the budget, so the pool as a whole uses it once
+        workers = workers or os.cpu_count()
+        budget = threads or getattr(fx._local, "threads", None) or os.cpu_count()
+        opts = {"venc": venc, "bake": bake, "zoom_engine": zoom_engine,
+                "threads": max(1, budget // min(workers, len(chunks)))}
+        # Workers log next to the calling thread's log_to() file, one file per chunk
+        sink = getattr(fx._local, "log", None)
+        log_file = lambda n: f"{os.path.splitext(sink.path)[0]}.chunk{n:03d}.log" if sink else None
+        jobs = [(chunk, os.path.join(work, f"out_{n:05d}.mkv"), steps, offsets[n],
+                 dict(opts, log_file=log_file(n))) for n, chunk in enumerate(chunks)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            metas = list(pool.map(_render_chunk, jobs))
+        logs.extend(m["log"] for m in metas)
+        for m in metas:
+            metrics.extend(m["runs"])
+        failed = [m for m in metas if m["code"] != 0]
+        if failed:
+            return {"code": failed[0]["code"], "log": "\n".join(logs), "file": out_file}
+
+        # 3) Stitch the rendered chunks and mux the untouched audio back in
+        listing = os.path.join(work, "concat.txt")
+        with open(listing, "w") as f:
+            for _, out, *_ in jobs:
+                f.write(f"file '{out}'\n")
+        acodec = "aac" if any(a == "export_preview" for a, _ in steps) else "copy"
+        cmd = (f'{fx.FFMPEG} -y -f concat -safe 0 -i "{listing}" -i "{source}" '
+               f'-map 0:v -map 1:a? -c:v copy -c:a {acodec} "{out_file}"')
+        code, log = fx._run(cmd)
+        logs.append(log)
+        return {"code": code, "log": "\n".join(logs), "file": out_file, "chunks": len(chunks)}
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
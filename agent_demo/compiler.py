@@ -0,0 +1,79 @@
+"""
+Plan compiler: groups the steps of a Plan into execution stages.
+
+Adjacent pure video-filter steps (color, zoom, SLOG3 conversion, LUT) and a
+trailing export_preview are merged into one fused stage, which the Executor
+renders as a single ffmpeg -filter_complex run instead of one decode/encode
+pass per step. Everything else (audio steps, steps that can't be fused,
+actions the Executor renders outside ffmpeg such as LUTs on the native
+engine) becomes a stage of its own and runs exactly as before.
+
+A stage is final when it is the last to write one of the streams: its
+output reaches the result untouched (steps after it only stream-copy that
+stream). Every other stage's output is decoded by a later stage again, so
+the Executor may render it in a fast intermediate format.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Collection, List, Tuple
+from .types import Plan, Step
+from .actions import STREAMS, VIDEO_FILTER_ACTIONS
+
+
+@dataclass
+class Stage:
+    steps: List[Tuple[int, Step]]  # (1-based step index, step) in plan order
+    fused: bool = False
+    video_only: bool = False       # pure video filtering: can be rendered with render_fused()
+    final: bool = True             # False: only later stages read the output (see Executor.intermediate)
+
+
+def _fusable(step: Step, exclude: Collection[str] = ()) -> bool:
+    if step.action not in VIDEO_FILTER_ACTIONS or step.action in exclude:
+        return False
+    if step.action == "slog3_with_lut":
+        # Let the per-step path report a missing LUT properly
+        lut = step.params.get("lut_file")
+        return bool(lut) and os.path.exists(lut)
+    return True
+
+
+# An export_preview that encodes video (a remuxed one only copies it, see optimizer.py)
+def _encodes(step: Step) -> bool:
+    return step.action == "export_preview" and not step.params.get("remux")
+
+
+def compile_plan(plan: Plan, fuse: bool = True, exclude: Collection[str] = ()) -> List[Stage]:
+    stages: List[Stage] = []
+    group: List[Tuple[int, Step]] = []
+
+    def flush():
+        if group:
+            stages.append(Stage(steps=list(group), fused=len(group) > 1, video_only=True))
+        group.clear()
+
+    for i, step in enumerate(plan.steps, start=1):
+        if fuse and _fusable(step, exclude):
+            group.append((i, step))
+            continue
+        if fuse and _encodes(step) and group:
+            # The delivery encode closes the group
+            group.append((i, step))
+            flush()
+            continue
+        flush()
+        stages.append(Stage(steps=[(i, step)],
+                            video_only=_fusable(step, exclude) or _encodes(step)))
+    flush()
+    placed = set()  # streams whose last writer has been found
+    for stage in reversed(stages):
+        writes = set()
+        for _, step in stage.steps:
+            if step.action == "export_preview" and not _encodes(step):
+                writes.add("a")  # the video is copied as it is
+                continue
+            writes |= STREAMS.get(step.action, (None, frozenset("va")))[1]
+        stage.final = bool(writes - placed)
+        placed |= writes
+    return stages
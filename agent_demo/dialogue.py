@@ -0,0 +1,191 @@
+"""
+Dialogue-driven music ducking.
+
+envelope() decodes a clip's audio once (mono, 16 kHz) and measures the
+loudness of every 20 ms frame, a block of frames at a time in NumPy. The
+envelope is cached per file content in .audio_cache/, so re-running a plan,
+or changing only the duck params, costs no decode.
+
+speech_regions() turns the envelope into dialogue intervals (frames above
+an adaptive threshold, short gaps closed, blips dropped), and
+duck_music_file() renders the ducking as a precomputed gain curve: the
+music's volume ramps down over attack_ms *before* each line (the curve is
+known ahead, unlike a compressor's) and back up over release_ms after it.
+The curve is one `volume` filter whose timeline is enabled only inside the
+duck windows, so the music everywhere else passes through untouched, and
+with no dialogue at all the music is mixed in as is. The video is
+stream-copied.
+
+NumPy is optional: without it duck_music_file() falls back to ffmpeg's
+sidechaincompress (ffmpeg_adapter.duck_music(engine="sidechain")).
+"""
+
+import os, subprocess, tempfile
+from typing import Any, Dict, List, Optional, Tuple
+from agent_demo import ffmpeg_adapter as fx
+from .lut import _np
+from .render_cache import file_fingerprint
+
+DEFAULT_CACHE_DIR = os.environ.get("VIBE_AUDIO_CACHE", ".audio_cache")
+FRAME_MS = 20
+SAMPLE_RATE = 16000
+_BLOCK_FRAMES = 500    # frames decoded and measured per NumPy block (10 s)
+SILENCE_DB = -100.0    # loudness of digital silence (and the floor of the envelope)
+
+
+def envelope(path: str, frame_ms: int = FRAME_MS, cache_dir: str = DEFAULT_CACHE_DIR):
+    """
+    Loudness (dBFS) of every frame_ms frame of a clip's first audio stream.
+
+    Args:
+        path: Clip to analyze
+        frame_ms: Frame length
+        cache_dir: Where envelopes are cached (keyed on the file's content)
+
+    Returns:
+        float32 array, one value per frame; None if the audio can't be decoded
+    """
+    np = _np()
+    os.makedirs(cache_dir, exist_ok=True)
+    cached = os.path.join(cache_dir, f"{file_fingerprint(path)[:32]}_{frame_ms}ms.npy")
+    if os.path.exists(cached):
+        return np.load(cached)
+
+    n = SAMPLE_RATE * frame_ms // 1000  # samples per frame
+    cmd = [fx.FFMPEG, "-v", "error", "-i", path, "-map", "0:a:0", "-ac", "1", "-ar", str(SAMPLE_RATE),
+           "-f", "s16le", "-acodec", "pcm_s16le", "-"]
+    blocks = []
+    with tempfile.TemporaryFile() as err:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=err)
+        with proc.stdout:
+            while True:
+                buf = proc.stdout.read(n * 2 * _BLOCK_FRAMES)
+                if not buf:
+                    break
+                x = np.frombuffer(buf[:len(buf) // 2 * 2], dtype=np.int16).astype(np.float32) / 32768.0
+                x = np.pad(x, (0, -len(x) % n))  # a short last frame is padded with silence
+                power = np.mean(np.square(x.reshape(-1, n)), axis=1)
+                blocks.append(np.maximum(10 * np.log10(np.maximum(power, 1e-12)), SILENCE_DB))
+        if proc.wait() != 0 or not blocks:
+            return None
+    env = np.concatenate(blocks).astype(np.float32)
+    tmp = f"{cached}.{os.getpid()}.npy"
+    np.save(tmp, env)
+    os.replace(tmp, cached)  # atomic: concurrent analyses of the same file are harmless
+    return env
+
+
+def speech_regions(env, frame_ms: int = FRAME_MS, threshold_db: float = None,
+                   min_gap_s: float = 0.3, min_speech_s: float = 0.1) -> List[Tuple[float, float]]:
+    """
+    (start, end) seconds of dialogue in an envelope.
+
+    Args:
+        env: envelope() of the clip
+        frame_ms: Its frame length
+        threshold_db: Loudness counted as speech; default adapts to the
+            clip: 15 dB over its noise floor (10th percentile) but at most
+            6 dB under its loud parts (95th), and at least -50 dBFS
+        min_gap_s: Pauses shorter than this don't end a region
+        min_speech_s: Regions shorter than this are dropped as blips
+    """
+    np = _np()
+    if env is None or not len(env):
+        return []
+    if threshold_db is None:
+        floor, loud = np.percentile(env, [10, 95])
+        threshold_db = max(min(float(floor) + 15.0, float(loud) - 6.0), -50.0)
+    active = np.concatenate([[False], env > threshold_db, [False]])
+    edges = np.flatnonzero(np.diff(active.astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]  # frame indices, end exclusive
+    if not len(starts):
+        return []
+    frame_s = frame_ms / 1000.0
+    # Close short pauses, then drop what is still too short to be speech
+    keep = np.concatenate([[True], (starts[1:] - ends[:-1]) * frame_s >= min_gap_s])
+    starts, ends = starts[keep], ends[np.concatenate([keep[1:], [True]])]
+    long_enough = (ends - starts) * frame_s >= min_speech_s
+    return [(round(float(s * frame_s), 3), round(float(e * frame_s), 3)) for s, e in zip(starts[long_enough], ends[long_enough])]
+
+
+def duck_windows(regions: List[Tuple[float, float]], attack_s: float,
+                 release_s: float) -> List[Tuple[float, float, float, float]]:
+    """
+    Gain keyframes of the ducking: (ramp down from, fully ducked from,
+    fully ducked until, back up at) per window. Windows whose ramps would
+    overlap are merged, so the curve never dips back up between two lines.
+    """
+    windows = []
+    for s, e in regions:
+        if windows and s - attack_s <= windows[-1][3]:
+            a, b, _, _ = windows[-1]
+            windows[-1] = (a, b, e, e + release_s)
+        else:
+            windows.append((max(0.0, s - attack_s), s, e, e + release_s))
+    return windows
+
+
+def _volume_filter(windows, duck_db: float) -> str:
+    # Sum of one trapezoid per window (they don't overlap): 0 outside, 1 when fully ducked
+    terms, spans = [], []
+    for a, b, c, d in windows:
+        up = f"clip((t-{a:.3f})/{max(b - a, 1e-3):.3f},0,1)"
+        down = f"clip(({d:.3f}-t)/{max(d - c, 1e-3):.3f},0,1)"
+        terms.append(f"min({up},{down})")
+        spans.append(f"between(t,{a:.3f},{d:.3f})")
+    return (f"volume=volume='pow(10,-{duck_db}*({'+'.join(terms)})/20)':eval=frame:"
+            f"enable='{'+'.join(spans)}'")
+
+
+# --------------------------------------
+# Drop-in for ffmpeg_adapter.duck_music
+# --------------------------------------
+def duck_music_file(input_file: str, music_file: str, out_file: str, duck_db: int,
+                    attack_ms: int, release_ms: int, segment: str = None,
+                    threshold_db: Optional[float] = None,
+                    cache_dir: str = DEFAULT_CACHE_DIR) -> Dict[str, Any]:
+    """
+    Mix music under a clip's dialogue, ducked by a precomputed gain curve.
+
+    Args:
+        input_file: Clip with the dialogue
+        music_file: Background music
+        out_file: Output file path
+        duck_db: How far the music drops under dialogue
+        attack_ms, release_ms: Ramp down before / up after each line
+        segment: Optional time segment (the clip is cut first, then analyzed)
+        threshold_db: Speech loudness (default: adaptive, see speech_regions)
+        cache_dir: Envelope cache
+
+    Returns:
+        Dict with execution status and the dialogue "regions" ducked
+    """
+    try:
+        _np()
+    except RuntimeError as e:
+        meta = fx.duck_music(input_file, music_file, out_file, duck_db, attack_ms, release_ms,
+                             segment=segment, engine="sidechain")
+        meta["log"] = f"{e}; rendered with sidechaincompress instead\n{meta['log']}"
+        return meta
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(out_file))) as work:
+        source = input_file
+        if segment:
+            source = os.path.join(work, "segment.mkv")
+            code, log = fx._run(f'{fx.FFMPEG} -y {fx._segment_filter(segment, input_file)}-i "{input_file}" '
+                                f'-map 0 -c copy "{source}"')
+            if code != 0:
+                return {"code": code, "log": log, "file": out_file}
+        env = envelope(source, cache_dir=cache_dir)
+        if env is None:
+            return {"code": 1, "log": f"could not decode the audio of {input_file}", "file": out_file}
+        regions = speech_regions(env, threshold_db=threshold_db)
+        windows = duck_windows(regions, attack_ms / 1000.0, release_ms / 1000.0)
+        music = f"[1:a]{_volume_filter(windows, duck_db)}[m];" if windows else "[1:a]anull[m];"
+        graph = f"{music}[0:a][m]amix=inputs=2:duration=first:normalize=0[outa]"
+        script = os.path.join(work, "duck.filter")
+        with open(script, "w") as f:
+            f.write(graph)  # a script file: the curve of a long clip outgrows a command line
+        cmd = (f'{fx.FFMPEG} -y -i "{source}" -i "{music_file}" -filter_complex_script "{script}" '
+               f'-map 0:v? -map "[outa]" -c:v copy -c:a aac "{out_file}"')
+        code, log = fx._run(cmd)
+    return {"code": code, "log": log, "file": out_file, "regions": regions}
@@ -5,20 +5,115 @@ The Executor is generic: it doesn’t know whether it’s using FFmpeg or DaVinc
 it just calls functions defined in the adapter.
 
 It also chains outputs: the result of step N becomes the input for step N+1.
+Adjacent video-filter steps are fused into one ffmpeg run (see compiler.py)
+unless the Executor is created with fuse=False. With workers > 1, video-only
+stages are rendered in parallel chunks (see chunked.py). Given a RenderCache,
+stages whose exact render was done before are served from the cache.
+Every result carries the stage's timings and resource use in
+ExecResult.metrics (see metrics.py), the tail of its ffmpeg output and the
+errors and warnings in it; the full output is in out_dir/logs/ (see logs.py).
+
+Finished stages are checkpointed in out_dir (see checkpoints.py): submitting
+an edited plan again re-renders only from the first step that changed.
+
+A segment is cut out of the input once, before the first step (see
+trim.py); every step then works on that clip in time relative to the
+segment start and never seeks into the original again.
+
+Stages whose output only a later stage decodes again (Stage.final is False)
+are written as lossless intra-only .mkv intermediates (fx.INTERMEDIATE_VENC)
+instead of with the step's own delivery encoder; only the final render does
+the expensive encode. intermediate="delivery" restores one full encode per step.
+
+An export_preview step with a "ladder" param (e.g. ["low@360", "high"])
+also writes those renditions next to its own: one decode, split into one
+encoder per rendition (fx.export_ladder, or the fused render's own pass).
+With a RenderCache every rendition is cached separately, and renditions
+already in it are not rendered again.
+
+With "stream": "hls" the preview is also written as fMP4 HLS segments while
+it encodes; the playlist (outputs["manifest"]) lists every finished
+segment, so a reviewer can start watching after the first one
+(fx.stream_progress polls it). Cache hits return the finished .mp4 only.
+
+A render profile (fx.RENDER_PROFILES: draft, review, master) sets the
+delivery encoder and the intermediate codec in one go. `threads` is the CPU
+budget of a run (default: every core); jobs that run concurrently (graph
+branches, chunk workers) split it evenly, so together they never ask ffmpeg
+for more threads than there are cores.
+
+In proxy mode the plan runs against a cached low-resolution proxy of the
+input with ultrafast encodes; conform() then replays the same plan on the
+full-resolution source with pixel-valued params scaled up to match.
+
+With lut_engine="numpy", LUT steps are applied in-process by lut.py
+(tetrahedral interpolation, intensity pre-blended into the table) instead
+of ffmpeg's lut3d; those steps then render on their own, outside any fused
+stage. With bake_size set, runs of color steps are baked into one cached
+3D LUT of that lattice size and rendered as a single lut3d (see lut_bake.py).
+zoom_engine picks how zoom steps render (ffmpeg_adapter.ZOOM_ENGINES);
+"numpy" zooms run in-process on their own like numpy LUT steps. duck_engine
+does the same for music ducking (ffmpeg_adapter.DUCK_ENGINES): "envelope"
+ducks along a gain curve precomputed from the dialogue (dialogue.py).
+
+With check_steps (the default), every stage's output is checked against the
+file it read (probe data plus a few decoded frames, see verifier.py) in the
+background while the next stage renders; once a check has failed, the
+stages after it are not started.
 """
 
-import os
-from typing import Dict, Callable
+import dataclasses, json, os, time
+from typing import Dict, Callable, List
 from .types import Plan, ExecResult
+from .actions import LABELS, normalize_params, scale_pixel_params
+from .render_cache import RenderCache, file_fingerprint
+from .compiler import Stage, compile_plan
+from .chunked import DEFAULT_CHUNK_S, render_chunked, scene_cuts
+from .checkpoints import CheckpointStore, chain_fingerprints
+from . import logs, lut, metrics, trim, verifier
 from agent_demo import ffmpeg_adapter as fx  # can swap to resolve_adapter later
 
 class Executor:
-    def __init__(self, input_file: str, segment: str = None, music: str = None, out_dir: str = "outputs"):
+    def __init__(self, input_file: str, segment: str = None, music: str = None, out_dir: str = "outputs",
+                 fuse: bool = True, workers: int = 1, chunk_s: float = DEFAULT_CHUNK_S,
+                 cache: RenderCache = None, resume: bool = True,
+                 proxy: bool = False, proxy_height: int = 540, proxy_dir: str = ".proxies",
+                 lut_engine: str = "ffmpeg", bake_size: int = None, zoom_engine: str = "zoompan",
+                 duck_engine: str = "envelope", trim_dir: str = ".trims", profile: str = "review",
+                 intermediate: str = None, threads: int = None, check_steps: bool = True):
         self.input = input_file
+        self.source = input_file  # the full-resolution original, even in proxy mode
         self.segment = segment
+        self.trim_dir = trim_dir
         self.music = music
+        self.fuse = fuse
+        self.workers = workers
+        self.chunk_s = chunk_s
+        self.cache = cache
+        self.resume = resume
+        self.proxy = proxy
+        self.proxy_height = proxy_height
+        self.proxy_dir = proxy_dir
+        self.profile = profile
+        settings = fx.RENDER_PROFILES[profile]
+        self.venc = fx.PROXY_VENC if proxy else settings["venc"]  # encoder override for every final render
+        # fx.INTERMEDIATE_VENC key, or "delivery" to encode every step fully
+        self.intermediate = intermediate or settings["intermediate"]
+        self.threads = threads or os.cpu_count() or 1  # CPU threads shared by all concurrent ffmpeg jobs
+        self.lut_engine = lut_engine
+        self.bake_size = bake_size
+        self.zoom_engine = zoom_engine
+        self.duck_engine = duck_engine
+        self.check_steps = check_steps  # deep-check each stage's output while the next one renders
+        # Actions rendered in-process rather than by an ffmpeg filter: never fused
+        self.native_actions = frozenset(({"slog3_with_lut"} if lut_engine == "numpy" else set())
+                                        | ({"add_keyframe_zoom"} if zoom_engine == "numpy" else set()))
+        self.base_out_dir = out_dir
+        if proxy:
+            out_dir = os.path.join(out_dir, "proxy")  # keep proxy renders apart from full-res ones
         os.makedirs(out_dir, exist_ok=True)
         self.out_dir = out_dir
+        self.checkpoints = CheckpointStore(out_dir) if resume else None
         self.curr_file = input_file  # start with original input
         # Registry maps action names to local handler functions
         self.registry: Dict[str, Callable] = {
@@ -32,90 +127,411 @@ class Executor:
 
     # Main execution loop
     def execute(self, plan: Plan):
+        with fx.thread_budget(self.threads):
+            return self._execute(plan)
+
+    def _execute(self, plan: Plan):
         results = []
-        for i, step in enumerate(plan.steps, start=1):
-            fn = self.registry.get(step.action)
-            if not fn:
-                results.append(ExecResult(step_id=f"S{i}", status="error", outputs={}, error=f"Unknown action {step.action}"))
-                continue
-            # Run the function corresponding to this action
-            res = fn(i, step.params)
-            results.append(res)
-            # Chain outputs: use the new file as next input
-            if res.status == "ok" and "file" in res.outputs and os.path.exists(res.outputs["file"]):
-                self.curr_file = res.outputs["file"]
+        err = self._prepare()
+        if err:
+            return [ExecResult(step_id=f"S{i}", status="error", outputs={}, error=err)
+                    for i in range(1, len(plan.steps) + 1)]
+        fps = self._fingerprints(plan)
+        checks = verifier.StepVerifier() if self.check_steps else None
+        try:
+            for stage in compile_plan(plan, fuse=self.fuse, exclude=self.native_actions):
+                if checks and checks.failed():
+                    # An earlier output failed its checks: don't render on top of it
+                    results.extend(ExecResult(step_id=f"S{i}", status="error", outputs={},
+                                              error="upstream step failed verification") for i, _ in stage.steps)
+                    continue
+                src = self.curr_file
+                stage_results = self.run_stage(stage, src, fps)
+                results.extend(stage_results)
+                if checks:
+                    checks.submit(stage_results, src, audio=self._adds_audio(stage) or None)
+                # Chain outputs: use the new file as next input
+                res = stage_results[-1]
+                if res.status == "ok" and "file" in res.outputs and os.path.exists(res.outputs["file"]):
+                    self.curr_file = res.outputs["file"]
+            if checks:
+                self._failed_checks(checks.wait(), results)
+        finally:
+            if checks:
+                checks.close()
+        return results
+
+    @staticmethod
+    def _adds_audio(stage: Stage) -> bool:
+        return any(step.action == "duck_music" for _, step in stage.steps)
+
+    # Stages rendered on top of an output that failed its checks fail too,
+    # and none of them is resumed from its checkpoint next time
+    def _failed_checks(self, failed: List[List[ExecResult]], results: List[ExecResult]):
+        if not failed:
+            return
+        first = min(int(r.step_id[1:]) for r in failed[0])
+        for r in results:
+            if int(r.step_id[1:]) > first and r.status == "ok":
+                r.status, r.error = "error", "upstream step failed verification"
+        if self.checkpoints:
+            for r in results:
+                if int(r.step_id[1:]) >= first:
+                    self.checkpoints.forget(r.step_id)
+
+    # Run a plan as a dependency graph: independent video and audio branches
+    # render concurrently and are stream-copy muxed back together (see graph.py)
+    def execute_graph(self, plan: Plan, max_parallel: int = 2):
+        from .graph import execute_graph
+        with fx.thread_budget(self.threads):
+            return execute_graph(self, plan, max_parallel=max_parallel)
+
+    # Per-run setup: proxy generation, the segment trim and starting from the original input again
+    def _prepare(self) -> str:
+        if self.proxy:
+            err = self._ensure_proxy()
+            if err:
+                return err
+        self.curr_file = self.input  # a re-submitted plan starts from the original again
+        if self.segment:
+            return self._ensure_trim()
+        return None
+
+    def _fingerprints(self, plan: Plan) -> List[str]:
+        if not self.checkpoints:
+            return []
+        return chain_fingerprints(self.input, [self._resolved(s) for s in plan.steps], self.segment,
+                                  self._variant())
+
+    # Render one compiled stage reading `src`, via its checkpoint when enabled,
+    # and attach what it cost to every step's result
+    def run_stage(self, stage: Stage, src: str, fps: List[str]) -> List[ExecResult]:
+        ids = [i for i, _ in stage.steps]
+        name = f"{ids[0]:02d}" if len(ids) == 1 else f"{ids[0]:02d}-{ids[-1]:02d}"
+        log_file = os.path.join(self.out_dir, "logs", f"step_{name}.log")
+        start = time.time()
+        with metrics.collect() as runs, fx.log_to(log_file):
+            if self.checkpoints:
+                results = self._resume_stage(stage, fps, src)
+            else:
+                results = self._run_stage(stage, src)
+        summary = metrics.summarize(runs, start, time.time())
+        summary["stage"] = f"S{ids[0]}" if len(ids) == 1 else f"S{ids[0]}-S{ids[-1]}"
+        found = logs.issues(runs)
+        for r, (_, step) in zip(results, stage.steps):
+            cache = "checkpoint" if r.outputs.get("checkpoint") else "hit" if r.outputs.get("cached") else "miss"
+            r.metrics = dict(summary, action=step.action, cache=cache)
+            # Results keep the bounded tail and the parsed issues; the full output is in log_file
+            r.outputs.update(found, log=logs.tail(r.outputs.get("log", "")), log_file=log_file)
+        return results
+
+    # Proxy mode: run the same plan on the full-resolution source
+    def conform(self, plan: Plan):
+        if not self.proxy:
+            return self.execute(plan)
+        err = self._ensure_proxy()
+        if err:
+            return [ExecResult(step_id=f"S{i}", status="error", outputs={}, error=err)
+                    for i in range(1, len(plan.steps) + 1)]
+        full_size, proxy_size = fx.probe_video_size(self.source), fx.probe_video_size(self.input)
+        factor = full_size[1] / proxy_size[1] if full_size and proxy_size else 1.0
+        scaled = Plan(steps=[dataclasses.replace(s, params=scale_pixel_params(s.action, s.params, factor))
+                             for s in plan.steps])
+        full = Executor(self.source, segment=self.segment, music=self.music, out_dir=self.base_out_dir,
+                        fuse=self.fuse, workers=self.workers, chunk_s=self.chunk_s,
+                        cache=self.cache, resume=self.resume, lut_engine=self.lut_engine,
+                        bake_size=self.bake_size, zoom_engine=self.zoom_engine,
+                        duck_engine=self.duck_engine, trim_dir=self.trim_dir,
+                        profile=self.profile, intermediate=self.intermediate, threads=self.threads,
+                        check_steps=self.check_steps)
+        return full.execute(scaled)
+
+    # Generate the proxy once per source content and height, then reuse it
+    def _ensure_proxy(self) -> str:
+        if self.input != self.source and os.path.exists(self.input):
+            return None
+        os.makedirs(self.proxy_dir, exist_ok=True)
+        stem = os.path.splitext(os.path.basename(self.source))[0]
+        path = os.path.join(self.proxy_dir,
+                            f"{stem}_{file_fingerprint(self.source)[:16]}_{self.proxy_height}p.mp4")
+        if not os.path.exists(path):
+            tmp = path + ".part.mp4"
+            meta = fx.make_proxy(self.source, tmp, height=self.proxy_height)
+            if meta["code"] != 0:
+                return "proxy generation failed"
+            os.replace(tmp, path)
+        self.input = self.curr_file = path
+        return None
+
+    # Cut the segment once per input content (see trim.py) and start the chain from it
+    def _ensure_trim(self) -> str:
+        os.makedirs(self.trim_dir, exist_ok=True)
+        stem = os.path.splitext(os.path.basename(self.input))[0]
+        span = self.segment.replace(":", "")
+        path = os.path.join(self.trim_dir, f"{stem}_{file_fingerprint(self.input)[:16]}_{span}.mkv")
+        if not os.path.exists(path):
+            tmp = path + ".part.mkv"
+            meta = trim.trim_segment(self.input, tmp, self.segment)
+            if meta["code"] != 0:
+                return "segment trim failed"
+            os.replace(tmp, path)
+        self.curr_file = path
+        return None
+
+    # Executor-level settings that change what a render produces
+    def _variant(self, final: bool = True) -> str:
+        v = {"venc": self._target(final)[0]}
+        if self.lut_engine != "ffmpeg":
+            v["lut_engine"] = self.lut_engine
+        if self.bake_size:
+            v["bake"] = self.bake_size
+        if self.zoom_engine != "zoompan":
+            v["zoom_engine"] = self.zoom_engine
+        if self.duck_engine != "envelope":
+            v["duck_engine"] = self.duck_engine
+        return json.dumps(v, sort_keys=True)
+
+    # Reuse the stage's checkpoint if it still matches, otherwise render and record it
+    def _resume_stage(self, stage: Stage, fps: List[str], src: str) -> List[ExecResult]:
+        last_i = stage.steps[-1][0]
+        step_id, fp = f"S{last_i}", fps[last_i - 1]
+        done = self.checkpoints.lookup(step_id, fp)
+        if done:
+            return [ExecResult(step_id=f"S{i}", status="ok",
+                               outputs={"file": done, "log": "", "checkpoint": True, "fingerprint": fps[i - 1]})
+                    for i, _ in stage.steps]
+        results = self._run_stage(stage, src)
+        out = results[-1].outputs.get("file")
+        if all(r.status == "ok" for r in results) and out and os.path.exists(out):
+            self.checkpoints.record(step_id, fp, out)
+        else:
+            self.checkpoints.forget(step_id)
+        for r, (i, _) in zip(results, stage.steps):
+            r.outputs["fingerprint"] = fps[i - 1]
         return results
 
+    def _run_stage(self, stage: Stage, src: str) -> List[ExecResult]:
+        if not self.cache:
+            return self._render_stage(stage, src)
+        last_i, last_step = stage.steps[-1]
+        out = self._outfile(LABELS.get(last_step.action, last_step.action), last_i, self._target(stage.final)[1])
+        # Every preview rendition is cached on its own, so only the missing ones render
+        ladder = self._renditions(last_step.action, last_step.params, out)
+        renditions = ladder or [(None, out)]
+        variant = self._variant(stage.final)
+        keys = {path: self.cache.key(src, self._stage_steps(stage, spec), None, variant)  # src is already trimmed
+                for spec, path in renditions}
+        todo = [(spec, path) for spec, path in renditions if not self.cache.get(keys[path], path)]
+        if not todo:
+            outputs = {"file": out, "log": "", "cached": True}
+            if ladder:
+                outputs["renditions"] = dict(ladder)
+            return [ExecResult(step_id=f"S{i}", status="ok", outputs=dict(outputs)) for i, _ in stage.steps]
+        for _, path in todo:
+            if os.path.lexists(path):
+                os.remove(path)  # may be a hardlink into the cache
+        results = self._render_stage(stage, src, todo if ladder else None)
+        if all(r.status == "ok" for r in results):
+            for _, path in todo:
+                if os.path.exists(path):
+                    self.cache.put(keys[path], path)
+        if ladder and len(todo) < len(ladder):
+            skipped = [spec for spec, path in ladder if (spec, path) not in todo]
+            for r in results:
+                r.outputs["cached_renditions"] = skipped
+        return results
+
+    # (action, params) of a step with executor-level inputs resolved
+    def _resolved(self, step):
+        p = normalize_params(step.action, step.params)
+        if step.action == "duck_music":
+            p["music_file"] = p.get("music_file") or self.music
+        return step.action, p
+
+    # Resolved steps of a stage as the cache sees them; with `spec`, the
+    # export_preview params of that one rendition instead of the whole ladder
+    def _stage_steps(self, stage: Stage, spec: str = None):
+        steps = [self._resolved(s) for _, s in stage.steps]
+        action, p = steps[-1]
+        if action == "export_preview":
+            p.pop("ladder", None)
+            if spec:
+                p["quality"], height = fx.parse_rendition(spec)
+                if height:
+                    p["height"] = height
+        return steps
+
+    # (spec, path) of every preview rendition an export_preview step writes,
+    # its own quality into `out` first; None without a ladder
+    def _renditions(self, action: str, params: dict, out: str):
+        ladder = (params or {}).get("ladder") if action == "export_preview" else None
+        if not ladder:
+            return None
+        quality = normalize_params(action, params)["quality"]
+        return [(quality, out)] + [(spec, fx.rendition_file(out, spec))
+                                   for spec in dict.fromkeys(ladder) if spec != quality]
+
+    # Whether an export_preview step streams HLS while it renders ("stream": "hls" or true)
+    def _stream(self, action: str, params: dict) -> bool:
+        return action == "export_preview" and (params or {}).get("stream") in (True, "hls")
+
+    # Playlist of a streamed render and how many segments it lists
+    def _stream_outputs(self, outputs: dict, meta: dict):
+        if meta.get("manifest"):
+            outputs["manifest"] = meta["manifest"]
+            outputs["segments"] = fx.stream_progress(meta["manifest"])[0]
+
+    def _render_stage(self, stage: Stage, src: str, renditions=None) -> List[ExecResult]:
+        # Chunking and LUT baking both happen in the fused renderer
+        if stage.fused or (stage.video_only and (self.workers > 1 or self.bake_size)):
+            return self._do_fused(stage, src, renditions)
+        i, step = stage.steps[0]
+        fn = self.registry.get(step.action)
+        if not fn:
+            return [ExecResult(step_id=f"S{i}", status="error", outputs={}, error=f"Unknown action {step.action}")]
+        # Run the function corresponding to this action
+        kwargs = {"renditions": renditions} if step.action == "export_preview" else {}
+        return [fn(i, normalize_params(step.action, step.params), src, stage.final, **kwargs)]
+
+    # A fused (or chunked) stage renders once; every step in it reports that shared run
+    def _do_fused(self, stage: Stage, src: str, renditions=None) -> List[ExecResult]:
+        last_i, last_step = stage.steps[-1]
+        venc, ext = self._target(stage.final)
+        out = self._outfile(LABELS[last_step.action], last_i, ext)
+        steps = [(s.action, s.params) for _, s in stage.steps]
+        renditions = renditions or self._renditions(last_step.action, last_step.params, out)
+        stream = self._stream(last_step.action, last_step.params)
+        if renditions or stream:
+            # A ladder splits the one filtered stream into every rendition, and
+            # a streamed preview must be written front to back: never chunked
+            meta = fx.render_fused(src, out, steps, venc=venc, bake=self.bake_size,
+                                   zoom_engine=self.zoom_engine, renditions=renditions,
+                                   stream=stream and not renditions)
+        elif self.workers > 1:
+            # src is the trimmed segment, the proxy or an intermediate: the
+            # shot cuts come from the analyzed source, on the segment's timeline
+            meta = render_chunked(src, out, steps,
+                                  workers=self.workers, chunk_s=self.chunk_s, venc=venc,
+                                  bake=self.bake_size, zoom_engine=self.zoom_engine,
+                                  scenes=scene_cuts(self.source, self.segment))
+        else:
+            meta = fx.render_fused(src, out, steps, venc=venc,
+                                   bake=self.bake_size, zoom_engine=self.zoom_engine)
+        status = "ok" if meta["code"] == 0 else "error"
+        outputs = {"file": out, "log": meta["log"]}
+        if stage.fused:
+            outputs["fused"] = [f"S{i}" for i, _ in stage.steps]
+        if "chunks" in meta:
+            outputs["chunks"] = meta["chunks"]
+        ladder = self._renditions(last_step.action, last_step.params, out)
+        if ladder:
+            outputs["renditions"] = dict(ladder)
+        self._stream_outputs(outputs, meta)
+        return [ExecResult(step_id=f"S{i}", status=status, outputs=dict(outputs),
+                           error=None if status=="ok" else "ffmpeg error")
+                for i, _ in stage.steps]
+
     # Helper to build output filenames
-    def _outfile(self, label: str, i: int) -> str:
-        return os.path.join(self.out_dir, f"step_{i:02d}_{label}.mp4")
+    def _outfile(self, label: str, i: int, ext: str = ".mp4") -> str:
+        return os.path.join(self.out_dir, f"step_{i:02d}_{label}{ext}")
+
+    # Encoder override and extension of a stage's output: only final stages
+    # get the delivery encode, the others the intermediate format
+    def _target(self, final: bool):
+        if final or self.intermediate not in fx.INTERMEDIATE_VENC:
+            return self.venc, ".mp4"
+        return fx.INTERMEDIATE_VENC[self.intermediate], ".mkv"
 
     # Each of the following wraps a function from the FFmpeg adapter
 
-    def _do_adjust_color_eq(self, i: int, p: dict) -> ExecResult:
-        out = self._outfile("color", i)
-        meta = fx.adjust_color_eq(self.curr_file, out,
+    def _do_adjust_color_eq(self, i: int, p: dict, src: str, final: bool = True) -> ExecResult:
+        venc, ext = self._target(final)
+        out = self._outfile("color", i, ext)
+        meta = fx.adjust_color_eq(src, out,
                                   brightness=p.get("brightness", 0.0),
                                   contrast=p.get("contrast", 1.0),
                                   saturation=p.get("saturation", 1.0),
                                   temperature=p.get("temperature", "cool"),
-                                  segment=self.segment)
+                                  venc=venc)
         status = "ok" if meta["code"] == 0 else "error"
         return ExecResult(step_id=f"S{i}", status=status, outputs={"file": out, "log": meta["log"]},
                           error=None if status=="ok" else "ffmpeg error")
 
-    def _do_add_keyframe_zoom(self, i: int, p: dict) -> ExecResult:
-        out = self._outfile("zoom", i)
-        meta = fx.add_keyframe_zoom(self.curr_file, out,
+    def _do_add_keyframe_zoom(self, i: int, p: dict, src: str, final: bool = True) -> ExecResult:
+        venc, ext = self._target(final)
+        out = self._outfile("zoom", i, ext)
+        meta = fx.add_keyframe_zoom(src, out,
                                     from_scale=p.get("from_scale", 1.0),
                                     to_scale=p.get("to_scale", 1.05),
                                     duration_s=p.get("duration_s", 5.0),
-                                    segment=self.segment)
+                                    size=p.get("size"),
+                                    venc=venc,
+                                    engine=self.zoom_engine)
         status = "ok" if meta["code"] == 0 else "error"
         return ExecResult(step_id=f"S{i}", status=status, outputs={"file": out, "log": meta["log"]},
                           error=None if status=="ok" else "ffmpeg error")
 
-    def _do_duck_music(self, i: int, p: dict) -> ExecResult:
-        out = self._outfile("duck", i)
-        music = p.get("music_file", self.music)
+    def _do_duck_music(self, i: int, p: dict, src: str, final: bool = True) -> ExecResult:
+        _, ext = self._target(final)  # the video is stream-copied
+        out = self._outfile("duck", i, ext)
+        music = p.get("music_file") or self.music
         if not music:
             return ExecResult(step_id=f"S{i}", status="error", outputs={}, error="music_file not provided")
-        meta = fx.duck_music(self.curr_file, music, out,
+        meta = fx.duck_music(src, music, out,
                              duck_db=p.get("duck_db", 10),
                              attack_ms=p.get("attack_ms", 200),
                              release_ms=p.get("release_ms", 800),
-                             segment=self.segment)
+                             engine=self.duck_engine)
         status = "ok" if meta["code"] == 0 else "error"
-        return ExecResult(step_id=f"S{i}", status=status, outputs={"file": out, "log": meta["log"]},
+        outputs = {"file": out, "log": meta["log"]}
+        if "regions" in meta:
+            outputs["dialogue"] = meta["regions"]  # (start, end) seconds the music was ducked under
+        return ExecResult(step_id=f"S{i}", status=status, outputs=outputs,
                           error=None if status=="ok" else "ffmpeg error")
 
-    def _do_slog3_to_rec709(self, i: int, p: dict) -> ExecResult:
-        out = self._outfile("slog3_corrected", i)
-        meta = fx.slog3_to_rec709(self.curr_file, out,
-                                  segment=self.segment,
+    def _do_slog3_to_rec709(self, i: int, p: dict, src: str, final: bool = True) -> ExecResult:
+        venc, ext = self._target(final)
+        out = self._outfile("slog3_corrected", i, ext)
+        meta = fx.slog3_to_rec709(src, out,
                                   contrast=p.get("contrast", 1.1),
                                   saturation=p.get("saturation", 1.05),
-                                  brightness=p.get("brightness", 0.02))
+                                  brightness=p.get("brightness", 0.02),
+                                  venc=venc)
         status = "ok" if meta["code"] == 0 else "error"
         return ExecResult(step_id=f"S{i}", status=status, outputs={"file": out, "log": meta["log"]},
                           error=None if status=="ok" else "ffmpeg error")
 
-    def _do_slog3_with_lut(self, i: int, p: dict) -> ExecResult:
-        out = self._outfile("slog3_lut", i)
+    def _do_slog3_with_lut(self, i: int, p: dict, src: str, final: bool = True) -> ExecResult:
+        venc, ext = self._target(final)
+        out = self._outfile("slog3_lut", i, ext)
         lut_file = p.get("lut_file")
         if not lut_file:
             return ExecResult(step_id=f"S{i}", status="error", outputs={}, error="lut_file not provided")
-        meta = fx.slog3_with_lut(self.curr_file, out, lut_file,
-                                segment=self.segment,
-                                intensity=p.get("intensity", 1.0))
+        apply = lut.apply_lut_file if self.lut_engine == "numpy" else fx.slog3_with_lut
+        meta = apply(src, out, lut_file,
+                     intensity=p.get("intensity", 1.0),
+                     venc=venc)
         status = "ok" if meta["code"] == 0 else "error"
         return ExecResult(step_id=f"S{i}", status=status, outputs={"file": out, "log": meta["log"]},
                           error=None if status=="ok" else "ffmpeg error")
 
-    def _do_export_preview(self, i: int, p: dict) -> ExecResult:
-        out = self._outfile("preview", i)
-        meta = fx.export_preview(self.curr_file, out,
-                                 segment=self.segment, quality=p.get("quality", "medium"))
+    def _do_export_preview(self, i: int, p: dict, src: str, final: bool = True,
+                           renditions=None) -> ExecResult:
+        venc, ext = self._target(final)
+        out = self._outfile("preview", i, ext)
+        ladder = self._renditions("export_preview", p, out)
+        if ladder:
+            # One decode for the whole ladder (or the part of it not cached yet)
+            meta = fx.export_ladder(src, renditions or ladder, venc=venc)
+        else:
+            meta = fx.export_preview(src, out,
+                                     quality=p.get("quality", "medium"),
+                                     venc=venc, stream=self._stream("export_preview", p),
+                                     remux=bool(p.get("remux")))
         status = "ok" if meta["code"] == 0 else "error"
-        return ExecResult(step_id=f"S{i}", status=status, outputs={"file": out, "log": meta["log"]},
+        outputs = {"file": out, "log": meta["log"]}
+        if ladder:
+            outputs["renditions"] = dict(ladder)
+        self._stream_outputs(outputs, meta)
+        return ExecResult(step_id=f"S{i}", status=status, outputs=outputs,
                           error=None if status=="ok" else "ffmpeg error")
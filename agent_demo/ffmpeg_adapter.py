@@ -7,58 +7,392 @@ and returns a dictionary describing the results.
 Later, we'll replace this with a Resolve adapter that calls DaVinci's scripting API.
 """
 
-import subprocess, shlex, os
-from typing import Dict, Any, Tuple
+import codecs, contextlib, subprocess, shlex, shutil, os, functools, threading, time
+from typing import Dict, Any, List, Tuple
+from .actions import normalize_params
+from . import logs, media_index, metrics
 
 FFMPEG = "ffmpeg"
-FFPROBE = "ffprobe"
+ADAPTER_VERSION = "5"  # bump whenever a command below changes what gets rendered
 
-# Utility: run a shell command and return (exit_code, output_text)
+# Per-thread override of how commands get run: async_executor.py installs a
+# runner that hands each command to an asyncio event loop instead. `threads`
+# is the thread budget of ffmpeg commands run from this thread (None leaves
+# ffmpeg to size its pools to every core; see thread_budget), `log` the
+# file the full output of those commands goes to (see log_to)
+_local = threading.local()
+
+@contextlib.contextmanager
+def thread_budget(n: int = None):
+    """Cap the threads of every ffmpeg command run from the calling thread (None = no cap)."""
+    prev = getattr(_local, "threads", None)
+    _local.threads = n
+    try:
+        yield
+    finally:
+        _local.threads = prev
+
+# ffmpeg options that take no value (every other option takes the next arg)
+_FLAG_OPTS = {"-y", "-n", "-an", "-vn", "-sn", "-dn", "-shortest", "-nostdin", "-stats", "-nostats",
+              "-hide_banner", "-copyts", "-re"}
+
+# Utility: ffmpeg argv with the calling thread's budget applied: decoder
+# threads per input, filtergraph threads, and encoder threads before every
+# output file. The outputs of a multi-output command (ladders, renditions)
+# encode side by side, so they split the budget between them
+def _thread_args(argv: List[str]) -> List[str]:
+    n = getattr(_local, "threads", None)
+    if not n or len(argv) < 2 or os.path.basename(argv[0]) != os.path.basename(FFMPEG):
+        return argv
+    outputs, k = set(), 1
+    while k < len(argv):
+        a = argv[k]
+        if a.startswith("-") and a != "-":
+            k += 1 if a in _FLAG_OPTS else 2  # the option and its value, if any
+            continue
+        outputs.add(k)  # a positional arg is an output file
+        k += 1
+    if not outputs:
+        return argv
+    each = str(max(1, n // len(outputs)))
+    n = str(n)
+    out = [argv[0], "-filter_threads", n, "-filter_complex_threads", n]
+    for k, a in enumerate(argv[1:], start=1):
+        if a == "-i":
+            out += ["-threads", n]
+        elif k in outputs:
+            out += ["-threads", each]
+        out.append(a)
+    return out
+
+@contextlib.contextmanager
+def log_to(path: str = None):
+    """Append the full output of every command run from the calling thread to a rotating log at path."""
+    prev = getattr(_local, "log", None)
+    sink = logs.RotatingLog(path) if path else None
+    _local.log = sink
+    try:
+        yield sink
+    finally:
+        _local.log = prev
+        if sink:
+            sink.close()
+
+# Utility: tag every ffmpeg log line with its level, so errors and warnings can be picked out
+def _log_args(argv: List[str]) -> List[str]:
+    if (len(argv) < 2 or os.path.basename(argv[0]) != os.path.basename(FFMPEG)
+            or {"-v", "-loglevel"} & set(argv)):
+        return argv
+    return [argv[0], "-loglevel", "level+info", *argv[1:]]
+
+# Utility: run a shell command and return (exit_code, output_text). The
+# output is streamed through a logs.LogCapture: the text returned is its
+# bounded tail, the full output goes to the thread's log_to() file if any
 def _run(cmd: str) -> Tuple[int, str]:
-    proc = subprocess.run(shlex.split(cmd), capture_output=True, text=True)
-    return proc.returncode, (proc.stdout + "\n" + proc.stderr)
+    argv = _log_args(shlex.split(cmd))
+    if getattr(_local, "threads", None):
+        argv = _thread_args(argv)
+    cmd = shlex.join(argv)
+    capture = logs.LogCapture(getattr(_local, "log", None))
+    if capture.sink:
+        capture.sink.write(f"\n$ {cmd}\n")
+    runner = getattr(_local, "runner", None)
+    start, usage = time.time(), None
+    if runner:
+        code = runner(cmd, capture)
+    else:
+        # One pipe for both streams, read as it comes; the child is then
+        # reaped with wait4 for its CPU time and peak RSS
+        proc = subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        with proc.stdout:
+            for chunk in iter(lambda: proc.stdout.read1(65536), b""):
+                capture.feed(decoder.decode(chunk))
+        if hasattr(os, "wait4"):
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+        else:
+            proc.wait()
+        code = proc.returncode
+    capture.close()
+    out = capture.text()
+    run = metrics.measure(argv, start, time.time(), out, usage)
+    run.update(errors=capture.errors, warnings=capture.warnings, stats=capture.stats)
+    metrics.record(run)
+    return code, out
+
+# Utility: first line of `ffmpeg -version`, so cached renders are tied to the build
+@functools.lru_cache(maxsize=None)
+def ffmpeg_version() -> str:
+    try:
+        proc = subprocess.run([FFMPEG, "-version"], capture_output=True, text=True)
+    except OSError:
+        return "unknown"
+    return (proc.stdout.splitlines() or ["unknown"])[0]
+
+# Utility: (width, height) of the first video stream, None if it can't be probed
+def probe_video_size(path: str):
+    info = media_index.probe(path)
+    return (info.width, info.height) if info and info.width else None
+
+# Utility: container duration in seconds, None if it can't be probed
+def probe_duration(path: str):
+    info = media_index.probe(path)
+    return info.duration if info else None
+
+# Utility: real frame rate of the first video stream (30 if unknown)
+def probe_fps(path: str) -> float:
+    info = media_index.probe(path)
+    return info.fps if info and info.fps else 30
+
+# Utility: "00:01:02.5" (or plain seconds) → 62.5
+def parse_timestamp(ts: str) -> float:
+    secs = 0.0
+    for part in ts.strip().split(":"):
+        secs = secs * 60 + float(part)
+    return secs
+
+# Utility: length of a "start-end" segment in seconds
+def segment_seconds(segment: str) -> float:
+    start, end = segment.split("-")
+    return parse_timestamp(end) - parse_timestamp(start)
 
 # Utility: convert "00:00:03-00:00:07" → "-ss 00:00:03 -to 00:00:07"
-def _segment_filter(segment: str) -> str:
+# With input_file, an end past the clip's probed duration is dropped
+def _segment_filter(segment: str, input_file: str = None) -> str:
     if not segment: return ""
     start, end = segment.split("-")
+    duration = probe_duration(input_file) if input_file else None
+    if duration is not None and parse_timestamp(end) >= duration:
+        return f"-ss {start} "
     return f"-ss {start} -to {end} "
 
+# --------------------------------------
+# Filter chains for the video-only actions
+# --------------------------------------
+# Each builder returns the -vf chain of one action. They are shared by the
+# standalone functions below and by render_fused(), which strings several of
+# them into one filtergraph so the clip is decoded and encoded only once.
+
+# The tint of each adjust_color_eq temperature (actions.CHOICES)
+TINTS = {"cool": "colorbalance=bs=0.05:bh=0.03", "warm": "colorbalance=rs=0.05:rh=0.03", "neutral": None}
+
+# Identity parts are left out; a step that changes nothing is a null filter
+def _color_eq_vf(brightness: float, contrast: float, saturation: float, temperature: str) -> str:
+    if temperature not in TINTS:
+        raise ValueError(f"unknown temperature {temperature!r} (use one of {tuple(TINTS)})")
+    vf = []
+    if (brightness, contrast, saturation) != (0, 1, 1):
+        vf.append(f"eq=brightness={brightness}:contrast={contrast}:saturation={saturation}")
+    if TINTS[temperature]:
+        vf.append(TINTS[temperature])
+    return ",".join(vf) or "null"
+
+# Ways add_keyframe_zoom can render: ffmpeg's zoompan, a per-frame scale +
+# fixed crop (sws slice-threaded, subpixel-smooth), or NumPy on piped frames (zoom.py)
+ZOOM_ENGINES = ("zoompan", "scale", "numpy")
+
+def _zoom_vf(from_scale: float, to_scale: float, duration_s: float, fps: float = 30,
+             frame_offset: int = 0, size: str = None, engine: str = "zoompan") -> str:
+    # frame_offset shifts the ramp for a chunk that starts mid-clip (see chunked.py).
+    # size ("WxH") is the output frame size; zoompan would otherwise emit 1280x720
+    s1, s2 = from_scale, to_scale
+    frames = max(1, int(duration_s * fps))
+    if engine == "numpy":
+        raise ValueError("the numpy zoom engine runs in-process (zoom.py), not in a filtergraph")
+    if engine == "scale" and size:
+        # Same ramp and clamp as zoompan (zoom.zoom_schedule), but scale the
+        # whole frame up by z and keep the top-left WxH: no whole-pixel crop steps
+        n = f"(n+{frame_offset})" if frame_offset else "n"
+        z = f"clip(if(eq({n},1),{s1},{s1}+({s2}-{s1})*({n}-1)/{frames}),1,10)"
+        w, h = size.split("x")
+        return (f"scale=w='ceil({w}*{z}/2)*2':h='ceil({h}*{z}/2)*2':eval=frame:threads=0,"
+                f"crop={w}:{h}:0:0")
+    on = f"(on+{frame_offset})" if frame_offset else "on"
+    zp = f"zoompan=z='if(eq({on},1),{s1},{s1}+({s2}-{s1})*({on}-1)/{frames})':d=1:fps={fps}"
+    if size:
+        zp += f":s={size}"
+    return f"{zp},scale=iw:ih"
+
+# Utility: "WxH" of a file, used as the zoompan output size
+def _size_of(path: str) -> str:
+    info = media_index.probe(path)
+    return info.size_str if info else None
+
+def _slog3_vf(contrast: float, saturation: float, brightness: float) -> str:
+    # SLOG3 to Rec709 conversion using colorspace filter
+    # This is a simplified approach - for production, you'd use a proper LUT file
+    return (
+        f"colorspace=all=bt709:iall=bt709,"  # Set output colorspace to Rec709
+        f"eq=contrast={contrast}:saturation={saturation}:brightness={brightness},"
+        f"curves=vintage"  # Apply a gentle S-curve for film-like look
+    )
+
+def _lut_vf(lut_file: str, intensity: float, tag: str = "", interp: str = "trilinear") -> str:
+    # Apply LUT with optional intensity mixing
+    vf = f"lut3d=file='{lut_file}':interp={interp}"
+    if intensity < 1.0:
+        # Blend between original and LUT-applied version; `tag` keeps the
+        # pad labels unique when several of these end up in one graph
+        a, b, lut = f"a{tag}", f"b{tag}", f"lut{tag}"
+        vf = f"split[{a}][{b}];[{a}]{vf}[{lut}];[{b}][{lut}]blend=all_expr='A*{intensity}+B*{1-intensity}'"
+    return vf
+
+# Video encoder settings each action renders with ("" = ffmpeg's default)
+_SLOG3_VENC = "-c:v libx264 -preset slow -crf 18"
+
+PREVIEW_BITRATES = {"low": "1500k", "medium": "4000k", "high": "8000k"}
+
+def _preview_venc(quality: str) -> str:
+    vbit = PREVIEW_BITRATES.get(quality, "4000k")
+    return f"-c:v libx264 -b:v {vbit} -preset veryfast"
+
+# Utility: a preview rendition spec, "quality" or "quality@height": "low@360" -> ("low", 360)
+def parse_rendition(spec: str) -> Tuple[str, int]:
+    quality, _, height = spec.partition("@")
+    return quality, int(height) if height else None
+
+# Utility: where a rendition of out_file goes: step_04_preview.mp4 -> step_04_preview_low_360p.mp4
+def rendition_file(out_file: str, spec: str) -> str:
+    quality, height = parse_rendition(spec)
+    stem, ext = os.path.splitext(out_file)
+    return f"{stem}_{quality}{f'_{height}p' if height else ''}{ext}"
+
+# Utility: filter chains and output args encoding video pad `src` once per
+# (spec, path) rendition. One split feeds every rendition's own scale and
+# encoder, so the source is decoded and filtered once and ffmpeg runs the
+# encoders side by side
+def _ladder_outputs(src: str, renditions: List[Tuple[str, str]], venc: str = None,
+                    audio: bool = True) -> Tuple[List[str], str]:
+    chains, outputs = [], []
+    pads = [src] if len(renditions) == 1 else [f"r{k}" for k in range(len(renditions))]
+    if len(renditions) > 1:
+        chains.append(f"[{src}]split={len(renditions)}" + "".join(f"[{pad}]" for pad in pads))
+    amap = "-map 0:a? -c:a aac" if audio else "-an"
+    for k, (spec, path) in enumerate(renditions):
+        quality, height = parse_rendition(spec)
+        pad = pads[k]
+        if height:
+            chains.append(f"[{pad}]scale=-2:'min(ih,{height})'[o{k}]")  # never upscale
+            pad = f"o{k}"
+        vmap = pad if pad == "0:v" else f'"[{pad}]"'
+        outputs.append(f'-map {vmap} {_enc(_preview_venc(quality), venc)}{amap} "{path}"')
+    return chains, " ".join(outputs)
+
+# Fast settings for proxy media and for renders made from proxies
+PROXY_VENC = "-c:v libx264 -preset ultrafast -tune fastdecode -crf 23"
+
+# Intermediate renders that only the next step decodes: lossless and
+# intra-only, so they cost no quality and are cheap to write and read back
+# (written as .mkv; ffv1 scales with slice threads on many cores)
+INTERMEDIATE_VENC = {
+    "ultrafast": "-c:v libx264 -preset ultrafast -qp 0 -g 1",
+    "ffv1": "-c:v ffv1 -level 3 -g 1 -slices 16 -slicecrc 0",
+}
+
+# Named render profiles: the delivery encoder of every final render (None =
+# each action's own settings) and the codec of intermediates (an
+# INTERMEDIATE_VENC key, or "delivery")
+RENDER_PROFILES = {
+    "draft": {"venc": "-c:v libx264 -preset ultrafast -crf 28", "intermediate": "ultrafast"},
+    "review": {"venc": None, "intermediate": "ultrafast"},
+    "master": {"venc": "-c:v libx264 -preset slow -crf 14", "intermediate": "ffv1"},
+}
+
+# Streamed previews: HLS segment length, in seconds of media
+HLS_SEGMENT_S = 2
+
+# Utility: where the HLS playlist of a streamed render of out_file goes
+# (step_04_preview.mp4 -> step_04_preview_hls/index.m3u8, next to init.mp4 and the segments)
+def stream_manifest(out_file: str) -> str:
+    return os.path.join(os.path.splitext(out_file)[0] + "_hls", "index.m3u8")
+
+# Utility: (segments listed so far, finished) of a streamed render's playlist
+def stream_progress(manifest: str) -> Tuple[int, bool]:
+    try:
+        with open(manifest) as f:
+            text = f.read()
+    except OSError:
+        return 0, False
+    return text.count("#EXTINF"), "#EXT-X-ENDLIST" in text
+
+def _tee_escape(path: str) -> str:
+    return "".join("\\" + c if c in "\\:|[]" else c for c in path)
+
+# Utility: output args of a render into out_file. With stream, the one
+# encode is also muxed (tee) into fMP4 HLS segments whose EVENT playlist is
+# rewritten after every finished segment, so playback can start right away;
+# keyframes are forced on the segment boundaries
+def _output(maps: str, enc: str, out_file: str, stream: bool = False) -> str:
+    if not stream:
+        return f'{maps} {enc}"{out_file}"'
+    manifest = stream_manifest(out_file)
+    hls_dir = os.path.dirname(manifest)
+    shutil.rmtree(hls_dir, ignore_errors=True)  # no segments of an earlier render
+    os.makedirs(hls_dir)
+    hls = (f"f=hls:hls_time={HLS_SEGMENT_S}:hls_playlist_type=event:hls_segment_type=fmp4:"
+           f"hls_flags=independent_segments+temp_file:"
+           f"hls_segment_filename={_tee_escape(os.path.join(hls_dir, 'seg_%05d.m4s'))}")
+    return (f'{maps} {enc}-force_key_frames "expr:gte(t,n_forced*{HLS_SEGMENT_S})" '
+            f'-f tee "[{hls}]{_tee_escape(manifest)}|[f=mp4]{_tee_escape(out_file)}"')
+
+# Utility: encoder args for a command; `override` (e.g. PROXY_VENC) replaces the action's own
+def _enc(default: str, override: str = None) -> str:
+    v = override if override is not None else default
+    return f"{v} " if v else ""
+
 # --------------------------------------
 # Color correction / temperature shift
 # --------------------------------------
 def adjust_color_eq(input_file: str, out_file: str, brightness: float, contrast: float,
-                    saturation: float, temperature: str, segment: str = None) -> Dict[str, Any]:
-    seg = _segment_filter(segment)
-    temp_filter = "colorbalance=bs=0.05:bh=0.03" if temperature == "cool" else "colorbalance=rs=0.05:rh=0.03"
-    vf = f"eq=brightness={brightness}:contrast={contrast}:saturation={saturation},{temp_filter}"
-    cmd = f'{FFMPEG} -y {seg}-i "{input_file}" -vf "{vf}" -c:a copy "{out_file}"'
+                    saturation: float, temperature: str, segment: str = None,
+                    venc: str = None) -> Dict[str, Any]:
+    seg = _segment_filter(segment, input_file)
+    vf = _color_eq_vf(brightness, contrast, saturation, temperature)
+    cmd = f'{FFMPEG} -y {seg}-i "{input_file}" -vf "{vf}" {_enc("", venc)}-c:a copy "{out_file}"'
     code, log = _run(cmd)
     return {"code": code, "log": log, "file": out_file}
 
 # --------------------------------------
-# Add a smooth zoom-in using zoompan
+# Add a smooth zoom-in (zoompan, scale+crop or NumPy; see ZOOM_ENGINES)
 # --------------------------------------
 def add_keyframe_zoom(input_file: str, out_file: str, from_scale: float, to_scale: float,
-                      duration_s: float, segment: str = None, fps: int = 30) -> Dict[str, Any]:
-    seg = _segment_filter(segment)
-    s1, s2 = from_scale, to_scale
-    frames = max(1, int(duration_s * fps))
-    zp = f"zoompan=z='if(eq(on,1),{s1},{s1}+({s2}-{s1})*(on-1)/{frames})':d=1:fps={fps}"
-    cmd = f'{FFMPEG} -y {seg}-i "{input_file}" -vf "{zp},scale=iw:ih" -c:a copy "{out_file}"'
+                      duration_s: float, segment: str = None, fps: float = None,
+                      size: str = None, venc: str = None, engine: str = "zoompan") -> Dict[str, Any]:
+    if engine == "numpy":
+        from . import zoom  # optional numpy dependency
+        return zoom.apply_zoom_file(input_file, out_file, from_scale, to_scale, duration_s,
+                                    segment=segment, fps=fps, size=size, venc=venc)
+    seg = _segment_filter(segment, input_file)
+    # zoompan sets the output rate, so use the clip's real one rather than assuming 30
+    vf = _zoom_vf(from_scale, to_scale, duration_s, fps or probe_fps(input_file),
+                  size=size or _size_of(input_file), engine=engine)
+    cmd = f'{FFMPEG} -y {seg}-i "{input_file}" -vf "{vf}" {_enc("", venc)}-c:a copy "{out_file}"'
     code, log = _run(cmd)
     return {"code": code, "log": log, "file": out_file}
 
 # --------------------------------------
-# Sidechain compression: lower music under dialogue
+# Lower music under dialogue (see DUCK_ENGINES)
 # --------------------------------------
+# Ways duck_music can render: a gain curve precomputed from the dialogue's
+# loudness envelope (dialogue.py, needs numpy), or ffmpeg's sidechaincompress
+DUCK_ENGINES = ("envelope", "sidechain")
+
 def duck_music(input_file: str, music_file: str, out_file: str, duck_db: int,
-               attack_ms: int, release_ms: int, segment: str = None) -> Dict[str, Any]:
-    seg = _segment_filter(segment)
+               attack_ms: int, release_ms: int, segment: str = None,
+               engine: str = "envelope") -> Dict[str, Any]:
+    if engine == "envelope":
+        from . import dialogue  # optional numpy dependency; falls back to sidechain
+        return dialogue.duck_music_file(input_file, music_file, out_file, duck_db, attack_ms, release_ms,
+                                        segment=segment)
+    seg = _segment_filter(segment, input_file)
+    # The dialogue keys the compressor and is then mixed back over the ducked music
     cmd = (f'{FFMPEG} -y {seg}-i "{input_file}" -i "{music_file}" '
-           f'-filter_complex "[1:a][0:a]sidechaincompress=threshold=-20dB:ratio=6:attack={attack_ms}:release={release_ms}:'
-           f'makeup=0:mix=1:sclevel=peak:wet=1[outa]" '
-           f'-map 0:v -map "[outa]" -c:v copy -c:a aac "{out_file}"')
+           f'-filter_complex "[0:a]asplit=2[sc][dlg];'
+           f'[1:a][sc]sidechaincompress=threshold=-20dB:ratio=6:attack={attack_ms}:release={release_ms}:'
+           f'makeup=1:mix=1:detection=peak[ducked];'
+           f'[dlg][ducked]amix=inputs=2:duration=first:normalize=0[outa]" '
+           f'-map 0:v? -map "[outa]" -c:v copy -c:a aac "{out_file}"')
     code, log = _run(cmd)
     return {"code": code, "log": log, "file": out_file}
 
@@ -67,7 +401,7 @@ def duck_music(input_file: str, music_file: str, out_file: str, duck_db: int,
 # --------------------------------------
 def slog3_to_rec709(input_file: str, out_file: str, segment: str = None, 
                     contrast: float = 1.1, saturation: float = 1.05,
-                    brightness: float = 0.02) -> Dict[str, Any]:
+                    brightness: float = 0.02, venc: str = None) -> Dict[str, Any]:
     """
     Convert Sony SLOG3 footage to Rec709 color space with basic correction.
     
@@ -83,21 +417,14 @@ def slog3_to_rec709(input_file: str, out_file: str, segment: str = None,
         contrast: Contrast adjustment (1.0 = no change, >1 = more contrast)
         saturation: Saturation adjustment (1.0 = no change, >1 = more saturated)
         brightness: Brightness adjustment (0.0 = no change, +/- for adjustments)
+        venc: Optional encoder args replacing the default slow/CRF18 encode
     
     Returns:
         Dict with execution status
     """
-    seg = _segment_filter(segment)
-    
-    # SLOG3 to Rec709 conversion using colorspace filter
-    # This is a simplified approach - for production, you'd use a proper LUT file
-    vf = (
-        f"colorspace=all=bt709:iall=bt709,"  # Set output colorspace to Rec709
-        f"eq=contrast={contrast}:saturation={saturation}:brightness={brightness},"
-        f"curves=vintage"  # Apply a gentle S-curve for film-like look
-    )
-    
-    cmd = f'{FFMPEG} -y {seg}-i "{input_file}" -vf "{vf}" -c:v libx264 -preset slow -crf 18 -c:a copy "{out_file}"'
+    seg = _segment_filter(segment, input_file)
+    vf = _slog3_vf(contrast, saturation, brightness)
+    cmd = f'{FFMPEG} -y {seg}-i "{input_file}" -vf "{vf}" {_enc(_SLOG3_VENC, venc)}-c:a copy "{out_file}"'
     code, log = _run(cmd)
     return {"code": code, "log": log, "file": out_file}
 
@@ -105,7 +432,7 @@ def slog3_to_rec709(input_file: str, out_file: str, segment: str = None,
 # SLOG3 with custom LUT application
 # --------------------------------------
 def slog3_with_lut(input_file: str, out_file: str, lut_file: str,
-                   segment: str = None, intensity: float = 1.0) -> Dict[str, Any]:
+                   segment: str = None, intensity: float = 1.0, venc: str = None) -> Dict[str, Any]:
     """
     Apply a custom LUT file to SLOG3 footage.
     
@@ -115,31 +442,168 @@ def slog3_with_lut(input_file: str, out_file: str, lut_file: str,
         lut_file: Path to .cube LUT file
         segment: Optional time segment
         intensity: LUT intensity/mix (0.0-1.0, where 1.0 = full LUT)
+        venc: Optional encoder args replacing the default slow/CRF18 encode
     
     Returns:
         Dict with execution status
     """
-    seg = _segment_filter(segment)
+    seg = _segment_filter(segment, input_file)
     
     if not os.path.exists(lut_file):
         return {"code": 1, "log": f"LUT file not found: {lut_file}", "file": out_file}
     
-    # Apply LUT with optional intensity mixing
-    vf = f"lut3d=file='{lut_file}':interp=trilinear"
-    if intensity < 1.0:
-        # Blend between original and LUT-applied version
-        vf = f"split[a][b];[a]{vf}[lut];[b][lut]blend=all_expr='A*{intensity}+B*{1-intensity}'"
-    
-    cmd = f'{FFMPEG} -y {seg}-i "{input_file}" -vf "{vf}" -c:v libx264 -preset slow -crf 18 -c:a copy "{out_file}"'
+    vf = _lut_vf(lut_file, intensity)
+    cmd = f'{FFMPEG} -y {seg}-i "{input_file}" -vf "{vf}" {_enc(_SLOG3_VENC, venc)}-c:a copy "{out_file}"'
     code, log = _run(cmd)
     return {"code": code, "log": log, "file": out_file}
 
 # --------------------------------------
 # Export a short preview clip
 # --------------------------------------
-def export_preview(input_file: str, out_file: str, segment: str = None, quality: str = "medium") -> Dict[str, Any]:
-    seg = _segment_filter(segment)
-    vbit = {"low":"1500k","medium":"4000k","high":"8000k"}.get(quality,"4000k")
-    cmd = f'{FFMPEG} -y {seg}-i "{input_file}" -c:v libx264 -b:v {vbit} -preset veryfast -c:a aac "{out_file}"'
+def export_preview(input_file: str, out_file: str, segment: str = None, quality: str = "medium",
+                   venc: str = None, stream: bool = False, remux: bool = False) -> Dict[str, Any]:
+    # remux: the input's video is already a compatible H.264 stream; copy it instead of re-encoding
+    seg = _segment_filter(segment, input_file)
+    vcodec = "-c:v copy " if remux else _enc(_preview_venc(quality), venc)
+    out = _output("-map 0:v -map 0:a?", f"{vcodec}-c:a aac ", out_file, stream)
+    code, log = _run(f'{FFMPEG} -y {seg}-i "{input_file}" {out}')
+    meta = {"code": code, "log": log, "file": out_file}
+    if stream:
+        meta["manifest"] = stream_manifest(out_file)
+    return meta
+
+# --------------------------------------
+# Export several preview renditions from one decode
+# --------------------------------------
+def export_ladder(input_file: str, renditions: List[Tuple[str, str]], segment: str = None,
+                  venc: str = None) -> Dict[str, Any]:
+    """
+    Encode several preview renditions of a clip in one ffmpeg run.
+
+    Args:
+        input_file: Input clip
+        renditions: (spec, out_file) pairs; spec is a quality ("low",
+            "medium", "high") with an optional output height ("low@360")
+        segment: Optional time segment
+        venc: Optional encoder args replacing every rendition's bitrate ladder
+
+    Returns:
+        Dict with execution status; "file" is the first rendition's path
+    """
+    seg = _segment_filter(segment, input_file)
+    chains, outputs = _ladder_outputs("0:v", renditions, venc)
+    graph = f'-filter_complex "{";".join(chains)}" ' if chains else ""
+    code, log = _run(f'{FFMPEG} -y {seg}-i "{input_file}" {graph}{outputs}')
+    return {"code": code, "log": log, "file": renditions[0][1]}
+
+# --------------------------------------
+# Combine the video of one file with the audio of another (no re-encode)
+# --------------------------------------
+def mux_streams(video_file: str, audio_file: str, out_file: str,
+                video_segment: str = None, audio_segment: str = None) -> Dict[str, Any]:
+    vseg, aseg = _segment_filter(video_segment), _segment_filter(audio_segment)
+    cmd = (f'{FFMPEG} -y {vseg}-i "{video_file}" {aseg}-i "{audio_file}" '
+           f'-map 0:v -map 1:a? -c copy -shortest "{out_file}"')
+    code, log = _run(cmd)
+    return {"code": code, "log": log, "file": out_file}
+
+# --------------------------------------
+# Low-resolution proxy for interactive iteration
+# --------------------------------------
+def make_proxy(input_file: str, out_file: str, height: int = 540) -> Dict[str, Any]:
+    # Short GOP + fastdecode keeps scrubbing and re-renders cheap
+    cmd = (f'{FFMPEG} -y -i "{input_file}" -vf "scale=-2:{height}" {PROXY_VENC} -g 30 '
+           f'-c:a copy "{out_file}"')
     code, log = _run(cmd)
     return {"code": code, "log": log, "file": out_file}
+
+# --------------------------------------
+# Several video filter steps in one pass
+# --------------------------------------
+def _video_filter(action: str, p: Dict[str, Any], tag: str, frame_offset: int = 0, size: str = None,
+                  fps: float = 30, zoom_engine: str = "zoompan") -> str:
+    if action == "adjust_color_eq":
+        return _color_eq_vf(p["brightness"], p["contrast"], p["saturation"], p["temperature"])
+    if action == "add_keyframe_zoom":
+        return _zoom_vf(p["from_scale"], p["to_scale"], p["duration_s"], fps=fps,
+                        frame_offset=frame_offset, size=p.get("size") or size, engine=zoom_engine)
+    if action == "slog3_to_rec709":
+        return _slog3_vf(p["contrast"], p["saturation"], p["brightness"])
+    if action == "slog3_with_lut":
+        return _lut_vf(p["lut_file"], p["intensity"], tag=tag)
+    raise ValueError(f"{action} is not a fusable video filter")
+
+def render_fused(input_file: str, out_file: str, steps: List[Tuple[str, Dict[str, Any]]],
+                 segment: str = None, frame_offset: int = 0, audio: bool = True,
+                 venc: str = None, bake: int = None, bake_dir: str = None,
+                 zoom_engine: str = "zoompan", renditions: List[Tuple[str, str]] = None,
+                 stream: bool = False) -> Dict[str, Any]:
+    """
+    Run consecutive video filter steps (optionally ending in export_preview)
+    as a single -filter_complex invocation.
+
+    Args:
+        input_file: Input clip
+        out_file: Output file path
+        steps: (action, params) pairs in plan order
+        segment: Optional time segment
+        frame_offset: Index of the input's first frame within the whole clip,
+            for time-dependent filters rendered chunk by chunk
+        audio: Set False to render the video stream only
+        venc: Optional encoder args replacing the ones the steps would pick
+        bake: Lattice size; runs of color steps are baked into one cached
+            3D LUT of this size and applied as a single lut3d (see lut_bake.py)
+        bake_dir: Where baked LUTs are cached (default .lut_cache/)
+        zoom_engine: "zoompan" or "scale" (see ZOOM_ENGINES)
+        renditions: Optional (spec, path) preview renditions (see
+            export_ladder) to encode the filtered video into, all from the
+            one pass, instead of out_file
+        stream: Also write out_file as HLS segments while it renders (see
+            stream_manifest)
+
+    Returns:
+        Dict with execution status
+    """
+    seg = _segment_filter(segment, input_file)
+    chains, step_venc, acodec = [], "", "copy"
+    src = "0:v"
+    # All our filters keep the frame size and rate, so the input's are the zoom's too
+    size = fps = None
+    if any(a == "add_keyframe_zoom" for a, _ in steps):
+        size, fps = _size_of(input_file), probe_fps(input_file)
+    baked, skip = {}, -1
+    if bake:
+        from . import lut_bake  # builds on the filter builders above
+        baked = lut_bake.bake_runs(steps, bake, bake_dir or lut_bake.DEFAULT_CACHE_DIR)
+    for k, (action, params) in enumerate(steps):
+        p = normalize_params(action, params)
+        if action == "export_preview":
+            # The delivery encode: only valid as the last step of the group
+            step_venc, acodec = _preview_venc(p["quality"]), "aac"
+            continue
+        if action in ("slog3_to_rec709", "slog3_with_lut"):
+            step_venc = _SLOG3_VENC
+        if k <= skip:
+            continue  # part of a baked run
+        if k in baked:
+            skip, cube = baked[k]
+            vf = _lut_vf(cube, 1.0, interp="tetrahedral")
+        else:
+            vf = _video_filter(action, p, str(k), frame_offset, size, fps, zoom_engine)
+        dst = f"v{k}"
+        chains.append(f"[{src}]{vf}[{dst}]")
+        src = dst
+    if renditions:
+        ladder, outputs = _ladder_outputs(src, renditions, venc, audio)
+        chains += ladder
+        graph = f'-filter_complex "{";".join(chains)}" ' if chains else ""
+        code, log = _run(f'{FFMPEG} -y {seg}-i "{input_file}" {graph}{outputs}')
+        return {"code": code, "log": log, "file": out_file}
+    graph = f'-filter_complex "{";".join(chains)}" -map "[{src}]"' if chains else "-map 0:v"
+    amap, acodec = ("-map 0:a?", f"-c:a {acodec} ") if audio else ("", "-an ")
+    out = _output(f"{graph} {amap}", f"{_enc(step_venc, venc)}{acodec}", out_file, stream)
+    code, log = _run(f'{FFMPEG} -y {seg}-i "{input_file}" {out}')
+    meta = {"code": code, "log": log, "file": out_file}
+    if stream:
+        meta["manifest"] = stream_manifest(out_file)
+    return meta
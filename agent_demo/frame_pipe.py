@@ -0,0 +1,81 @@
+"""
+Streams raw frames through Python between two ffmpeg processes.
+
+process_frames() decodes the input to rgb24 on one ffmpeg's stdout, hands
+every frame to a callback as a (height, width, 3) uint8 NumPy array, and
+writes the returned frame into a second ffmpeg that encodes it and copies
+the audio over from the input. Used by the engines that do their pixel work
+in-process instead of in an ffmpeg filter (see lut.py, zoom.py).
+"""
+
+import shlex, subprocess, tempfile, time
+from typing import Any, Callable, Dict
+from agent_demo import ffmpeg_adapter as fx
+from . import media_index, metrics
+
+
+def process_frames(input_file: str, out_file: str, fn: Callable[[Any, int], Any],
+                   segment: str = None, venc: str = None, size: str = None) -> Dict[str, Any]:
+    """
+    Run every video frame of input_file through fn(frame, n) into out_file.
+
+    Args:
+        input_file: Input clip
+        out_file: Output file path
+        fn: Called with each frame and its index; returns the frame to encode
+            (uint8 RGB, of the output size)
+        segment: Optional time segment
+        venc: Encoder args for the output ("" = ffmpeg's default)
+        size: Output frame size "WxH", if fn changes it
+
+    Returns:
+        Dict with execution status and the number of frames processed
+    """
+    import numpy as np  # only needed once frames actually flow
+
+    info = media_index.probe(input_file)
+    if not info or not info.width:
+        return {"code": 1, "log": f"could not probe video stream of {input_file}", "file": out_file}
+    w, h, fps = info.width, info.height, info.fps or 30
+    seg = shlex.split(fx._segment_filter(segment, input_file))
+    decode = [fx.FFMPEG, "-v", "error", *seg, "-i", input_file, "-map", "0:v:0",
+              "-f", "rawvideo", "-pix_fmt", "rgb24", "-"]
+    encode = [fx.FFMPEG, "-y", "-v", "error", "-f", "rawvideo", "-pix_fmt", "rgb24",
+              "-s", size or f"{w}x{h}", "-r", f"{fps}", "-i", "-", *seg, "-i", input_file,
+              "-map", "0:v", "-map", "1:a?", *shlex.split(venc or ""), "-pix_fmt", "yuv420p",
+              "-c:a", "copy", out_file]
+
+    frame_bytes = w * h * 3
+    n, start = 0, time.time()
+    # stderr goes to files: a chatty ffmpeg must never block on a full pipe
+    with tempfile.TemporaryFile() as dec_err, tempfile.TemporaryFile() as enc_err:
+        dec = subprocess.Popen(fx._thread_args(decode), stdout=subprocess.PIPE, stderr=dec_err)
+        enc = subprocess.Popen(fx._thread_args(encode), stdin=subprocess.PIPE, stderr=enc_err)
+        error = ""
+        try:
+            while True:
+                buf = dec.stdout.read(frame_bytes)
+                if len(buf) < frame_bytes:
+                    break
+                frame = np.frombuffer(buf, dtype=np.uint8).reshape(h, w, 3)
+                enc.stdin.write(np.ascontiguousarray(fn(frame, n), dtype=np.uint8).tobytes())
+                n += 1
+        except BrokenPipeError:
+            error = "encoder exited early"
+        except Exception as e:  # a failing callback fails this render only
+            error = f"{type(e).__name__}: {e}"
+            dec.kill()
+        finally:
+            dec.stdout.close()
+            try:
+                enc.stdin.close()
+            except BrokenPipeError:
+                pass
+        dec_code, enc_code = dec.wait(), enc.wait()
+        dec_err.seek(0)
+        enc_err.seek(0)
+        log = "\n".join(part for part in (dec_err.read().decode(errors="replace"),
+                                          enc_err.read().decode(errors="replace"), error) if part)
+    code = enc_code or dec_code or (1 if error else 0)
+    metrics.record(metrics.measure(encode, start, time.time(), f"frame={n}"))
+    return {"code": code, "log": log, "file": out_file, "frames": n}
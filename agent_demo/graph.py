@@ -0,0 +1,167 @@
+"""
+Runs a Plan as a dependency graph instead of a strict chain.
+
+Every compiled stage (see compiler.py) becomes a node that declares which
+streams it reads and writes (actions.STREAMS). A node depends only on the
+nodes that last wrote the streams it reads, so the audio-only duck_music
+step no longer waits for the video grade and zoom: both branches start from
+the original input and render side by side. Where a node needs streams
+produced by different branches (e.g. export_preview after a grade and a
+duck), its input is a stream-copy mux of the two; the same mux joins the
+branches at the end of the plan.
+
+A plan with only video steps is a chain in this graph too, so it runs
+exactly as Executor.execute() would.
+
+Up to max_parallel nodes run at once, each on an equal share of the
+Executor's thread budget (Executor.threads). With Executor.check_steps, a
+node's output is checked (verifier.StepVerifier) while other nodes render;
+nodes downstream of one that failed its checks are not started.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Optional
+from .types import Plan, ExecResult
+from .actions import STREAMS
+from .compiler import Stage, compile_plan
+from . import verifier
+from agent_demo import ffmpeg_adapter as fx
+
+SOURCE = -1  # pseudo node id for the (trimmed) input
+_ALL = frozenset("va")
+
+
+@dataclass
+class Node:
+    stage: Stage
+    reads: FrozenSet[str]
+    writes: FrozenSet[str]
+    sources: Dict[str, int] = field(default_factory=dict)  # stream read -> node id that produced it
+
+    @property
+    def deps(self) -> set:
+        return {n for n in self.sources.values() if n != SOURCE}
+
+
+def build_graph(plan: Plan, fuse: bool = True, exclude=()):
+    """Nodes in plan order plus, per stream, the node holding its final version."""
+    nodes: List[Node] = []
+    writer = {st: SOURCE for st in _ALL}
+    for k, stage in enumerate(compile_plan(plan, fuse=fuse, exclude=exclude)):
+        reads, writes = frozenset(), frozenset()
+        for _, step in stage.steps:
+            r, w = STREAMS.get(step.action, (_ALL, _ALL))  # unknown actions: assume everything
+            reads, writes = reads | r, writes | w
+        nodes.append(Node(stage=stage, reads=reads, writes=writes, sources={st: writer[st] for st in reads}))
+        for st in writes:
+            writer[st] = k
+    return nodes, writer
+
+
+def execute_graph(ex, plan: Plan, max_parallel: int = 2) -> List[ExecResult]:
+    """Execute plan on Executor `ex`, running independent branches concurrently."""
+    err = ex._prepare()
+    if err:
+        return [ExecResult(step_id=f"S{i}", status="error", outputs={}, error=err)
+                for i in range(1, len(plan.steps) + 1)]
+    fps = ex._fingerprints(plan)
+    nodes, final = build_graph(plan, fuse=ex.fuse, exclude=ex.native_actions)
+    files: Dict[int, Optional[str]] = {SOURCE: ex.curr_file}  # node id -> output (None = failed)
+    results: List[ExecResult] = []
+    share = max(1, ex.threads // max_parallel)
+    checks = verifier.StepVerifier() if ex.check_steps else None
+    srcs: Dict[int, str] = {}  # node id -> the input it rendered from
+
+    def run_node(k: int) -> List[ExecResult]:
+        with fx.thread_budget(share):
+            return _run_node(k)
+
+    def _run_node(k: int) -> List[ExecResult]:
+        node = nodes[k]
+        step_ids = [i for i, _ in node.stage.steps]
+        if any(files[d] is None for d in node.deps):
+            return [ExecResult(step_id=f"S{i}", status="error", outputs={}, error="upstream step failed")
+                    for i in step_ids]
+        src, mux = _input_for(ex, node.sources, f"{step_ids[0]:02d}_mux_in", files)
+        if src is None:
+            return [ExecResult(step_id=f"S{i}", status="error", outputs={"log": mux["log"]},
+                               error="stream mux failed") for i in step_ids]
+        srcs[k] = src
+        return ex.run_stage(node.stage, src, fps)
+
+    pending = {k: set(n.deps) for k, n in enumerate(nodes)}
+    checked: Dict[int, List[ExecResult]] = {}  # node id -> its results, once submitted for checks
+    with ThreadPoolExecutor(max_workers=max_parallel) as pool:
+        running = {}
+        while pending or running:
+            if checks:
+                bad = [next(k for k, rs in checked.items() if rs is failed) for failed in checks.failed()]
+                for k in set(bad) | (_downstream(nodes, bad) & set(files)):
+                    files[k] = None
+            for k in [k for k, deps in pending.items() if not deps - set(files)]:
+                del pending[k]
+                running[pool.submit(run_node, k)] = k
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                k = running.pop(fut)
+                node_results = fut.result()
+                results.extend(node_results)
+                last = node_results[-1]
+                ok = all(r.status == "ok" for r in node_results) and os.path.exists(last.outputs.get("file", ""))
+                files[k] = last.outputs["file"] if ok else None
+                if checks and ok:
+                    checks.submit(node_results, srcs[k], audio="a" in nodes[k].writes or None)
+                    checked[k] = node_results
+        if checks:
+            # Whatever rendered on top of an output that failed its checks fails too
+            for bad in checks.wait():
+                files[next(k for k, rs in checked.items() if rs is bad)] = None
+            checks.close()
+            for k in _downstream(nodes, [k for k in checked if files[k] is None]):
+                for r in checked.get(k, ()):
+                    if r.status == "ok":
+                        r.status, r.error = "error", "upstream step failed verification"
+                files[k] = None
+            if ex.checkpoints:
+                for k in checked:
+                    if files[k] is None:
+                        for r in checked[k]:
+                            ex.checkpoints.forget(r.step_id)
+
+    results.sort(key=lambda r: int(r.step_id[1:]))
+    # Join the branches: final video and audio may live in different files
+    if nodes and all(files.get(n) for n in final.values()):
+        out, mux = _input_for(ex, final, f"{len(plan.steps) + 1:02d}_final", files, ext=".mp4")
+        if mux is not None:
+            status = "ok" if out else "error"
+            results.append(ExecResult(step_id="mux", status=status,
+                                      outputs={"file": mux["file"], "log": mux["log"]},
+                                      error=None if status == "ok" else "ffmpeg error"))
+        if out:
+            ex.curr_file = out
+    return results
+
+
+# Nodes that (transitively) read from any of `roots`
+def _downstream(nodes: List[Node], roots: List[int]) -> set:
+    bad, found = set(roots), set()
+    for k, node in enumerate(nodes):
+        if node.deps & (bad | found):
+            found.add(k)
+    return found
+
+
+# Input file holding the streams in `sources`; muxes (stream copy) when they
+# come from different nodes. Returns (file or None on failure, mux meta or None).
+# Inner muxes are .mkv, which takes any intermediate codec (see Executor.intermediate)
+def _input_for(ex, sources: Dict[str, int], label: str, files: Dict[int, Optional[str]],
+               ext: str = ".mkv"):
+    producers = set(sources.values())
+    if len(producers) <= 1:
+        return files[producers.pop() if producers else SOURCE], None
+    out = os.path.join(ex.out_dir, f"step_{label}{ext}")
+    # The source is already trimmed to the segment (Executor._prepare), like every output
+    meta = fx.mux_streams(files[sources["v"]], files[sources["a"]], out)
+    return (out if meta["code"] == 0 else None), meta
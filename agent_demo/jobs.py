@@ -0,0 +1,389 @@
+"""
+Job service: a durable queue of edit requests and the workers that render them.
+
+    python -m agent_demo.jobs submit --input clip.mp4 --goal "cold cinematic look" --priority 5
+    python -m agent_demo.jobs serve --workers 2 --concurrency 2
+    python -m agent_demo.jobs status [JOB_ID]
+    python -m agent_demo.jobs stats
+
+Jobs (a TaskSpec, optionally with a ready Plan) live in a sqlite store
+(.jobs.sqlite, or $VIBE_JOBS), so queued work survives restarts. serve()
+starts long-lived worker processes; each one claims up to `concurrency`
+jobs at a time, highest priority first, then oldest. A claim is a lease
+that the worker renews while it renders. When a worker dies, its jobs'
+leases run out and another worker takes them over. Every job renders
+into its own directory with step checkpoints (see checkpoints.py), so a
+job taken over resumes from its last finished stage instead of starting
+again. A failed job is retried, after a growing delay, until it has had
+max_attempts tries.
+
+stats() reports queue depth per status, wait time (submitted → first
+started) and throughput over a recent window.
+"""
+
+import argparse, json, multiprocessing, os, signal, socket, sqlite3, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional
+from agent_demo.types import TaskSpec, Plan
+from agent_demo.batch import _run_clip
+
+DEFAULT_STORE = os.environ.get("VIBE_JOBS", ".jobs.sqlite")
+LEASE_S = 60            # a claimed job goes back to the queue this long after its worker's last heartbeat
+POLL_S = 1.0            # how often an idle worker looks for work
+RETRY_BACKOFF_S = 5.0   # delay before retry n is n times this
+STATUSES = ("queued", "running", "done", "failed", "cancelled")
+
+_SCHEMA = """CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user TEXT, priority INTEGER NOT NULL DEFAULT 0, status TEXT NOT NULL,
+    task TEXT NOT NULL, plan TEXT, options TEXT NOT NULL, out_dir TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0, max_attempts INTEGER NOT NULL,
+    worker TEXT, lease_until REAL, not_before REAL NOT NULL DEFAULT 0,
+    submitted REAL NOT NULL, started REAL, finished REAL, result TEXT, error TEXT)"""
+
+
+class JobQueue:
+    def __init__(self, store: str = DEFAULT_STORE, out_root: str = "outputs/jobs"):
+        self.store = store
+        self.out_root = out_root
+        db = self._db()
+        try:
+            db.execute("PRAGMA journal_mode=WAL")  # readers (status, stats) never block the workers
+            db.execute(_SCHEMA)
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority, id)")
+            db.commit()
+        finally:
+            db.close()
+
+    def _db(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.store, timeout=30, isolation_level=None)  # explicit transactions
+        db.row_factory = sqlite3.Row
+        return db
+
+    def submit(self, task: TaskSpec, plan: Plan = None, priority: int = 0, user: str = None,
+               max_attempts: int = 3, **options) -> int:
+        """
+        Queue an edit request.
+
+        Args:
+            task: Goal and targets (input, segment, music)
+            plan: Steps to run; planned from task.goal when the job runs if omitted
+            priority: Higher runs first
+            user: Who asked (for status listings)
+            max_attempts: Tries before the job is marked failed
+            options: Executor settings (profile, cache_dir)
+
+        Returns:
+            The job id
+        """
+        db = self._db()
+        try:
+            db.execute("BEGIN IMMEDIATE")  # no worker sees the job before its out_dir is set
+            cur = db.execute("INSERT INTO jobs (user, priority, status, task, plan, options, max_attempts, submitted) "
+                             "VALUES (?, ?, 'queued', ?, ?, ?, ?, ?)",
+                             (user, priority, json.dumps(asdict(task)),
+                              json.dumps(plan.to_dict()) if plan else None, json.dumps(options),
+                              max_attempts, time.time()))
+            job_id = cur.lastrowid
+            # Fixed per job, so a retry or a takeover finds the checkpoints of earlier attempts
+            db.execute("UPDATE jobs SET out_dir = ? WHERE id = ?",
+                       (os.path.join(self.out_root, f"job_{job_id:06d}"), job_id))
+            db.execute("COMMIT")
+            return job_id
+        finally:
+            db.close()
+
+    def claim(self, worker: str, lease_s: float = LEASE_S) -> Optional[Dict[str, Any]]:
+        """Take the next ready job (or one whose worker's lease ran out); None if there is none."""
+        now = time.time()
+        db = self._db()
+        try:
+            db.execute("BEGIN IMMEDIATE")  # one claimer at a time across processes
+            while True:
+                row = db.execute("SELECT * FROM jobs WHERE (status = 'queued' AND not_before <= ?) "
+                                 "OR (status = 'running' AND lease_until < ?) "
+                                 "ORDER BY priority DESC, id LIMIT 1", (now, now)).fetchone()
+                if row is None or row["status"] == "queued" or row["attempts"] < row["max_attempts"]:
+                    break
+                # Its worker died on the last attempt (OOM, crash): don't hand it to the next one
+                db.execute("UPDATE jobs SET status = 'failed', finished = ?, worker = NULL, lease_until = NULL, "
+                           "error = ? WHERE id = ?",
+                           (now, f"lease expired on attempt {row['attempts']} of {row['max_attempts']} "
+                                 f"(worker {row['worker']} died)", row["id"]))
+            if row is None:
+                db.execute("COMMIT")
+                return None
+            db.execute("UPDATE jobs SET status = 'running', worker = ?, lease_until = ?, attempts = attempts + 1, "
+                       "started = COALESCE(started, ?) WHERE id = ?", (worker, now + lease_s, now, row["id"]))
+            db.execute("COMMIT")
+        except BaseException:
+            if db.in_transaction:
+                db.execute("ROLLBACK")
+            raise
+        finally:
+            db.close()
+        job = dict(row)
+        job["attempts"] += 1
+        return job
+
+    def heartbeat(self, job_ids: List[int], worker: str, lease_s: float = LEASE_S):
+        """Extend the leases of the jobs `worker` is rendering."""
+        if not job_ids:
+            return
+        db = self._db()
+        try:
+            db.executemany("UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                           [(time.time() + lease_s, i, worker) for i in job_ids])
+        finally:
+            db.close()
+
+    def finish(self, job: Dict[str, Any], worker: str, record: Dict[str, Any]):
+        """Store a job's outcome; a failed one goes back to the queue while it has attempts left."""
+        now = time.time()
+        ok = record.get("status") == "ok"
+        error = None if ok else "; ".join(": ".join(map(str, i)) for i in record.get("issues", []))[:2000]
+        retry = not ok and job["attempts"] < job["max_attempts"]
+        db = self._db()
+        try:
+            # Only the worker holding the job may finish it (not after a takeover or a cancel)
+            db.execute("UPDATE jobs SET status = ?, finished = ?, result = ?, error = ?, worker = NULL, "
+                       "lease_until = NULL, not_before = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                       ("queued" if retry else "done" if ok else "failed", None if retry else now,
+                        json.dumps(record), error, now + RETRY_BACKOFF_S * job["attempts"] if retry else 0,
+                        job["id"], worker))
+        finally:
+            db.close()
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancel a job that hasn't finished; a running render completes but its result is dropped."""
+        db = self._db()
+        try:
+            cur = db.execute("UPDATE jobs SET status = 'cancelled', finished = ?, worker = NULL "
+                             "WHERE id = ? AND status IN ('queued', 'running')", (time.time(), job_id))
+            return cur.rowcount == 1
+        finally:
+            db.close()
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        db = self._db()
+        try:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            db.close()
+        return dict(row) if row else None
+
+    def list(self, status: str = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent jobs first, without their task and result blobs."""
+        db = self._db()
+        try:
+            rows = db.execute("SELECT id, user, priority, status, attempts, worker, submitted, started, finished, "
+                              "out_dir, error FROM jobs WHERE ? IS NULL OR status = ? ORDER BY id DESC LIMIT ?",
+                              (status, status, limit)).fetchall()
+        finally:
+            db.close()
+        return [dict(r) for r in rows]
+
+    def stats(self, window_s: float = 3600) -> Dict[str, Any]:
+        """
+        Queue health.
+
+        Returns:
+            Dict with jobs per status ("depth"), the age of the oldest
+            queued job, and over the last window_s seconds: wait time of
+            the jobs started, run time of the jobs finished and throughput
+            (finished jobs per hour)
+        """
+        now = time.time()
+        since = now - window_s
+        db = self._db()
+        try:
+            depth = dict(db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            oldest = db.execute("SELECT MIN(submitted) FROM jobs WHERE status = 'queued'").fetchone()[0]
+            wait = db.execute("SELECT AVG(started - submitted), MAX(started - submitted) FROM jobs "
+                              "WHERE started >= ?", (since,)).fetchone()
+            run = db.execute("SELECT COUNT(*), AVG(finished - started), SUM(status = 'done') FROM jobs "
+                             "WHERE finished >= ? AND status IN ('done', 'failed')", (since,)).fetchone()
+        finally:
+            db.close()
+        r = lambda v: round(v, 3) if v is not None else None
+        return {"depth": {s: depth.get(s, 0) for s in STATUSES},
+                "oldest_queued_s": r(now - oldest) if oldest else None,
+                "wait_avg_s": r(wait[0]), "wait_max_s": r(wait[1]),
+                "run_avg_s": r(run[1]), "finished": run[0], "done": run[2] or 0,
+                "throughput_per_h": r(run[0] * 3600 / window_s), "window_s": window_s}
+
+
+# --------------------------------------
+# Workers
+# --------------------------------------
+def _job_spec(job: Dict[str, Any], threads: int) -> Dict[str, Any]:
+    # The same plain job dict batch.py's pool workers take
+    task, options = json.loads(job["task"]), json.loads(job["options"])
+    targets = task.get("targets", {})
+    return {"input": targets.get("input"), "out_dir": job["out_dir"], "goal": task.get("goal"),
+            "plan": json.loads(job["plan"]) if job["plan"] else None,
+            "segment": targets.get("segment"), "music": targets.get("music"),
+            "cache_dir": options.get("cache_dir", ".render_cache"), "profile": options.get("profile", "review"),
+            "threads": threads, "optimize": options.get("optimize", True)}
+
+
+def work(store: str, out_root: str, concurrency: int = 1, threads: int = None, lease_s: float = LEASE_S,
+         stop: threading.Event = None):
+    """
+    Worker loop: render up to `concurrency` claimed jobs at a time until
+    `stop` is set (or forever). Runs in a serve() worker process.
+    """
+    queue = JobQueue(store, out_root)
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    share = max(1, (threads or os.cpu_count() or 1) // concurrency)  # thread budget of each job
+    stop = stop or threading.Event()
+    drained = threading.Event()  # set once every job in hand has finished: heartbeats go on until then
+    active: Dict[int, Dict[str, Any]] = {}
+    lock = threading.Lock()
+
+    def heartbeat():
+        while not drained.wait(lease_s / 3):
+            with lock:
+                ids = list(active)
+            queue.heartbeat(ids, name, lease_s)
+
+    def run(job):
+        try:
+            record = _run_clip(_job_spec(job, share))
+        except Exception as e:  # never lose the job to a worker-side error
+            record = {"status": "error", "issues": [["worker", f"{type(e).__name__}: {e}"]]}
+        record["attempt"] = job["attempts"]
+        queue.finish(job, name, record)
+        with lock:
+            del active[job["id"]]
+
+    threading.Thread(target=heartbeat, daemon=True).start()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            while not stop.is_set():
+                with lock:
+                    busy = len(active)
+                job = queue.claim(name, lease_s) if busy < concurrency else None
+                if job is None:
+                    stop.wait(POLL_S)
+                    continue
+                with lock:
+                    active[job["id"]] = job
+                pool.submit(run, job)
+        # Leaving the with block waited for the jobs in hand
+    finally:
+        drained.set()
+
+
+def _worker_main(store: str, out_root: str, concurrency: int, threads: int, lease_s: float):
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())  # finish the jobs in hand, claim no more
+    signal.signal(signal.SIGINT, signal.SIG_IGN)          # the supervisor decides when to stop
+    work(store, out_root, concurrency, threads, lease_s, stop)
+
+
+def serve(store: str = DEFAULT_STORE, out_root: str = "outputs/jobs", workers: int = 2, concurrency: int = 1,
+          threads: int = None, lease_s: float = LEASE_S):
+    """
+    Run `workers` worker processes until interrupted, restarting any that die.
+
+    Args:
+        store: Job store
+        out_root: Where job output directories go
+        workers: Worker processes
+        concurrency: Jobs each worker renders at a time
+        threads: CPU threads shared by all jobs (default: all cores)
+        lease_s: How long a dead worker's jobs stay claimed
+    """
+    JobQueue(store, out_root)  # create the store before the workers race to
+    signal.signal(signal.SIGTERM, signal.default_int_handler)  # stop like on Ctrl-C
+    share = max(1, (threads or os.cpu_count() or 1) // workers)
+    args = (store, out_root, concurrency, share, lease_s)
+    procs: List[multiprocessing.Process] = []
+    try:
+        while True:
+            procs = [p for p in procs if p.is_alive()]
+            for _ in range(workers - len(procs)):
+                p = multiprocessing.Process(target=_worker_main, args=args, daemon=False)
+                p.start()
+                procs.append(p)
+            time.sleep(POLL_S)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for p in procs:
+            p.terminate()  # SIGTERM: each worker finishes what it is rendering
+        for p in procs:
+            p.join()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Queue edit requests and render them with long-lived workers")
+    ap.add_argument("--store", default=DEFAULT_STORE, help="Job store (sqlite)")
+    ap.add_argument("--out-dir", default="outputs/jobs", help="Root of the per-job output directories")
+    sub = ap.add_subparsers(dest="command", required=True)
+    sp = sub.add_parser("submit", help="Queue an edit request")
+    sp.add_argument("--input", required=True, help="Input video file path")
+    src = sp.add_mutually_exclusive_group(required=True)
+    src.add_argument("--goal", help="Natural language goal, planned when the job runs")
+    src.add_argument("--plan", help="Serialized plan JSON ({\"steps\": [...]})")
+    sp.add_argument("--segment", default=None, help="Time range, e.g. 00:00:00-00:00:10")
+    sp.add_argument("--music", default=None, help="Optional background music file")
+    sp.add_argument("--priority", type=int, default=0, help="Higher runs first")
+    sp.add_argument("--user", default=os.environ.get("USER"), help="Who the job is for")
+    sp.add_argument("--max-attempts", type=int, default=3, help="Tries before the job is marked failed")
+    sp.add_argument("--profile", choices=["draft", "review", "master"], default="review",
+                    help="Render profile: encoder settings of final and intermediate renders")
+    sp.add_argument("--no-cache", action="store_true", help="Don't use the shared render cache")
+    sp.add_argument("--no-optimize", action="store_true", help="Run the plan as planned (see optimizer.py)")
+    sv = sub.add_parser("serve", help="Run worker processes until interrupted")
+    sv.add_argument("--workers", type=int, default=2, help="Worker processes")
+    sv.add_argument("--concurrency", type=int, default=1, help="Jobs each worker renders at a time")
+    sv.add_argument("--threads", type=int, default=None, help="CPU threads for all jobs (default: all cores)")
+    sv.add_argument("--lease", type=float, default=LEASE_S, help="Seconds before a dead worker's jobs are retaken")
+    st = sub.add_parser("status", help="List recent jobs, or show one")
+    st.add_argument("job_id", type=int, nargs="?", help="Job to show")
+    st.add_argument("--state", choices=STATUSES, default=None, help="Only jobs in this state")
+    sub.add_parser("stats", help="Queue depth, wait time and throughput")
+    cn = sub.add_parser("cancel", help="Cancel a queued or running job")
+    cn.add_argument("job_id", type=int)
+    args = ap.parse_args()
+
+    if args.command == "serve":
+        print(f"Serving {args.store} with {args.workers} worker(s) × {args.concurrency} (Ctrl-C to stop)")
+        serve(args.store, args.out_dir, args.workers, args.concurrency, args.threads, args.lease)
+        return
+    queue = JobQueue(args.store, args.out_dir)
+    if args.command == "submit":
+        plan = None
+        if args.plan:
+            with open(args.plan) as f:
+                plan = Plan.from_dict(json.load(f))
+        task = TaskSpec(goal=args.goal or "", targets={"input": os.path.abspath(args.input),
+                                                      "segment": args.segment,
+                                                      "music": os.path.abspath(args.music) if args.music else None})
+        job_id = queue.submit(task, plan, priority=args.priority, user=args.user,
+                              max_attempts=args.max_attempts, profile=args.profile,
+                              cache_dir="" if args.no_cache else ".render_cache",
+                              optimize=not args.no_optimize)
+        print(job_id)
+    elif args.command == "status" and args.job_id is not None:
+        job = queue.get(args.job_id)
+        if job is None:
+            ap.error(f"no job {args.job_id}")
+        for key in ("task", "plan", "options", "result"):
+            job[key] = json.loads(job[key]) if job[key] else None
+        print(json.dumps(job, indent=2))
+    elif args.command == "status":
+        for j in queue.list(args.state):
+            print(f"{j['id']:>6} {j['status']:<9} p{j['priority']:<3} {j['user'] or '-':<10} "
+                  f"try {j['attempts']} {j['out_dir']}" + (f"  {j['error'][:80]}" if j["error"] else ""))
+    elif args.command == "stats":
+        print(json.dumps(queue.stats(), indent=2))
+    elif args.command == "cancel":
+        print("cancelled" if queue.cancel(args.job_id) else f"job {args.job_id} is not queued or running")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Bounded capture of ffmpeg output.
+
+ffmpeg_adapter._run() streams a command's output through a LogCapture
+instead of buffering it: only the last LOG_TAIL_LINES lines are kept (the
+tail is what an error report needs), errors and warnings are picked out as
+they go by (ffmpeg is run with -loglevel level+info, so every line carries
+its level) and of the progress lines only the final stats line survives.
+The complete output goes to a RotatingLog, one per step, when the Executor
+opened one (see ffmpeg_adapter.log_to).
+"""
+
+import os, re
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+LOG_TAIL_LINES = 200
+MAX_ISSUES = 20                   # errors / warnings kept per command
+LOG_MAX_BYTES = 5 * 1024 * 1024   # a step's log rotates past this size...
+LOG_BACKUPS = 2                   # ...keeping this many older files (.1, .2)
+_MAX_PARTIAL = 64 * 1024          # longest unterminated line held back
+
+_LINE_END = re.compile(r"[\r\n]")
+_LEVEL = re.compile(r"\[(panic|fatal|error|warning)\]")
+_STATS = re.compile(r"^(\[info\] )?(frame|size)=")
+
+
+class RotatingLog:
+    """Append-only text file that rolls over to path.1, path.2, ... past max_bytes."""
+
+    def __init__(self, path: str, max_bytes: int = LOG_MAX_BYTES, backups: int = LOG_BACKUPS):
+        self.path, self.max_bytes, self.backups = path, max_bytes, backups
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._f = open(path, "a", encoding="utf-8", errors="replace")
+
+    def write(self, text: str):
+        if self._f.tell() and self._f.tell() + len(text) > self.max_bytes:
+            self._rotate()
+        self._f.write(text)
+
+    def _rotate(self):
+        self._f.close()
+        for k in range(self.backups, 0, -1):
+            src = self.path if k == 1 else f"{self.path}.{k - 1}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{k}")
+        self._f = open(self.path, "a", encoding="utf-8", errors="replace")
+
+    def close(self):
+        self._f.close()
+
+
+class LogCapture:
+    """Consumes one command's output chunk by chunk, keeping only what is bounded."""
+
+    def __init__(self, sink: Optional[RotatingLog] = None, tail_lines: int = LOG_TAIL_LINES):
+        self.sink = sink
+        self.tail = deque(maxlen=tail_lines)
+        self.errors: List[str] = []
+        self.warnings: List[str] = []
+        self.stats: Optional[str] = None  # ffmpeg's last "frame=... speed=..." line
+        self._partial = ""
+
+    def feed(self, text: str):
+        if self.sink:
+            self.sink.write(text)
+        lines = _LINE_END.split(self._partial + text)
+        self._partial = lines.pop()[-_MAX_PARTIAL:]
+        for line in lines:
+            self._line(line)
+
+    def close(self):
+        if self._partial:
+            self._line(self._partial)
+            self._partial = ""
+
+    def _line(self, line: str):
+        line = line.rstrip()
+        if not line:
+            return
+        if _STATS.match(line):
+            self.stats = line
+            return
+        m = _LEVEL.search(line)
+        if m:
+            issues = self.warnings if m.group(1) == "warning" else self.errors
+            if len(issues) < MAX_ISSUES:
+                issues.append(line)
+        self.tail.append(line)
+
+    def text(self) -> str:
+        """The tail, with the final stats line last."""
+        return "\n".join(list(self.tail) + ([self.stats] if self.stats else []))
+
+
+def tail(text: str, lines: int = LOG_TAIL_LINES) -> str:
+    """Last `lines` lines of text (e.g. the joined logs of a chunked render)."""
+    parts = (text or "").splitlines()
+    return "\n".join(parts[-lines:])
+
+
+def issues(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Errors, warnings and the final stats line of a stage's runs (see metrics.py)."""
+    errors = [e for r in runs for e in r.get("errors", ())][:MAX_ISSUES]
+    warnings = [w for r in runs for w in r.get("warnings", ())][:MAX_ISSUES]
+    stats = next((r["stats"] for r in reversed(runs) if r.get("stats")), None)
+    return {"errors": errors, "warnings": warnings, "stats": stats}
@@ -0,0 +1,227 @@
+"""
+Native 3D-LUT engine.
+
+Parses .cube files into NumPy tables and applies them to raw RGB frames
+streamed through Python (see frame_pipe.py), with trilinear or tetrahedral
+interpolation. Parsed tables are kept in an LRU cache keyed on the file's
+path, size and mtime, so a LUT is read once per process however many steps,
+chunks or clips use it.
+
+LUT intensity is applied by mixing the table with the identity LUT once,
+when it is loaded. A partial-strength LUT then costs exactly as much per
+frame as a full one, where ffmpeg's split/lut3d/blend graph evaluates a
+blend expression for every pixel.
+
+NumPy is optional: it is imported on first use. The Executor only routes
+LUT steps here with lut_engine="numpy".
+"""
+
+import functools, os
+from dataclasses import dataclass
+from typing import Any, Dict, Tuple
+from agent_demo import ffmpeg_adapter as fx
+from .frame_pipe import process_frames
+
+INTERPOLATIONS = ("trilinear", "tetrahedral")
+LUT_CACHE_SIZE = 8  # parsed (and pre-blended) tables kept per process
+BLOCK_PIXELS = 1 << 16  # pixels interpolated per pass
+
+
+def _np():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("the native LUT, zoom and ducking engines need numpy (pip install numpy)") from None
+    return numpy
+
+
+def available() -> bool:
+    """True when numpy can be imported."""
+    try:
+        _np()
+    except RuntimeError:
+        return False
+    return True
+
+
+@dataclass
+class Lut3D:
+    size: int
+    table: Any  # float32 array (size, size, size, 3) indexed [r, g, b]
+    domain_min: Tuple[float, float, float] = (0.0, 0.0, 0.0)
+    domain_max: Tuple[float, float, float] = (1.0, 1.0, 1.0)
+    title: str = ""
+
+
+# --------------------------------------
+# .cube files
+# --------------------------------------
+def parse_cube(path: str) -> Lut3D:
+    """Read a 3D .cube file (Adobe/Resolve format)."""
+    np = _np()
+    size, title = None, ""
+    dmin, dmax = (0.0, 0.0, 0.0), (1.0, 1.0, 1.0)
+    rows = []
+    with open(path) as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            key, _, rest = line.partition(" ")
+            if key == "TITLE":
+                title = rest.strip().strip('"')
+            elif key == "LUT_3D_SIZE":
+                size = int(rest)
+            elif key == "DOMAIN_MIN":
+                dmin = tuple(float(v) for v in rest.split())
+            elif key == "DOMAIN_MAX":
+                dmax = tuple(float(v) for v in rest.split())
+            elif key == "LUT_1D_SIZE":
+                raise ValueError(f"{path}: 1D LUTs are not supported")
+            elif key[0].isdigit() or key[0] in "+-.":
+                rows.append(line)
+            # other keywords (LUT_3D_INPUT_RANGE, ...) don't change the table
+    if not size:
+        raise ValueError(f"{path}: missing LUT_3D_SIZE")
+    values = np.array(" ".join(rows).split(), dtype=np.float32)
+    if values.size != size ** 3 * 3:
+        raise ValueError(f"{path}: expected {size ** 3} entries, found {values.size // 3}")
+    # Red varies fastest in the file, so the raw layout is [b, g, r]
+    table = np.ascontiguousarray(values.reshape(size, size, size, 3).transpose(2, 1, 0, 3))
+    return Lut3D(size=size, table=table, domain_min=dmin, domain_max=dmax, title=title)
+
+
+def write_cube(path: str, lut: Lut3D):
+    """Write lut as a .cube file that ffmpeg's lut3d (and Resolve) can read."""
+    np = _np()
+    with open(path, "w") as f:
+        if lut.title:
+            f.write(f'TITLE "{lut.title}"\n')
+        f.write(f"LUT_3D_SIZE {lut.size}\n")
+        if tuple(lut.domain_min) != (0.0, 0.0, 0.0) or tuple(lut.domain_max) != (1.0, 1.0, 1.0):
+            f.write("DOMAIN_MIN {:.6f} {:.6f} {:.6f}\n".format(*lut.domain_min))
+            f.write("DOMAIN_MAX {:.6f} {:.6f} {:.6f}\n".format(*lut.domain_max))
+        np.savetxt(f, lut.table.transpose(2, 1, 0, 3).reshape(-1, 3), fmt="%.6f")
+
+
+def identity(size: int, domain_min=(0.0, 0.0, 0.0), domain_max=(1.0, 1.0, 1.0)) -> Lut3D:
+    np = _np()
+    grid = np.linspace(0.0, 1.0, size, dtype=np.float32)
+    r, g, b = np.meshgrid(grid, grid, grid, indexing="ij")
+    lo, hi = np.asarray(domain_min, np.float32), np.asarray(domain_max, np.float32)
+    table = lo + np.stack([r, g, b], axis=-1) * (hi - lo)
+    return Lut3D(size=size, table=table.astype(np.float32), domain_min=tuple(domain_min),
+                 domain_max=tuple(domain_max))
+
+
+def load_lut(path: str, intensity: float = 1.0) -> Lut3D:
+    """Parsed LUT blended with identity at `intensity`, from the LRU cache when unchanged."""
+    st = os.stat(path)
+    return _load(os.path.abspath(path), st.st_size, st.st_mtime_ns, float(intensity))
+
+
+@functools.lru_cache(maxsize=LUT_CACHE_SIZE)
+def _load(path: str, size: int, mtime_ns: int, intensity: float) -> Lut3D:
+    lut = parse_cube(path)
+    if intensity < 1.0:
+        ident = identity(lut.size, lut.domain_min, lut.domain_max).table
+        lut.table = ident + intensity * (lut.table - ident)
+    lut.table.setflags(write=False)  # shared between every caller of the cache
+    return lut
+
+
+# --------------------------------------
+# Interpolation
+# --------------------------------------
+def apply_lut(frame, lut: Lut3D, interp: str = "tetrahedral"):
+    """Apply lut to a uint8 RGB frame (any shape ending in 3); returns uint8 of the same shape."""
+    np = _np()
+    if interp not in INTERPOLATIONS:
+        raise ValueError(f"unknown interpolation {interp!r} (use one of {INTERPOLATIONS})")
+    n = lut.size
+    # 8-bit input: the grid cell and fraction of every code value come from
+    # 256-entry tables, so no per-pixel float scaling, floor or index math
+    codes = np.arange(256, dtype=np.float32) / 255.0
+    cells, fracs = [], []
+    for c, stride in enumerate((n * n, n, 1)):
+        lo, hi = lut.domain_min[c], lut.domain_max[c]
+        x = np.clip((codes - lo) / (hi - lo) * (n - 1), 0, n - 1).astype(np.float32)
+        cell = np.minimum(np.floor(x), n - 2)
+        cells.append(cell.astype(np.int32) * stride)
+        fracs.append(x - cell)
+    planes = np.ascontiguousarray(lut.table.reshape(-1, 3).T)
+    px = frame.reshape(-1, 3)
+    out = np.empty_like(px)
+    # A block at a time keeps the temporaries in cache: ~1.5x faster than
+    # whole 1080p frames
+    for start in range(0, len(px), BLOCK_PIXELS):
+        block = px[start:start + BLOCK_PIXELS]
+        out[start:start + len(block)] = _interpolate(np, block, cells, fracs, planes, n, interp)
+    return out.reshape(frame.shape)
+
+
+def _interpolate(np, px, cells, fracs, planes, n, interp):
+    nn = n * n
+    fr, fg, fb = (np.take(f, px[:, c]) for c, f in enumerate(fracs))
+    base = np.take(cells[0], px[:, 0]) + np.take(cells[1], px[:, 1]) + np.take(cells[2], px[:, 2])
+    out = np.zeros((3, len(px)), dtype=np.float32)
+
+    def corner(v, w):
+        for c in range(3):
+            out[c] += w * np.take(planes[c], v)
+
+    if interp == "trilinear":
+        for dr, wr in ((0, 1 - fr), (nn, fr)):
+            for dg, wg in ((0, 1 - fg), (n, fg)):
+                for db, wb in ((0, 1 - fb), (1, fb)):
+                    corner(base + (dr + dg + db), wr * wg * wb)
+    else:
+        # Walk from the cell's origin corner to its far corner along the axes
+        # in order of decreasing fraction: the 4 corners of that tetrahedron.
+        # The largest axis is the first maximum and the smallest the last
+        # minimum, so the two differ even when fractions tie
+        f_hi = np.maximum(np.maximum(fr, fg), fb)
+        f_lo = np.minimum(np.minimum(fr, fg), fb)
+        f_mid = fr + fg + fb - f_hi - f_lo
+        s_hi = np.where((fr >= fg) & (fr >= fb), nn, np.where(fg >= fb, n, 1))
+        s_lo = np.where((fb <= fr) & (fb <= fg), 1, np.where(fg <= fr, n, nn))
+        corner(base, 1 - f_hi)
+        corner(base + s_hi, f_hi - f_mid)
+        corner(base + (nn + n + 1 - s_lo), f_mid - f_lo)
+        corner(base + (nn + n + 1), f_lo)
+
+    out *= 255.0
+    out += 0.5
+    np.clip(out, 0, 255, out=out)
+    return out.astype(np.uint8).T
+
+
+# --------------------------------------
+# Drop-in for ffmpeg_adapter.slog3_with_lut
+# --------------------------------------
+def apply_lut_file(input_file: str, out_file: str, lut_file: str, segment: str = None,
+                   intensity: float = 1.0, interp: str = "tetrahedral",
+                   venc: str = None) -> Dict[str, Any]:
+    """
+    Apply a .cube LUT in-process, streaming the frames through NumPy.
+
+    Args:
+        input_file: Input clip
+        out_file: Output file path
+        lut_file: Path to .cube LUT file
+        segment: Optional time segment
+        intensity: LUT intensity/mix (0.0-1.0), pre-blended into the table
+        interp: "tetrahedral" (default) or "trilinear"
+        venc: Optional encoder args replacing the default slow/CRF18 encode
+
+    Returns:
+        Dict with execution status
+    """
+    if not os.path.exists(lut_file):
+        return {"code": 1, "log": f"LUT file not found: {lut_file}", "file": out_file}
+    try:
+        lut = load_lut(lut_file, intensity)
+    except (RuntimeError, ValueError) as e:
+        return {"code": 1, "log": str(e), "file": out_file}
+    return process_frames(input_file, out_file, lambda frame, _: apply_lut(frame, lut, interp),
+                          segment=segment, venc=venc if venc is not None else fx._SLOG3_VENC)
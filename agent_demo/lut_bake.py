@@ -0,0 +1,212 @@
+"""
+Bakes runs of per-pixel color steps into a single 3D LUT.
+
+slog3_to_rec709 is colorspace + eq + curves, adjust_color_eq is eq +
+colorbalance, and a LUT step is lut3d (+ blend): all pure per-pixel color
+transforms, so any run of them is fully described by what it does to a
+lattice of RGB colors. bake() renders an identity lattice (33^3 by default)
+through the run's exact ffmpeg filters once and writes the result as a .cube
+in .lut_cache/, keyed on the steps, their params, referenced LUT contents,
+the lattice size and the ffmpeg build. render_fused(bake=...) then applies
+that run as one tetrahedral lut3d lookup per pixel instead of the chain.
+
+Every lattice color is drawn as a 2x2 block, so chroma subsampling anywhere
+in the chain can't bleed neighbouring lattice colors into each other.
+
+measure_delta_e() compares baked and unbaked renders of a clip (CIEDE2000),
+benchmarks/bake_bench.py the speed.
+"""
+
+import hashlib, json, os, tempfile
+from typing import Any, Dict, List, Optional, Tuple
+from .actions import COLOR_ACTIONS, normalize_params
+from .render_cache import step_signature
+from .lut import _np
+from agent_demo import ffmpeg_adapter as fx
+
+DEFAULT_CACHE_DIR = os.environ.get("VIBE_LUT_CACHE", ".lut_cache")
+DEFAULT_SIZE = 33
+
+
+def color_runs(steps: List[Tuple[str, Dict[str, Any]]]) -> List[Tuple[int, int]]:
+    """(first, last) indices of every run of consecutive bakeable color steps."""
+    runs, start = [], None
+    for k, (action, _) in enumerate(list(steps) + [(None, None)]):
+        if action in COLOR_ACTIONS:
+            start = k if start is None else start
+        elif start is not None:
+            runs.append((start, k - 1))
+            start = None
+    return runs
+
+
+def bake_key(steps: List[Tuple[str, Dict[str, Any]]], size: int) -> str:
+    blob = json.dumps({"steps": [step_signature(a, p) for a, p in steps], "size": size,
+                       "adapter": fx.ADAPTER_VERSION, "ffmpeg": fx.ffmpeg_version()},
+                      sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def bake(steps: List[Tuple[str, Dict[str, Any]]], size: int = DEFAULT_SIZE,
+         cache_dir: str = DEFAULT_CACHE_DIR) -> Optional[str]:
+    """
+    Path of a .cube equivalent to running `steps` (all color actions) in order.
+
+    Args:
+        steps: (action, params) pairs
+        size: Lattice points per axis (33 is plenty for these smooth
+            transforms; 65 for steep LUTs)
+        cache_dir: Where baked .cube files are kept
+
+    Returns:
+        Path of the cached .cube, or None if ffmpeg failed
+    """
+    steps = [(a, normalize_params(a, p)) for a, p in steps]
+    if any(a not in COLOR_ACTIONS for a, _ in steps):
+        raise ValueError("only color actions can be baked into a LUT")
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"{bake_key(steps, size)}_{size}.cube")
+    if os.path.exists(path):
+        return path
+
+    n, w, h = size, 2 * size * size, 2 * size
+    levels = [round(i * 255 / (n - 1)) for i in range(n)]
+    rows = []
+    for b in range(n):
+        row = bytearray()
+        for g in range(n):
+            for r in range(n):
+                row += bytes((levels[r], levels[g], levels[b])) * 2
+        rows += [bytes(row), bytes(row)]
+
+    with tempfile.TemporaryDirectory(dir=cache_dir) as work:
+        lattice, baked = os.path.join(work, "lattice.rgb"), os.path.join(work, "baked.rgb")
+        with open(lattice, "wb") as f:
+            f.write(b"".join(rows))
+        # Enter the chain as yuv420p, like decoded video, so every filter
+        # sees the pixel format it gets in a real render
+        chains, src = ["[0:v]format=yuv420p[in]"], "in"
+        for k, (action, p) in enumerate(steps):
+            chains.append(f"[{src}]{fx._video_filter(action, p, str(k))}[v{k}]")
+            src = f"v{k}"
+        chains.append(f"[{src}]format=rgb24[out]")
+        cmd = (f'{fx.FFMPEG} -y -f rawvideo -pix_fmt rgb24 -s {w}x{h} -i "{lattice}" '
+               f'-filter_complex "{";".join(chains)}" -map "[out]" -frames:v 1 '
+               f'-f rawvideo -pix_fmt rgb24 "{baked}"')
+        code, log = fx._run(cmd)
+        if code != 0 or not os.path.exists(baked) or os.path.getsize(baked) != w * h * 3:
+            return None
+        with open(baked, "rb") as f:
+            data = f.read()
+        # Top-left pixel of every 2x2 block, in .cube order (red fastest)
+        lines = [f"# baked from: {', '.join(a for a, _ in steps)}", f"LUT_3D_SIZE {n}"]
+        for b in range(n):
+            for g in range(n):
+                for r in range(n):
+                    o = ((2 * b) * w + 2 * (g * n + r)) * 3
+                    lines.append(f"{data[o] / 255:.6f} {data[o + 1] / 255:.6f} {data[o + 2] / 255:.6f}")
+        tmp = os.path.join(work, "baked.cube")
+        with open(tmp, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, path)  # atomic: concurrent bakers of the same key are harmless
+    return path
+
+
+def bake_runs(steps: List[Tuple[str, Dict[str, Any]]], size: int = DEFAULT_SIZE,
+              cache_dir: str = DEFAULT_CACHE_DIR) -> Dict[int, Tuple[int, str]]:
+    """{first index: (last index, .cube)} for every color run of steps that baked fine."""
+    baked = {}
+    for first, last in color_runs(steps):
+        cube = bake(steps[first:last + 1], size, cache_dir)
+        if cube:
+            baked[first] = (last, cube)
+    return baked
+
+
+# --------------------------------------
+# Accuracy: CIEDE2000 between baked and unbaked renders
+# --------------------------------------
+def _lab(rgb):
+    np = _np()
+    c = rgb.reshape(-1, 3).astype(np.float64) / 255.0
+    c = np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+    xyz = c @ np.array([[0.4124564, 0.2126729, 0.0193339],
+                        [0.3575761, 0.7151522, 0.1191920],
+                        [0.1804375, 0.0721750, 0.9503041]])
+    xyz /= np.array([0.95047, 1.0, 1.08883])
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    return np.stack([116 * f[:, 1] - 16, 500 * (f[:, 0] - f[:, 1]), 200 * (f[:, 1] - f[:, 2])], axis=1)
+
+
+def delta_e2000(lab1, lab2):
+    """Per-pixel CIEDE2000 between two (N, 3) Lab arrays."""
+    np = _np()
+    L1, a1, b1 = lab1.T
+    L2, a2, b2 = lab2.T
+    c_bar = (np.hypot(a1, b1) + np.hypot(a2, b2)) / 2
+    g = 0.5 * (1 - np.sqrt(c_bar ** 7 / (c_bar ** 7 + 25.0 ** 7)))
+    a1p, a2p = (1 + g) * a1, (1 + g) * a2
+    c1p, c2p = np.hypot(a1p, b1), np.hypot(a2p, b2)
+    h1p = np.degrees(np.arctan2(b1, a1p)) % 360
+    h2p = np.degrees(np.arctan2(b2, a2p)) % 360
+    dL, dC = L2 - L1, c2p - c1p
+    dh = h2p - h1p
+    dh = np.where(dh > 180, dh - 360, np.where(dh < -180, dh + 360, dh))
+    dh = np.where(c1p * c2p == 0, 0, dh)
+    dH = 2 * np.sqrt(c1p * c2p) * np.sin(np.radians(dh / 2))
+    L_bar, c_bar_p = (L1 + L2) / 2, (c1p + c2p) / 2
+    h_sum = h1p + h2p
+    h_bar = np.where(c1p * c2p == 0, h_sum,
+                     np.where(np.abs(h1p - h2p) <= 180, h_sum / 2,
+                              np.where(h_sum < 360, (h_sum + 360) / 2, (h_sum - 360) / 2)))
+    t = (1 - 0.17 * np.cos(np.radians(h_bar - 30)) + 0.24 * np.cos(np.radians(2 * h_bar))
+         + 0.32 * np.cos(np.radians(3 * h_bar + 6)) - 0.20 * np.cos(np.radians(4 * h_bar - 63)))
+    s_l = 1 + 0.015 * (L_bar - 50) ** 2 / np.sqrt(20 + (L_bar - 50) ** 2)
+    s_c = 1 + 0.045 * c_bar_p
+    s_h = 1 + 0.015 * c_bar_p * t
+    r_t = (-2 * np.sqrt(c_bar_p ** 7 / (c_bar_p ** 7 + 25.0 ** 7))
+           * np.sin(np.radians(60 * np.exp(-(((h_bar - 275) / 25) ** 2)))))
+    return np.sqrt((dL / s_l) ** 2 + (dC / s_c) ** 2 + (dH / s_h) ** 2
+                   + r_t * (dC / s_c) * (dH / s_h))
+
+
+def _decode_rgb(path: str, w: int, h: int):
+    np = _np()
+    code, _ = fx._run(f'{fx.FFMPEG} -y -i "{path}" -f rawvideo -pix_fmt rgb24 "{path}.rgb"')
+    if code != 0:
+        return None
+    with open(f"{path}.rgb", "rb") as f:
+        return np.frombuffer(f.read(), dtype=np.uint8).reshape(-1, h, w, 3)
+
+
+def measure_delta_e(input_file: str, steps: List[Tuple[str, Dict[str, Any]]], size: int = DEFAULT_SIZE,
+                    seconds: float = 0.5, cache_dir: str = DEFAULT_CACHE_DIR) -> Optional[Dict[str, float]]:
+    """
+    Render the start of input_file with and without baking and compare them.
+
+    Both renders go through render_fused() with a lossless encoder, so the
+    only difference is the baked LUT. Needs numpy.
+
+    Returns:
+        {"max", "mean", "p99"} CIEDE2000 over every pixel, or None if a render failed
+    """
+    np = _np()
+    size_wh = fx.probe_video_size(input_file)
+    if not size_wh:
+        return None
+    w, h = size_wh
+    with tempfile.TemporaryDirectory() as work:
+        frames = []
+        for name, bake_size in (("ref", None), ("baked", size)):
+            out = os.path.join(work, f"{name}.mkv")
+            meta = fx.render_fused(input_file, out, steps, segment=f"0-{seconds}", audio=False,
+                                   venc="-c:v ffv1", bake=bake_size, bake_dir=cache_dir)
+            rgb = _decode_rgb(out, w, h) if meta["code"] == 0 else None
+            if rgb is None:
+                return None
+            frames.append(rgb)
+        n = min(len(frames[0]), len(frames[1]))
+        # Frame by frame: the float64 Lab temporaries of a whole 4K clip don't fit in memory
+        de = np.concatenate([delta_e2000(_lab(frames[0][k]), _lab(frames[1][k])).astype(np.float32)
+                             for k in range(n)])
+    return {"max": float(de.max()), "mean": float(de.mean()), "p99": float(np.percentile(de, 99))}
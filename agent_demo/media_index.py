@@ -0,0 +1,189 @@
+"""
+Cached media probe index.
+
+probe(path) runs ffprobe once per file and returns a MediaInfo with the
+stream layout, real frame rate, duration, codecs, frame count and the list
+of keyframe timestamps. Results are cached in memory and in a small sqlite
+store on disk, keyed on path + size + mtime, so every adapter function,
+chunked render and verifier check after the first one is free.
+"""
+
+import json, os, sqlite3, subprocess, threading
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List, Optional, Tuple
+
+FFPROBE = "ffprobe"
+DEFAULT_STORE = os.environ.get("VIBE_MEDIA_INDEX", ".media_index.sqlite")
+INDEX_VERSION = 3  # bump when MediaInfo changes shape
+
+
+@dataclass
+class MediaInfo:
+    path: str
+    size: int
+    mtime_ns: int
+    duration: Optional[float] = None
+    format_name: Optional[str] = None
+    streams: List[Dict[str, Any]] = field(default_factory=list)  # index, type, codec, ... per stream
+    width: Optional[int] = None
+    height: Optional[int] = None
+    fps: Optional[float] = None            # real (r_frame_rate) frame rate of the first video stream
+    video_codec: Optional[str] = None
+    audio_codec: Optional[str] = None
+    frame_count: Optional[int] = None      # video packets, counted
+    keyframes: List[float] = field(default_factory=list)        # pts (s) of every video keyframe
+    keyframe_frames: List[int] = field(default_factory=list)    # frame number of each keyframe
+
+    @property
+    def has_video(self) -> bool:
+        return any(s["type"] == "video" for s in self.streams)
+
+    @property
+    def has_audio(self) -> bool:
+        return any(s["type"] == "audio" for s in self.streams)
+
+    @property
+    def size_str(self) -> Optional[str]:
+        return f"{self.width}x{self.height}" if self.width and self.height else None
+
+
+# Utility: "30000/1001" → 29.97
+def _rate(r: str) -> Optional[float]:
+    try:
+        num, _, den = (r or "").partition("/")
+        value = float(num) / float(den or 1)
+        return value or None
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def _run_ffprobe(path: str) -> Optional[Dict[str, Any]]:
+    cmd = [FFPROBE, "-v", "error", "-of", "json",
+           "-show_entries",
+           "format=duration,format_name"
+           ":stream=index,codec_type,codec_name,width,height,r_frame_rate,avg_frame_rate,"
+           "sample_rate,channels,pix_fmt,profile,level,bit_rate"
+           ":packet=stream_index,pts_time,flags",
+           path]
+    try:
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+    except OSError:
+        return None
+    if proc.returncode != 0:
+        return None
+    try:
+        return json.loads(proc.stdout)
+    except ValueError:
+        return None
+
+
+def _parse(path: str, st: os.stat_result, data: Dict[str, Any]) -> MediaInfo:
+    info = MediaInfo(path=path, size=st.st_size, mtime_ns=st.st_mtime_ns)
+    fmt = data.get("format", {})
+    info.format_name = fmt.get("format_name")
+    try:
+        info.duration = float(fmt["duration"])
+    except (KeyError, ValueError):
+        pass
+    video_index = None
+    for s in data.get("streams", []):
+        entry = {"index": s.get("index"), "type": s.get("codec_type"), "codec": s.get("codec_name")}
+        if s.get("codec_type") == "video":
+            entry.update(width=s.get("width"), height=s.get("height"), pix_fmt=s.get("pix_fmt"),
+                         profile=s.get("profile"), level=s.get("level"),
+                         bit_rate=int(s["bit_rate"]) if str(s.get("bit_rate", "")).isdigit() else None,
+                         fps=_rate(s.get("r_frame_rate")) or _rate(s.get("avg_frame_rate")))
+            if video_index is None:
+                video_index = s.get("index")
+                info.width, info.height = s.get("width"), s.get("height")
+                info.fps, info.video_codec = entry["fps"], entry["codec"]
+        elif s.get("codec_type") == "audio":
+            entry.update(sample_rate=int(s.get("sample_rate") or 0), channels=s.get("channels"))
+            info.audio_codec = info.audio_codec or entry["codec"]
+        info.streams.append(entry)
+    if video_index is not None:
+        n = 0
+        for p in data.get("packets", []):
+            if p.get("stream_index") != video_index:
+                continue
+            if "K" in p.get("flags", "") and p.get("pts_time") not in (None, "N/A"):
+                info.keyframes.append(float(p["pts_time"]))
+                info.keyframe_frames.append(n)
+            n += 1
+        info.frame_count = n
+    return info
+
+
+class MediaIndex:
+    def __init__(self, store: str = DEFAULT_STORE):
+        self.store = store
+        self._memory: Dict[Tuple[str, int, int], MediaInfo] = {}
+        self._lock = threading.Lock()
+        if store:
+            db = self._db()
+            try:
+                db.execute("CREATE TABLE IF NOT EXISTS media (path TEXT PRIMARY KEY, size INTEGER, "
+                           "mtime_ns INTEGER, version INTEGER, info TEXT)")
+                db.commit()
+            finally:
+                db.close()
+
+    def _db(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.store, timeout=30)
+
+    def probe(self, path: str) -> Optional[MediaInfo]:
+        """MediaInfo for path, from cache when the file is unchanged; None if it can't be probed."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        path = os.path.abspath(path)
+        key = (path, st.st_size, st.st_mtime_ns)
+        with self._lock:
+            if key in self._memory:
+                return self._memory[key]
+        info = self._load(key)
+        if info is None:
+            data = _run_ffprobe(path)
+            if data is None:
+                return None
+            info = _parse(path, st, data)
+            self._save(info)
+        with self._lock:
+            self._memory[key] = info
+        return info
+
+    def _load(self, key) -> Optional[MediaInfo]:
+        if not self.store:
+            return None
+        db = self._db()
+        try:
+            row = db.execute("SELECT info FROM media WHERE path = ? AND size = ? AND mtime_ns = ? AND version = ?",
+                             (*key, INDEX_VERSION)).fetchone()
+        finally:
+            db.close()
+        return MediaInfo(**json.loads(row[0])) if row else None
+
+    def _save(self, info: MediaInfo):
+        if not self.store:
+            return
+        db = self._db()
+        try:
+            db.execute("INSERT OR REPLACE INTO media VALUES (?, ?, ?, ?, ?)",
+                       (info.path, info.size, info.mtime_ns, INDEX_VERSION, json.dumps(asdict(info))))
+            db.commit()
+        finally:
+            db.close()
+
+
+_default: Optional[MediaIndex] = None
+
+def default_index() -> MediaIndex:
+    global _default
+    if _default is None:
+        _default = MediaIndex()
+    return _default
+
+def probe(path: str) -> Optional[MediaInfo]:
+    """Probe path through the process-wide default index."""
+    return default_index().probe(path)
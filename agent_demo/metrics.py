@@ -0,0 +1,170 @@
+"""
+Per-step performance metrics.
+
+Every command ffmpeg_adapter._run() executes is measured: wall time, the
+child's CPU user/sys time and peak RSS (from wait4), frames and realized
+fps/speed (parsed from ffmpeg's final stats line) and the bytes of its input
+files read and of its output written. While a collect() block is open on a
+thread, the runs made from that thread are recorded into it; the Executor
+opens one per stage and attaches the summary to each step's
+ExecResult.metrics.
+
+write_chrome_trace() turns a run's results into a Chrome/Perfetto trace
+(one slice per stage, nested slices per ffmpeg command), write_csv() into
+one flat row per step.
+"""
+
+import contextlib, csv, json, os, re, sys, threading
+from typing import Any, Dict, Iterator, List, Optional
+
+_local = threading.local()
+
+# Flat columns of write_csv(), in order
+CSV_FIELDS = ["step_id", "action", "stage", "cache", "wall_s", "cpu_user_s", "cpu_sys_s", "peak_rss_mb",
+              "frames", "fps", "speed", "bytes_in", "bytes_out", "runs"]
+
+_FRAME = re.compile(r"frame=\s*(\d+)")
+_FPS = re.compile(r"fps=\s*([\d.]+)")
+_SPEED = re.compile(r"speed=\s*([\d.]+)x")
+
+
+@contextlib.contextmanager
+def collect() -> Iterator[List[Dict[str, Any]]]:
+    """
+    Record every command run from the calling thread inside the block into
+    the yielded list. Blocks nest: an enclosing block gets the runs too.
+    """
+    prev = getattr(_local, "runs", None)
+    runs: List[Dict[str, Any]] = []
+    _local.runs = runs
+    try:
+        yield runs
+    finally:
+        _local.runs = prev
+        if prev is not None:
+            prev.extend(runs)
+
+
+def record(run: Dict[str, Any]):
+    """Add a run to the calling thread's open collect() block, if any."""
+    runs = getattr(_local, "runs", None)
+    if runs is not None:
+        runs.append(run)
+
+
+def extend(runs: List[Dict[str, Any]]):
+    """Add runs measured elsewhere (e.g. in a pool process) to the open collect() block."""
+    for run in runs:
+        record(run)
+
+
+# Utility: (frames, fps, speed) from the last stats line of an ffmpeg log
+def parse_progress(log: str):
+    def last(pattern, cast):
+        m = pattern.findall(log or "")
+        return cast(m[-1]) if m else None
+    return last(_FRAME, int), last(_FPS, float), last(_SPEED, float)
+
+
+def _size(path: str) -> int:
+    try:
+        return os.path.getsize(path) if os.path.isfile(path) else 0
+    except OSError:
+        return 0
+
+
+def measure(argv: List[str], start: float, end: float, log: str, usage=None) -> Dict[str, Any]:
+    """
+    Metrics of one finished command.
+
+    Args:
+        argv: The command line
+        start, end: Wall clock (time.time()) around the run
+        log: Its output, for ffmpeg's stats line
+        usage: resource.struct_rusage of the child (from os.wait4), if known
+
+    Returns:
+        Dict of the run's metrics; CPU and RSS are None without usage
+    """
+    frames, fps, speed = parse_progress(log)
+    inputs = [argv[k + 1] for k, a in enumerate(argv[:-1]) if a == "-i"]
+    run = {"cmd": os.path.basename(argv[0]) if argv else "", "start": start, "wall_s": end - start,
+           "cpu_user_s": None, "cpu_sys_s": None, "peak_rss_mb": None,
+           "frames": frames, "fps": fps, "speed": speed,
+           "bytes_in": sum(_size(p) for p in inputs), "bytes_out": _size(argv[-1]) if len(argv) > 1 else 0,
+           "pid": os.getpid(), "thread": threading.current_thread().name}
+    if usage is not None:
+        # ru_maxrss is in KiB on Linux, bytes on macOS
+        rss = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+        run.update(cpu_user_s=usage.ru_utime, cpu_sys_s=usage.ru_stime, peak_rss_mb=round(rss, 1))
+    return run
+
+
+def summarize(runs: List[Dict[str, Any]], start: float, end: float) -> Dict[str, Any]:
+    """
+    Metrics of a stage from the runs it made.
+
+    CPU time and bytes add up over the runs and peak RSS is the largest
+    single process. Frames are those of the last run that reported them (the
+    render that wrote the stage's output); fps and speed are realized over
+    the whole stage's wall time.
+    """
+    def total(key):
+        values = [r[key] for r in runs if r.get(key) is not None]
+        return round(sum(values), 3) if values else None
+    last = next((r for r in reversed(runs) if r.get("frames") is not None), {})
+    wall = end - start
+    frames = last.get("frames")
+    media_s = last["speed"] * last["wall_s"] if last.get("speed") else None
+    rss = [r["peak_rss_mb"] for r in runs if r.get("peak_rss_mb") is not None]
+    return {"start": start, "wall_s": round(wall, 3), "cpu_user_s": total("cpu_user_s"),
+            "cpu_sys_s": total("cpu_sys_s"), "peak_rss_mb": max(rss) if rss else None,
+            "frames": frames, "fps": round(frames / wall, 2) if frames and wall > 0 else None,
+            "speed": round(media_s / wall, 3) if media_s and wall > 0 else None,
+            "bytes_in": total("bytes_in") or 0, "bytes_out": total("bytes_out") or 0,
+            "runs": runs, "thread": threading.current_thread().name}
+
+
+# --------------------------------------
+# Export
+# --------------------------------------
+def write_chrome_trace(results, path: str) -> str:
+    """
+    Write ExecResults' metrics as Chrome trace JSON (chrome://tracing, ui.perfetto.dev).
+
+    Returns:
+        path
+    """
+    events, seen, pid = [], set(), os.getpid()
+    for r in results:
+        m = r.metrics
+        if not m or id(m["runs"]) in seen:
+            continue  # the steps of a fused stage share one render
+        seen.add(id(m["runs"]))
+        args = {k: m.get(k) for k in CSV_FIELDS if k not in ("step_id", "runs")}
+        events.append({"name": m.get("stage") or r.step_id, "cat": "stage", "ph": "X",
+                       "ts": m["start"] * 1e6, "dur": m["wall_s"] * 1e6, "pid": pid,
+                       "tid": m["thread"], "args": args})
+        for run in m["runs"]:
+            events.append({"name": run["cmd"], "cat": "command", "ph": "X", "ts": run["start"] * 1e6,
+                           "dur": run["wall_s"] * 1e6, "pid": run["pid"], "tid": run["thread"],
+                           "args": {k: v for k, v in run.items() if k not in ("start", "pid", "thread")}})
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    return path
+
+
+def write_csv(results, path: str) -> str:
+    """Write one row of metrics per ExecResult (steps without metrics get an empty row)."""
+    with open(path, "w", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction="ignore")
+        w.writeheader()
+        for r in results:
+            m = r.metrics or {}
+            w.writerow({**m, "step_id": r.step_id, "runs": len(m.get("runs", []))})
+    return path
+
+
+def public(m: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """A step's metrics without the per-command runs, e.g. for a JSON report."""
+    return {k: v for k, v in (m or {}).items() if k not in ("runs", "thread")}
@@ -0,0 +1,296 @@
+"""
+Plan optimizer: rewrites a Plan before the Executor runs it.
+
+Planners emit steps naively (plan_from_prompt adds what the goal mentions,
+in a fixed order). optimize() rewrites the plan so it renders the same
+result with less work:
+
+- No-op steps are dropped: a color step with identity eq params and a
+  neutral temperature, a zoom that never leaves 1x at the frame size it
+  gets, a LUT at intensity 0, an export_preview repeating the one before it.
+- Audio-only steps (duck_music) move ahead of the video filter steps around
+  them. They touch different streams, so the order doesn't matter, and the
+  video steps end up next to each other and to the export, which fuse into
+  one ffmpeg pass (see compiler.py).
+- Per-pixel color steps move ahead of the zooms before them, unless the
+  zoom shrinks the frame (then they would filter more pixels), so color
+  steps line up to be merged or baked into one LUT.
+- Consecutive adjust_color_eq steps merge into one when the first has a
+  neutral temperature. eq is linear in contrast/brightness and scales the
+  saturation, so eq(b2, c2, s2) after eq(b1, c1, s1) is
+  eq(c2*b1 + b2, c1*c2, s1*s2), up to clipping of the intermediate result.
+- An export_preview whose input video is already compatible H.264 copies
+  the video instead of encoding it again ("remux"): the untouched source,
+  if it is H.264 4:2:0 at no more than the preview quality's bitrate and
+  PREVIEW_MAX_PIXELS, or an earlier preview of the same quality. With a
+  segment or a proxy the Executor feeds the plan a trimmed clip or the
+  proxy instead of the source, so the source is never remuxed then.
+
+The report lists every rewrite (steps named by their number in the
+original plan) and estimates the work before and after: ffmpeg passes,
+video encodes and, given the clip's MediaInfo, frames encoded and
+megapixels filtered.
+"""
+
+import dataclasses
+from typing import Any, Collection, Dict, List, Optional, Tuple
+from .types import Plan, Step
+from .actions import COLOR_ACTIONS, STREAMS, VIDEO_FILTER_ACTIONS, normalize_params
+from .compiler import _encodes, compile_plan
+from .media_index import MediaInfo
+from agent_demo import ffmpeg_adapter as fx
+
+# Steps that move pixels around (and may change the frame size)
+GEOMETRY_ACTIONS = {"add_keyframe_zoom"}
+# ffmpeg's eq ranges: merged params outside them are left as two steps
+EQ_RANGES = {"brightness": (-1.0, 1.0), "contrast": (-1000.0, 1000.0), "saturation": (0.0, 3.0)}
+# Source video an export_preview can copy as it is (also within its
+# quality's bitrate, fx.PREVIEW_BITRATES, and this frame size)
+PREVIEW_CODECS = {"h264"}
+PREVIEW_PIX_FMTS = {"yuv420p", "yuvj420p"}
+PREVIEW_MAX_PIXELS = 1920 * 1080
+
+Size = Optional[Tuple[int, int]]
+Entry = Tuple[List[int], Step]  # (numbers of the original steps it stands for, step)
+
+
+def _dims(size: str) -> Size:
+    try:
+        w, h = size.split("x")
+        return int(w), int(h)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _name(ids: List[int]) -> str:
+    return "+".join(f"S{i}" for i in ids)
+
+
+def _audio_only(step: Step) -> bool:
+    reads, writes = STREAMS.get(step.action, (frozenset("va"), frozenset("va")))
+    return not (reads | writes) - {"a"}
+
+
+# Frame size going into each step: zooms with a size param set the size of what follows
+def _sizes(steps: List[Step], size: Size) -> List[Size]:
+    sizes = []
+    for step in steps:
+        sizes.append(size)
+        if step.action in GEOMETRY_ACTIONS and step.params.get("size"):
+            size = _dims(step.params["size"])
+    return sizes
+
+
+def _is_noop(step: Step, size: Size, duration: float = None) -> bool:
+    p = normalize_params(step.action, step.params)
+    if step.action == "adjust_color_eq":
+        return (p["brightness"], p["contrast"], p["saturation"]) == (0, 1, 1) and p["temperature"] == "neutral"
+    if step.action == "add_keyframe_zoom":
+        # The factor is clamped to 1x..10x, but the ramp keeps going past
+        # duration_s: a rising one (0.9 -> 1.0) passes 1x on a longer clip
+        stays = p["to_scale"] <= p["from_scale"] or (duration is not None and duration <= p["duration_s"])
+        return max(p["from_scale"], p["to_scale"]) <= 1 and stays and \
+            (not p.get("size") or _dims(p["size"]) == size)
+    if step.action == "slog3_with_lut":
+        return p["intensity"] <= 0
+    return False
+
+
+def _merge_eq(a: Step, b: Step) -> Optional[Dict[str, Any]]:
+    pa, pb = normalize_params(a.action, a.params), normalize_params(b.action, b.params)
+    if pa["temperature"] != "neutral":
+        return None  # a's tint sits between the two eq filters
+    merged = {"brightness": round(pb["contrast"] * pa["brightness"] + pb["brightness"], 6),
+              "contrast": round(pa["contrast"] * pb["contrast"], 6),
+              "saturation": round(pa["saturation"] * pb["saturation"], 6),
+              "temperature": pb["temperature"]}
+    if any(not lo <= merged[k] <= hi for k, (lo, hi) in EQ_RANGES.items()):
+        return None
+    return merged
+
+
+# --------------------------------------
+# Rewrites (each takes and returns the plan as entries, logging into `rewrites`)
+# --------------------------------------
+def _drop_noops(entries: List[Entry], size: Size, duration: Optional[float],
+                rewrites: List[str]) -> List[Entry]:
+    kept = []
+    sizes = _sizes([s for _, s in entries], size)
+    for k, (ids, step) in enumerate(entries):
+        prev = kept[-1][1] if kept else None
+        repeat = (step.action == "export_preview" and prev is not None and prev.action == "export_preview"
+                  and normalize_params(prev.action, prev.params) == normalize_params(step.action, step.params))
+        if (_is_noop(step, sizes[k], duration) or repeat) and (kept or k < len(entries) - 1):
+            rewrites.append(f"{_name(ids)} dropped: {step.action} " + ("repeats the export before it"
+                                                                       if repeat else "changes nothing"))
+            continue
+        kept.append((ids, step))
+    return kept
+
+
+def _audio_first(entries: List[Entry], rewrites: List[str]) -> List[Entry]:
+    out, run = [], []
+
+    def flush(before_export: bool):
+        # In a run of video filter and audio-only steps, audio steps that
+        # split the video work (or sit between it and the export) go first
+        video = [k for k, (_, s) in enumerate(run) if not _audio_only(s)]
+        split = [k for k, (_, s) in enumerate(run) if _audio_only(s) and video and video[0] < k
+                 and (video[-1] > k or before_export)]
+        if split:
+            for k in split:
+                rewrites.append(f"{_name(run[k][0])} moved ahead of the video steps: {run[k][1].action} "
+                                f"only touches the audio")
+            run.sort(key=lambda e: not _audio_only(e[1]))  # stable: each stream keeps its order
+        out.extend(run)
+        run.clear()
+
+    for ids, step in entries:
+        if step.action in VIDEO_FILTER_ACTIONS or _audio_only(step):
+            run.append((ids, step))
+            continue
+        flush(_encodes(step))
+        out.append((ids, step))
+    flush(False)
+    return out
+
+
+def _color_first(entries: List[Entry], size: Size, rewrites: List[str]) -> List[Entry]:
+    entries = list(entries)
+    for k in range(1, len(entries)):
+        j = k
+        # Bubble the color step back over the zooms right before it
+        while j > 0 and entries[j][1].action in COLOR_ACTIONS and entries[j - 1][1].action in GEOMETRY_ACTIONS:
+            sizes = _sizes([s for _, s in entries], size)
+            before, after = sizes[j - 1], sizes[j]  # frame size going into / coming out of the zoom
+            if before != after and not (before and after and before[0] * before[1] <= after[0] * after[1]):
+                break
+            rewrites.append(f"{_name(entries[j][0])} moved ahead of {_name(entries[j - 1][0])}: "
+                            f"{entries[j][1].action} is per-pixel")
+            entries[j - 1], entries[j] = entries[j], entries[j - 1]
+            j -= 1
+    return entries
+
+
+def _merge_color(entries: List[Entry], rewrites: List[str]) -> List[Entry]:
+    out = []
+    for ids, step in entries:
+        prev = out[-1] if out else None
+        merged = None
+        if prev and prev[1].action == step.action == "adjust_color_eq":
+            merged = _merge_eq(prev[1], step)
+        if merged is None:
+            out.append((ids, step))
+            continue
+        a = prev[1]
+        out[-1] = (prev[0] + ids, Step(action=step.action, params=merged,
+                                       explain="; ".join(e for e in (a.explain, step.explain) if e) or None,
+                                       verify=list(dict.fromkeys(a.verify + step.verify))))
+        rewrites.append(f"{_name(prev[0])} and {_name(ids)} merged into one {step.action}")
+    return out
+
+
+# Whether the source video can stand in for a preview of `quality` as it is
+def _source_fits(info: Optional[MediaInfo], quality: str) -> bool:
+    stream = next((s for s in info.streams if s["type"] == "video"), None) if info else None
+    if not stream or info.video_codec not in PREVIEW_CODECS or stream.get("pix_fmt") not in PREVIEW_PIX_FMTS:
+        return False
+    target = fx.PREVIEW_BITRATES.get(quality, fx.PREVIEW_BITRATES["medium"])
+    bit_rate = stream.get("bit_rate")  # unknown: can't tell, so encode
+    return bool(bit_rate) and bit_rate <= int(target.rstrip("k")) * 1000 and \
+        (info.width or 0) * (info.height or 0) <= PREVIEW_MAX_PIXELS
+
+
+def _remux_previews(entries: List[Entry], info: Optional[MediaInfo], rewrites: List[str]) -> List[Entry]:
+    out = []
+    video = None  # what last wrote the video: None = the source
+    for ids, step in entries:
+        if step.action == "export_preview":
+            p = normalize_params(step.action, step.params)
+            compatible = _source_fits(info, p["quality"]) if video is None else \
+                video.action == "export_preview" and normalize_params(video.action, video.params)["quality"] == p["quality"]
+            if compatible and not p.get("remux") and not any(p.get(k) for k in ("ladder", "stream", "height")):
+                step = dataclasses.replace(step, params=dict(step.params, remux=True))
+                rewrites.append(f"{_name(ids)} remuxed: its input video is already compatible H.264")
+            if not step.params.get("remux"):
+                video = step
+        elif "v" in STREAMS.get(step.action, (None, frozenset("va")))[1]:
+            video = step
+        out.append((ids, step))
+    return out
+
+
+# --------------------------------------
+# Entry points
+# --------------------------------------
+def estimate(plan: Plan, info: Optional[MediaInfo] = None, segment: str = None, fuse: bool = True,
+             exclude: Collection[str] = ()) -> Dict[str, Any]:
+    """
+    Work a plan costs the Executor.
+
+    Returns:
+        Dict with the steps, ffmpeg passes (compiled stages), video encodes
+        and video filter steps; given the clip's MediaInfo also the frames
+        encoded and megapixels filtered over the clip (or the segment)
+    """
+    stages = compile_plan(plan, fuse=fuse, exclude=exclude)
+    encodes = sum(any(s.action in VIDEO_FILTER_ACTIONS or _encodes(s) for _, s in st.steps) for st in stages)
+    filters = [k for k, s in enumerate(plan.steps) if s.action in VIDEO_FILTER_ACTIONS]
+    est = {"steps": len(plan.steps), "passes": len(stages), "video_encodes": encodes, "filters": len(filters)}
+    frames = info.frame_count if info else None
+    if frames and segment and info.fps:
+        frames = min(frames, int(fx.segment_seconds(segment) * info.fps))
+    if frames:
+        sizes = _sizes(plan.steps, (info.width, info.height) if info.width else None)
+        est["frames_encoded"] = encodes * frames
+        if all(sizes[k] for k in filters):
+            est["megapixels_filtered"] = round(sum(sizes[k][0] * sizes[k][1] for k in filters) * frames / 1e6, 1)
+    return est
+
+
+def optimize(plan: Plan, info: Optional[MediaInfo] = None, segment: str = None, fuse: bool = True,
+             exclude: Collection[str] = (), proxy: bool = False) -> Tuple[Plan, Dict[str, Any]]:
+    """
+    Rewrite a plan to render the same result with less work.
+
+    Args:
+        plan: The plan as the planner emitted it (left unchanged)
+        info: MediaInfo of the clip the plan runs on; enables the frame
+            size aware rewrites, remuxing the source and the frame estimates
+        segment: The Executor's segment (the clip length zoom ramps run over, and the estimates)
+        fuse, exclude: The Executor's fusion settings (fuse,
+            native_actions), for the estimates
+        proxy: Whether the Executor runs on a proxy (no remuxing the source then)
+
+    Returns:
+        (optimized plan, report with the "rewrites" made and the
+        "before" / "after" estimate())
+    """
+    size = (info.width, info.height) if info and info.width else None
+    duration = fx.segment_seconds(segment) if segment else info.duration if info else None
+    rewrites: List[str] = []
+    entries = [([i], step) for i, step in enumerate(plan.steps, start=1)]
+    entries = _drop_noops(entries, size, duration, rewrites)
+    entries = _audio_first(entries, rewrites)
+    entries = _color_first(entries, size, rewrites)
+    entries = _merge_color(entries, rewrites)
+    entries = _drop_noops(entries, size, duration, rewrites)  # a merge can cancel out
+    # The first stage reads the trimmed clip or the proxy, not the source `info` describes
+    entries = _remux_previews(entries, None if segment or proxy else info, rewrites)
+    optimized = Plan(steps=[step for _, step in entries])
+    report = {"rewrites": rewrites,
+              "before": estimate(plan, info, segment, fuse, exclude),
+              "after": estimate(optimized, info, segment, fuse, exclude)}
+    return optimized, report
+
+
+def summary(report: Dict[str, Any]) -> str:
+    """One line: how many rewrites and what they save."""
+    before, after = report["before"], report["after"]
+    parts = [f"{before[k]} → {after[k]} {label}" for k, label in
+             (("steps", "steps"), ("passes", "ffmpeg passes"), ("video_encodes", "video encodes"))]
+    if before.get("frames_encoded", 0) > after.get("frames_encoded", 0):
+        parts.append(f"{before['frames_encoded'] - after['frames_encoded']} fewer frames encoded")
+    if before.get("megapixels_filtered", 0) > after.get("megapixels_filtered", before.get("megapixels_filtered", 0)):
+        parts.append(f"{before['megapixels_filtered'] - after['megapixels_filtered']:.1f} fewer megapixels filtered")
+    return f"{len(report['rewrites'])} rewrite(s): " + ", ".join(parts)
@@ -0,0 +1,186 @@
+"""
+Content-addressed cache for rendered step outputs.
+
+A render is keyed on what actually determines its pixels: a fingerprint of
+the input file, the actions with their normalized params, the segment and
+the adapter/ffmpeg versions. On a hit the Executor links the stored artifact
+into place instead of running ffmpeg again.
+
+Artifacts live in <root>/objects/, their bookkeeping in a small sqlite
+database (<root>/index.sqlite). sqlite's locking makes the cache safe to
+share between several executor processes; artifacts are written under a
+temporary name and renamed into place, so readers never see partial files.
+Once the cache grows past its disk budget the least recently used entries
+are evicted.
+"""
+
+import contextlib, hashlib, json, os, shutil, sqlite3, tempfile, time
+from typing import Dict, Any, List, Tuple
+from .actions import normalize_params
+from agent_demo import ffmpeg_adapter as fx
+
+DEFAULT_MAX_BYTES = 5 * 1024**3
+_PARTIAL_BYTES = 1024**2
+
+# Per-process memo of fingerprints: (path, size, mtime_ns, full) -> digest
+_fingerprints: Dict[Tuple[str, int, int, bool], str] = {}
+
+def file_fingerprint(path: str, full: bool = False) -> str:
+    """
+    Hash identifying a file's content.
+
+    The fast path hashes size + mtime + the first and last MiB; full=True
+    hashes the whole file (slower, but immune to in-place edits that keep
+    the size and mtime).
+    """
+    st = os.stat(path)
+    memo = (os.path.abspath(path), st.st_size, st.st_mtime_ns, full)
+    if memo in _fingerprints:
+        return _fingerprints[memo]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        if full:
+            for block in iter(lambda: f.read(_PARTIAL_BYTES), b""):
+                h.update(block)
+        else:
+            h.update(f"{st.st_size}:{st.st_mtime_ns}".encode())
+            h.update(f.read(_PARTIAL_BYTES))
+            if st.st_size > 2 * _PARTIAL_BYTES:
+                f.seek(-_PARTIAL_BYTES, os.SEEK_END)
+                h.update(f.read(_PARTIAL_BYTES))
+    _fingerprints[memo] = digest = h.hexdigest()
+    return digest
+
+def step_signature(action: str, params: Dict[str, Any], full: bool = False) -> List[Any]:
+    """[action, params] with defaults filled in and side inputs (music, LUTs) replaced by their content hash."""
+    p = normalize_params(action, params)
+    for k, v in p.items():
+        if isinstance(v, str) and os.path.isfile(v):
+            p[k] = file_fingerprint(v, full)
+    return [action, p]
+
+
+class RenderCache:
+    def __init__(self, root: str = ".render_cache", max_bytes: int = DEFAULT_MAX_BYTES,
+                 full_hash: bool = False):
+        self.root = root
+        self.objects = os.path.join(root, "objects")
+        self.max_bytes = max_bytes
+        self.full_hash = full_hash
+        os.makedirs(self.objects, exist_ok=True)
+        self.db_path = os.path.join(root, "index.sqlite")
+        with self._db() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, path TEXT, "
+                       "size INTEGER, created REAL, last_used REAL)")
+            db.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER)")
+
+    @contextlib.contextmanager
+    def _db(self):
+        # One short-lived connection per operation: cheap, and safe across processes
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def _count(self, db: sqlite3.Connection, name: str, n: int = 1):
+        db.execute("INSERT INTO stats VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + ?",
+                   (name, n, n))
+
+    # ----------------------------------
+    # Keys
+    # ----------------------------------
+    def key(self, input_file: str, steps: List[Tuple[str, Dict[str, Any]]], segment: str = None,
+            variant: str = "") -> str:
+        """
+        Cache key for rendering `steps` (as (action, params) pairs) on input_file.
+        `variant` carries executor-level render settings such as encoder overrides.
+        """
+        blob = json.dumps({
+            "input": file_fingerprint(input_file, self.full_hash),
+            "steps": [step_signature(a, p, self.full_hash) for a, p in steps],
+            "segment": segment,
+            "variant": variant,
+            "adapter": fx.ADAPTER_VERSION,
+            "ffmpeg": fx.ffmpeg_version(),
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(blob.encode()).hexdigest()
+
+    # ----------------------------------
+    # Lookup / store
+    # ----------------------------------
+    def get(self, key: str, out_file: str) -> bool:
+        """On a hit, place the cached artifact at out_file and return True."""
+        with self._db() as db:
+            row = db.execute("SELECT path FROM entries WHERE key = ?", (key,)).fetchone()
+            if row and os.path.exists(row[0]):
+                db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+                self._count(db, "hits")
+            else:
+                if row:  # artifact vanished underneath us
+                    db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._count(db, "misses")
+                return False
+        _place(row[0], out_file)
+        return True
+
+    def put(self, key: str, out_file: str):
+        """Store a freshly rendered out_file under key, then enforce the disk budget."""
+        ext = os.path.splitext(out_file)[1]
+        obj = os.path.join(self.objects, key + ext)
+        fd, tmp = tempfile.mkstemp(dir=self.objects, suffix=".tmp")
+        os.close(fd)
+        shutil.copyfile(out_file, tmp)
+        os.replace(tmp, obj)
+        # Point out_file at the stored object too, so later keys computed from
+        # it (size + mtime) match what a cache hit would have produced
+        _place(obj, out_file)
+        now = time.time()
+        with self._db() as db:
+            db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                       (key, obj, os.path.getsize(obj), now, now))
+        self.evict()
+
+    def evict(self, max_bytes: int = None):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        budget = self.max_bytes if max_bytes is None else max_bytes
+        doomed = []
+        with self._db() as db:
+            db.execute("BEGIN IMMEDIATE")
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            for key, path, size in db.execute("SELECT key, path, size FROM entries ORDER BY last_used"):
+                if total <= budget:
+                    break
+                doomed.append((key, path))
+                total -= size
+            db.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k, _ in doomed])
+            if doomed:
+                self._count(db, "evictions", len(doomed))
+            db.execute("COMMIT")
+        for _, path in doomed:
+            # Outputs placed earlier are hardlinks or copies, so this is safe
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        with self._db() as db:
+            counters = dict(db.execute("SELECT name, value FROM stats").fetchall())
+            entries, size = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {"hits": counters.get("hits", 0), "misses": counters.get("misses", 0),
+                "evictions": counters.get("evictions", 0), "entries": entries,
+                "bytes": size, "max_bytes": self.max_bytes}
+
+# Utility: hardlink (or copy across filesystems) a cached artifact into place.
+# The Executor removes an output before re-rendering it, so ffmpeg never
+# truncates an inode that is shared with the cache.
+def _place(src: str, dst: str):
+    os.makedirs(os.path.dirname(os.path.abspath(dst)), exist_ok=True)
+    if os.path.lexists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)  # keeps the mtime, so file_fingerprint matches the cached copy
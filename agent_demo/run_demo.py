@@ -5,6 +5,7 @@ This script glues everything together and lets us test the full pipeline.
 It simulates what a Nemotron-driven session will look like:
 - User enters a natural-language goal
 - Planner builds a plan (rule-based for now)
+- Optimizer drops, merges and reorders its steps to save renders
 - Executor runs each step (via FFmpeg)
 - Verifier checks outputs
 """
@@ -13,7 +14,10 @@ import argparse, os, json
 from agent_demo.types import TaskSpec
 from agent_demo.planner_stub import plan_from_prompt
 from agent_demo.executor import Executor
+from agent_demo.render_cache import RenderCache
 from agent_demo.verifier import verify
+from agent_demo.optimizer import optimize, summary
+from agent_demo import media_index, metrics
 
 def main():
     # ------------------ Parse CLI inputs ------------------
@@ -22,6 +26,37 @@ def main():
     ap.add_argument("--segment", default=None, help="Time range, e.g. 00:00:00-00:00:10")
     ap.add_argument("--music", default=None, help="Optional background music file")
     ap.add_argument("--goal", required=True, help="Natural language goal, e.g. 'cold cinematic look with slow zoom'")
+    ap.add_argument("--no-fuse", action="store_true", help="Render every step as its own ffmpeg pass")
+    ap.add_argument("--workers", type=int, default=1, help="Render video steps in parallel chunks on N processes")
+    ap.add_argument("--cache-dir", default=".render_cache", help="Where finished renders are cached")
+    ap.add_argument("--cache-size-gb", type=float, default=5.0, help="Disk budget of the render cache")
+    ap.add_argument("--no-cache", action="store_true", help="Always re-render every step")
+    ap.add_argument("--no-resume", action="store_true", help="Ignore checkpoints of a previous run in outputs/")
+    ap.add_argument("--proxy", action="store_true", help="Iterate fast on a low-resolution proxy (outputs/proxy/)")
+    ap.add_argument("--conform", action="store_true", help="Render the proxy plan at full resolution")
+    ap.add_argument("--parallel", action="store_true", help="Render independent video/audio steps concurrently")
+    ap.add_argument("--lut-engine", choices=["ffmpeg", "numpy"], default="ffmpeg",
+                    help="Apply LUTs with ffmpeg's lut3d or in-process with NumPy (tetrahedral)")
+    ap.add_argument("--bake-color", type=int, nargs="?", const=33, default=None, metavar="SIZE",
+                    help="Bake runs of color steps into one cached 3D LUT (lattice SIZE, default 33)")
+    ap.add_argument("--zoom-engine", choices=["zoompan", "scale", "numpy"], default="zoompan",
+                    help="Render zooms with zoompan, a smooth scale+crop, or in-process with NumPy")
+    ap.add_argument("--duck-engine", choices=["envelope", "sidechain"], default="envelope",
+                    help="Duck music along the dialogue's precomputed envelope (NumPy) or with sidechaincompress")
+    ap.add_argument("--no-step-checks", action="store_true",
+                    help="Don't check each step's output (duration, frames, black/frozen video) while the next renders")
+    ap.add_argument("--no-optimize", action="store_true",
+                    help="Run the plan as planned (no dropping, merging or reordering of steps)")
+    ap.add_argument("--profile", choices=["draft", "review", "master"], default="review",
+                    help="Render profile: encoder settings of final and intermediate renders")
+    ap.add_argument("--intermediate", choices=["ultrafast", "ffv1", "delivery"], default=None,
+                    help="Format of outputs only a later step reads (overrides the profile's; "
+                         "delivery = full encode every step)")
+    ap.add_argument("--threads", type=int, default=None,
+                    help="CPU threads shared by all concurrent ffmpeg jobs (default: all cores)")
+    ap.add_argument("--trace", default=None, metavar="JSON",
+                    help="Write per-step timings as a Chrome/Perfetto trace")
+    ap.add_argument("--metrics-csv", default=None, metavar="CSV", help="Write per-step timings as CSV")
     args = ap.parse_args()
 
     # ------------------ Build a TaskSpec ------------------
@@ -37,10 +72,31 @@ def main():
     plan = plan_from_prompt(task)
     print(json.dumps({"steps": [s.__dict__ for s in plan.steps]}, indent=2))
 
+    cache = None if args.no_cache else RenderCache(args.cache_dir, max_bytes=int(args.cache_size_gb * 1024**3))
+    ex = Executor(input_file=args.input, segment=args.segment, music=args.music, fuse=not args.no_fuse,
+                  workers=args.workers, cache=cache, resume=not args.no_resume,
+                  proxy=args.proxy or args.conform, lut_engine=args.lut_engine,
+                  bake_size=args.bake_color, zoom_engine=args.zoom_engine,
+                  duck_engine=args.duck_engine, profile=args.profile, intermediate=args.intermediate,
+                  threads=args.threads, check_steps=not args.no_step_checks)
+
+    # ------------------ Stage 1b: Optimize ------------------
+    if not args.no_optimize:
+        print("\n>> Optimizing...")
+        plan, report = optimize(plan, media_index.probe(args.input), segment=args.segment,
+                                fuse=ex.fuse, exclude=ex.native_actions, proxy=ex.proxy)
+        for line in report["rewrites"]:
+            print(f"  - {line}")
+        print(summary(report))
+
     # ------------------ Stage 2: Execute ------------------
     print("\n>> Executing...")
-    ex = Executor(input_file=args.input, segment=args.segment, music=args.music)
-    results = ex.execute(plan)
+    if args.conform:
+        results = ex.conform(plan)
+    elif args.parallel:
+        results = ex.execute_graph(plan)
+    else:
+        results = ex.execute(plan)
 
     # ------------------ Stage 3: Verify ------------------
     print("\n>> Verifying outputs...")
@@ -55,7 +111,21 @@ def main():
     # ------------------ Display final outputs ------------------
     print("\nResults Summary:")
     for r in results:
-        print(f"{r.step_id}: {r.status} → {r.outputs.get('file', '')}")
+        print(f"{r.step_id}: {r.status} → {r.outputs.get('file', '')}" + (" (cached)" if r.outputs.get("cached") else "")
+              + (" (unchanged)" if r.outputs.get("checkpoint") else ""))
+    for r in results:
+        m = r.metrics
+        if m:
+            print(f"  {r.step_id} {m['action']}: {m['wall_s']:.2f}s wall, "
+                  f"{(m['cpu_user_s'] or 0) + (m['cpu_sys_s'] or 0):.2f}s cpu"
+                  + (f", {m['fps']:.1f} fps" if m["fps"] else "") + f" ({m['cache']})")
+    if args.trace:
+        print(f"Trace: {metrics.write_chrome_trace(results, args.trace)}")
+    if args.metrics_csv:
+        print(f"Metrics: {metrics.write_csv(results, args.metrics_csv)}")
+    if cache:
+        st = cache.stats()
+        print(f"Render cache: {st['hits']} hits / {st['misses']} misses, {st['bytes'] / 1024**2:.1f} MiB stored")
 
     print("\nAll done!")
 
@@ -0,0 +1,151 @@
+"""
+Cuts a segment out of a clip once, frame-accurately but mostly without
+re-encoding.
+
+Between the first and the last keyframe inside the segment the video is
+stream-copied, whole GOPs at a time. Only the ragged edges, from the segment
+start to the first keyframe and from the last keyframe to the segment end,
+are decoded and re-encoded (near-losslessly, with the source's codec, so
+the parts join into one stream). The audio is stream-copied for the whole range.
+The edges are encoded with the source's pixel format, profile and level,
+so the joined stream has one set of parameters throughout. Sources without
+usable keyframe data, with a codec or profile we can't re-encode to (or
+whose edges fail to encode), or segments too short to contain a whole GOP
+fall back to one lossless re-encode of the segment.
+
+The Executor trims once up front and runs every step on the result, so
+steps see time relative to the segment start instead of each re-seeking
+the original with absolute timestamps.
+"""
+
+import os, shutil, tempfile
+from typing import Any, Dict, Optional
+from agent_demo import ffmpeg_adapter as fx
+from . import media_index
+
+# Per source codec: encoder for the re-encoded edges, and the bitstream
+# filter that puts the parameter sets of the stream-copied GOPs in-band, so
+# the decoder picks up each part's own when the parts are joined. The edges
+# are near-lossless rather than lossless: lossless h264 switches the stream
+# to the High 4:4:4 Predictive profile, and ffmpeg's decoder then misdecodes
+# the copied GOPs that follow.
+EDGE_CODECS = {
+    "h264": ("-c:v libx264 -preset fast -crf 10", "h264_mp4toannexb"),
+    "hevc": ("-c:v libx265 -preset fast -crf 10", "hevc_mp4toannexb"),
+}
+# ffmpeg's profile names (as probed) -> the edge encoder's -profile:v; the
+# edges must match the copied GOPs, so other profiles take the fallback
+EDGE_PROFILES = {
+    "h264": {"Constrained Baseline": "baseline", "Baseline": "baseline", "Main": "main", "High": "high",
+             "High 10": "high10", "High 4:2:2": "high422", "High 4:4:4 Predictive": "high444"},
+    "hevc": {"Main": "main", "Main 10": "main10"},
+}
+# Whole-segment fallback (same settings chunked.py uses for its segment cut)
+FALLBACK_VENC = "-c:v libx264 -preset ultrafast -qp 0"
+
+
+def trim_segment(input_file: str, out_file: str, segment: str) -> Dict[str, Any]:
+    """
+    Cut "start-end" out of input_file into out_file (matroska).
+
+    Args:
+        input_file: Input clip
+        out_file: Output file path
+        segment: Time segment, e.g. "00:00:03-00:00:07"
+
+    Returns:
+        Dict with execution status, the segment start in seconds ("offset")
+        and how many seconds of video were stream-copied ("copied_s")
+    """
+    start_ts, end_ts = segment.split("-")
+    start, end = fx.parse_timestamp(start_ts), fx.parse_timestamp(end_ts)
+    info = media_index.probe(input_file)
+    meta = {"code": 1, "log": "", "file": out_file, "offset": start, "copied_s": 0.0}
+    if not info or not info.has_video:
+        meta["log"] = f"could not probe video stream of {input_file}"
+        return meta
+
+    fps = info.fps or 30
+    open_end = info.duration is not None and end >= info.duration
+    t0 = info.keyframes[0] if info.keyframes else 0.0
+    # (time, frame number) of the keyframes inside the segment; the copied
+    # body runs from the first to the last of them (or to the end of the clip)
+    inner = [(k - t0, n) for k, n in zip(info.keyframes, info.keyframe_frames)
+             if start - 1e-3 <= k - t0 <= end]
+    codec = EDGE_CODECS.get(info.video_codec)
+    match = _edge_match(info)
+    if not codec or not match or len(inner) < (1 if open_end else 2):
+        return _reencode(input_file, out_file, segment, meta)
+    edge_venc, annexb = codec
+    edge_venc = f"{edge_venc} {match}"
+    (first, first_n), (last, last_n) = inner[0], inner[-1]
+
+    work = tempfile.mkdtemp(prefix=".trim_", dir=os.path.dirname(os.path.abspath(out_file)))
+    logs = []
+    try:
+        # (seek, frame count or None for "to the end", codec args) per part
+        parts = []
+        if round((first - start) * fps) > 0:
+            parts.append((start, round((first - start) * fps),
+                          f"{edge_venc} -bsf:v dump_extra=freq=keyframe"))
+        parts.append((first, None if open_end else last_n - first_n, f"-c:v copy -bsf:v {annexb}"))
+        if not open_end and round((end - last) * fps) > 0:
+            parts.append((last, round((end - last) * fps), f"{edge_venc} -bsf:v dump_extra=freq=keyframe"))
+
+        listing, audio = os.path.join(work, "parts.txt"), os.path.join(work, "audio.mka")
+        with open(listing, "w") as f:
+            for n, (seek, frames, venc) in enumerate(parts):
+                # mp4 keeps the copied GOPs' decode timestamps, so the concat stays monotonic
+                part = os.path.join(work, f"part_{n}.mp4")
+                count = f"-frames:v {frames} " if frames else ""
+                code, log = fx._run(f'{fx.FFMPEG} -y -ss {seek:.6f} -i "{input_file}" -map 0:v:0 '
+                                    f'{count}{venc} -an "{part}"')
+                logs.append(log)
+                if code != 0:
+                    if venc.startswith(edge_venc):
+                        # e.g. an encoder build without this bit depth: one consistent re-encode instead
+                        meta = _reencode(input_file, out_file, segment, meta)
+                        meta["log"] = "\n".join(logs + [meta["log"]])
+                        return meta
+                    meta.update(code=code, log="\n".join(logs))
+                    return meta
+                f.write(f"file '{part}'\n")
+        amap = ""
+        if info.has_audio:
+            # Output-side seek: a stream copy then drops the packets before the start
+            to = "" if open_end else f"-to {end:.6f} "
+            code, log = fx._run(f'{fx.FFMPEG} -y -i "{input_file}" -ss {start:.6f} {to}-map 0:a -c copy "{audio}"')
+            logs.append(log)
+            if code != 0:
+                meta.update(code=code, log="\n".join(logs))
+                return meta
+            amap = f'-i "{audio}" -map 1:a '
+
+        code, log = fx._run(f'{fx.FFMPEG} -y -f concat -safe 0 -i "{listing}" {amap}-map 0:v -c copy "{out_file}"')
+        logs.append(log)
+        copied = (info.duration - first) if open_end else (last - first)
+        meta.update(code=code, log="\n".join(logs), copied_s=copied)
+        return meta
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+# Edge encoder args matching the source stream (None if they can't be matched)
+def _edge_match(info: media_index.MediaInfo) -> Optional[str]:
+    stream = next((s for s in info.streams if s["type"] == "video"), {})
+    profile = EDGE_PROFILES.get(info.video_codec, {}).get(stream.get("profile"))
+    if not profile or not stream.get("pix_fmt"):
+        return None
+    args = f"-pix_fmt {stream['pix_fmt']} -profile:v {profile}"
+    level = stream.get("level")
+    if info.video_codec == "h264" and level and level > 0:
+        args += f" -level:v {level / 10:g}"  # 41 -> 4.1
+    return args
+
+
+def _reencode(input_file: str, out_file: str, segment: str, meta: Dict[str, Any]) -> Dict[str, Any]:
+    cmd = (f'{fx.FFMPEG} -y {fx._segment_filter(segment, input_file)}-i "{input_file}" -map 0:v:0 -map 0:a? '
+           f'{FALLBACK_VENC} -c:a copy "{out_file}"')
+    code, log = fx._run(cmd)
+    meta.update(code=code, log=log)
+    return meta
@@ -4,7 +4,7 @@ Think of this as the 'contract' between the planner, executor, and verifier.
 No external libraries — just clean dataclasses.
 """
 
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, asdict
 from typing import List, Dict, Any, Optional
 
 
@@ -23,6 +23,14 @@ class Step:
 class Plan:
     steps: List[Step]
 
+    # Plain-dict form, e.g. for saving a plan as JSON and running it again later
+    def to_dict(self) -> Dict[str, Any]:
+        return {"steps": [asdict(s) for s in self.steps]}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Plan":
+        return cls(steps=[Step(**s) for s in data.get("steps", [])])
+
 
 # Describes user intent and context
 @dataclass
@@ -40,3 +48,4 @@ class ExecResult:
     status: str                    # "ok" or "error"
     outputs: Dict[str, Any]        # anything the adapter returns (logs, file path)
     error: Optional[str] = None
+    metrics: Dict[str, Any] = field(default_factory=dict)  # timings and resource use (see metrics.py)
@@ -3,11 +3,33 @@ Checks whether each execution step produced a valid video file.
 
 If a step fails or produces an empty/invalid clip, the verifier flags it.
 Later, this can feed back into the Planner for automatic repair.
+
+check_output() goes past "the file exists": it compares the probed duration,
+frame count and stream layout of a step's output with the file the step
+read, and decodes a few sampled frames (tiny grayscale, one seek each) to
+catch black or frozen video with NumPy. Black and frozen are judged against
+the input's samples too, so a step that keeps a dark or static shot as it
+was isn't flagged. Without numpy the frame checks are skipped.
+
+StepVerifier runs those checks in background threads: the Executor hands
+it each stage's outputs and renders the next stage meanwhile, and stops
+the chain at the first stage boundary after a check failed.
 """
 
-import os
-from typing import List
+import os, subprocess, threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Tuple
 from .types import ExecResult
+from . import lut, media_index
+from agent_demo import ffmpeg_adapter as fx
+
+SAMPLE_FRAMES = 5
+SAMPLE_SIZE = (64, 36)    # sampled frames are scaled to this and converted to gray
+BLACK_LUMA = 16           # mean luma (0-255) under which a frame counts as black
+FROZEN_DIFF = 0.5         # mean abs luma difference between samples under which video is frozen
+DURATION_TOLERANCE_S = 0.25
+FRAME_TOLERANCE = 0.02    # relative frame count mismatch allowed (plus two frames)
+
 
 def verify(results: List[ExecResult], min_duration: float = 0.5):
     ok = True
@@ -21,4 +43,175 @@ def verify(results: List[ExecResult], min_duration: float = 0.5):
         if not f or not os.path.exists(f):
             ok = False
             issues.append((r.step_id, "output file missing"))
+            continue
+        # Probe data is cached, so checking every step costs one ffprobe per file
+        info = media_index.probe(f)
+        if info and info.duration is not None and info.duration < min_duration:
+            ok = False
+            issues.append((r.step_id, f"output too short ({info.duration:.2f}s < {min_duration}s)"))
     return ok, issues
+
+
+# --------------------------------------
+# Deep checks
+# --------------------------------------
+_samples: Dict[Tuple[str, int, int], object] = {}  # (path, size, mtime) -> sampled frames or None
+_samples_lock = threading.Lock()
+
+
+def sample_frames(path: str, duration: float, n: int = SAMPLE_FRAMES):
+    """
+    n evenly spaced frames of path as a uint8 (frames, h, w) luma array.
+
+    Every sample is its own input seek, so only the GOPs around the sample
+    points are decoded. Results are memoized per file version: a step's
+    output is sampled once, as output and again as the next step's input.
+
+    Returns:
+        The frames (fewer than n if the decode ended early); None if
+        nothing decoded or numpy is missing
+    """
+    try:
+        np = lut._np()
+    except RuntimeError:
+        return None
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _samples_lock:
+        if key in _samples:
+            return _samples[key]
+    w, h = SAMPLE_SIZE
+    cmd, chains = [fx.FFMPEG, "-v", "error", "-nostdin"], []
+    for k in range(n):
+        cmd += ["-threads", "1", "-ss", f"{duration * (k + 0.5) / n:.3f}", "-i", path]
+        chains.append(f"[{k}:v:0]trim=end_frame=1,scale={w}:{h},format=gray[s{k}]")
+    # One frame per second of output, so no sample is dropped as a duplicate
+    graph = ";".join(chains) + ";" + "".join(f"[s{k}]" for k in range(n)) + f"concat=n={n}:v=1:a=0,setpts=N/TB[out]"
+    cmd += ["-filter_complex", graph, "-filter_threads", "1", "-map", "[out]", "-fps_mode", "passthrough",
+            "-f", "rawvideo", "-"]
+    proc = subprocess.run(cmd, capture_output=True)
+    frames = None
+    if proc.returncode == 0 and len(proc.stdout) >= w * h:
+        data = np.frombuffer(proc.stdout[:len(proc.stdout) // (w * h) * w * h], dtype=np.uint8)
+        frames = data.reshape(-1, h, w)
+    with _samples_lock:
+        _samples[key] = frames
+    return frames
+
+
+def frame_stats(frames) -> Dict[str, float]:
+    """Mean luma of the brightest sample and the largest change between consecutive samples."""
+    f = frames.astype("float32")
+    motion = float(abs(f[1:] - f[:-1]).mean(axis=(1, 2)).max()) if len(f) > 1 else None
+    return {"luma": float(f.mean(axis=(1, 2)).max()), "motion": motion}
+
+
+def check_output(path: str, src: str = None, audio: bool = None, samples: int = SAMPLE_FRAMES,
+                 min_duration: float = 0.5) -> List[str]:
+    """
+    Problems with one step output (empty if none).
+
+    Args:
+        path: The output
+        src: The file the step read; its duration, frame count, streams
+            and frames are what the output is expected to match
+        audio: Whether the output must carry audio (default: if src does)
+        samples: Frames decoded for the black / frozen checks (0 to skip)
+        min_duration: Shortest acceptable output
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return ["output file missing or empty"]
+    info = media_index.probe(path)
+    if not info:
+        return ["output can't be probed (corrupt or truncated)"]
+    ref = media_index.probe(src) if src else None
+    issues = []
+    if info.duration is None or info.duration < min_duration:
+        issues.append(f"output too short ({info.duration or 0:.2f}s < {min_duration}s)")
+    if ref:
+        if ref.has_video and not info.has_video:
+            issues.append("video stream missing")
+        if (ref.has_audio if audio is None else audio) and not info.has_audio:
+            issues.append("audio stream missing")
+        if info.duration and ref.duration and ref.fps:
+            tolerance = max(DURATION_TOLERANCE_S, 2 / ref.fps)
+            if abs(info.duration - ref.duration) > tolerance:
+                issues.append(f"duration {info.duration:.2f}s, expected {ref.duration:.2f}s")
+        if info.frame_count is not None and ref.frame_count and ref.fps and info.fps:
+            expected = ref.frame_count * info.fps / ref.fps
+            if abs(info.frame_count - expected) > expected * FRAME_TOLERANCE + 2:
+                issues.append(f"{info.frame_count} frames, expected {expected:.0f}")
+    if issues or not samples or not info.has_video:
+        return issues
+
+    frames = sample_frames(path, info.duration, samples)
+    if frames is None:
+        return issues if not lut.available() else issues + ["sampled frames could not be decoded"]
+    if len(frames) < samples:
+        issues.append(f"only {len(frames)} of {samples} sampled frames decoded")
+    out = frame_stats(frames)
+    before = None
+    if ref and ref.has_video and ref.duration:
+        src_frames = sample_frames(src, ref.duration, samples)
+        before = frame_stats(src_frames) if src_frames is not None else None
+    if out["luma"] < BLACK_LUMA and not (before and before["luma"] < BLACK_LUMA):
+        issues.append(f"output is black (mean luma {out['luma']:.0f})")
+    elif out["motion"] is not None and out["motion"] < FROZEN_DIFF and \
+            not (before and before["motion"] is not None and before["motion"] < FROZEN_DIFF):
+        issues.append("output is frozen (sampled frames identical)")
+    return issues
+
+
+class StepVerifier:
+    """
+    Checks stage outputs in background threads while later stages render.
+
+    submit() queues the checks of one stage (its output and every preview
+    rendition, each checked concurrently); failed() reports, without
+    waiting, the stages whose checks already failed; wait() blocks
+    until every check is done and records each stage's issues in its
+    results (outputs["checks"]), failing the stage if there are any.
+    """
+
+    def __init__(self, workers: int = 2, samples: int = SAMPLE_FRAMES, min_duration: float = 0.5):
+        self.samples, self.min_duration = samples, min_duration
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="verify")
+        self._stages: List[Tuple[List[ExecResult], List[Future]]] = []
+
+    def submit(self, results: List[ExecResult], src: str, audio: bool = None):
+        last = results[-1]
+        if last.status != "ok" or not last.outputs.get("file"):
+            return  # nothing to check: the stage already failed
+        files = [last.outputs["file"]] + list((last.outputs.get("renditions") or {}).values())
+        futures = [self._pool.submit(check_output, f, src, audio, self.samples, self.min_duration)
+                   for f in dict.fromkeys(files)]
+        self._stages.append((results, futures))
+
+    @staticmethod
+    def _issues(future: Future) -> List[str]:
+        # A check that crashed (file gone, ffprobe failing, ...) is an issue, not an abort
+        try:
+            return future.result()
+        except Exception as e:
+            return [f"check failed: {type(e).__name__}: {e}"]
+
+    def failed(self) -> List[List[ExecResult]]:
+        return [results for results, futures in self._stages
+                if any(f.done() and self._issues(f) for f in futures)]
+
+    def wait(self) -> List[List[ExecResult]]:
+        """Record every stage's checks and return the stages that failed them."""
+        failed = []
+        for results, futures in self._stages:
+            issues = [i for f in futures for i in self._issues(f)]
+            for r in results:
+                r.outputs["checks"] = issues
+                if issues and r.status == "ok":
+                    r.status, r.error = "error", f"verification failed: {'; '.join(issues)}"
+            if issues:
+                failed.append(results)
+        self._stages = []
+        return failed
+
+    def close(self):
+        self._pool.shutdown(wait=True)
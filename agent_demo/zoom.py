@@ -0,0 +1,147 @@
+"""
+Native keyframe zoom engine.
+
+Precomputes the zoom factor of every frame once, with the same ramp that
+zoompan evaluates per frame (see ffmpeg_adapter._zoom_vf) at the clip's
+probed frame rate, and applies it to raw RGB frames streamed through Python
+(see frame_pipe.py) as a separable bilinear resample of the top-left 1/z of
+the frame.
+
+zoompan crops a whole number of pixels per frame, so a slow zoom advances in
+visible one-pixel steps. The resample here maps every output pixel onto the
+exact fractional crop, so the zoom is smooth. Tap indices and weights are
+fixed-point, so a frame costs two gathers and a few uint16 multiply-adds.
+
+NumPy is optional: it is imported on first use. add_keyframe_zoom() routes
+here with engine="numpy".
+"""
+
+import math
+from typing import Any, Dict, List, Tuple
+from agent_demo import ffmpeg_adapter as fx
+from .frame_pipe import process_frames
+from .lut import _np
+from . import media_index
+
+ZOOM_MIN, ZOOM_MAX = 1.0, 10.0  # zoompan clamps its zoom factor to this range
+
+
+def zoom_schedule(from_scale: float, to_scale: float, duration_s: float, fps: float,
+                  count: int, start: int = 0) -> List[float]:
+    """
+    Zoom factor of frames start .. start+count-1, exactly as zoompan ramps it.
+
+    Args:
+        from_scale, to_scale, duration_s: The add_keyframe_zoom params
+        fps: Frame rate the ramp is timed against (the clip's real one)
+        count: Number of frames
+        start: Index of the first frame (a chunk's frame offset)
+
+    Returns:
+        One factor per frame, clamped to [ZOOM_MIN, ZOOM_MAX]
+    """
+    frames = max(1, int(duration_s * fps))
+    zs = []
+    for on in range(start, start + count):
+        z = from_scale if on == 1 else from_scale + (to_scale - from_scale) * (on - 1) / frames
+        zs.append(min(max(z, ZOOM_MIN), ZOOM_MAX))
+    return zs
+
+
+# Bilinear taps of one axis: n_out output pixels sampling [0, crop) of n_in
+# source pixels. Weights are in 1/256ths; with channels > 1 the indices
+# address an interleaved row (RGBRGB...) directly
+def _taps(crop: float, n_in: int, n_out: int, channels: int = 1):
+    np = _np()
+    s = (np.arange(n_out) + 0.5) * (crop / n_out) - 0.5
+    np.clip(s, 0, n_in - 1, out=s)
+    i0 = s.astype(np.intp)
+    i1 = np.minimum(i0 + 1, n_in - 1)
+    w = np.round((s - i0) * 256).astype(np.uint16)
+    if channels > 1:
+        c = np.arange(channels)
+        i0, i1 = (i0[:, None] * channels + c).ravel(), (i1[:, None] * channels + c).ravel()
+        w = np.repeat(w, channels)
+    return i0, i1, w
+
+
+def zoom_frame(frame, z: float, size: Tuple[int, int] = None):
+    """
+    Zoom one (height, width, 3) uint8 frame by z into its top-left corner.
+
+    Args:
+        frame: Source frame
+        z: Zoom factor (>= 1)
+        size: Output (width, height); defaults to the frame's own
+
+    Returns:
+        The zoomed (height, width, 3) uint8 frame
+    """
+    np = _np()
+    h, w = frame.shape[:2]
+    ow, oh = size or (w, h)
+    if z == 1.0 and (ow, oh) == (w, h):
+        return frame
+    x0, x1, wx = _taps(w / z, w, ow, 3)
+    y0, y1, wy = _taps(h / z, h, oh)
+    rows = frame[:y1[-1] + 1].reshape(-1, w * 3)  # only the rows the crop reaches
+    # Horizontal pass, rounded back to 8 bits: 255 * 256 + 128 fits in uint16
+    tmp = np.take(rows, x0, axis=1).astype(np.uint16)
+    tmp *= 256 - wx
+    tmp += np.take(rows, x1, axis=1) * wx
+    tmp += 128
+    tmp >>= 8
+    # Vertical pass
+    wy = wy[:, None]
+    out = np.take(tmp, y0, axis=0) * (256 - wy)
+    out += np.take(tmp, y1, axis=0) * wy
+    out += 128
+    out >>= 8
+    return out.astype(np.uint8).reshape(oh, ow, 3)
+
+
+# --------------------------------------
+# Drop-in for ffmpeg_adapter.add_keyframe_zoom
+# --------------------------------------
+def apply_zoom_file(input_file: str, out_file: str, from_scale: float, to_scale: float,
+                    duration_s: float, segment: str = None, fps: float = None,
+                    size: str = None, venc: str = None) -> Dict[str, Any]:
+    """
+    Zoom a clip in-process, streaming the frames through NumPy.
+
+    Args:
+        input_file: Input clip
+        out_file: Output file path
+        from_scale, to_scale, duration_s: Zoom ramp, as for add_keyframe_zoom()
+        segment: Optional time segment
+        fps: Frame rate the ramp is timed against (default: the clip's)
+        size: Output frame size "WxH" (default: the clip's)
+        venc: Optional encoder args
+
+    Returns:
+        Dict with execution status
+    """
+    try:
+        _np()
+    except RuntimeError as e:
+        return {"code": 1, "log": str(e), "file": out_file}
+    info = media_index.probe(input_file)
+    if not info or not info.width:
+        return {"code": 1, "log": f"could not probe video stream of {input_file}", "file": out_file}
+    fps = fps or info.fps or 30
+    out_size = tuple(int(v) for v in size.split("x")) if size else (info.width, info.height)
+    # The whole schedule up front; extended should the clip run longer than probed
+    if segment:
+        count = int(fx.segment_seconds(segment) * fps) + 1
+    else:
+        count = info.frame_count or int((info.duration or 0) * fps) + 1
+    schedule = zoom_schedule(from_scale, to_scale, duration_s, fps, count)
+
+    def zoom(frame, n):
+        if n >= len(schedule):
+            schedule.extend(zoom_schedule(from_scale, to_scale, duration_s, fps,
+                                          max(n + 1 - len(schedule), math.ceil(fps)), len(schedule)))
+        return zoom_frame(frame, schedule[n], out_size)
+
+    return process_frames(input_file, out_file, zoom, segment=segment, venc=venc,
+                          size="x".join(map(str, out_size)))
@@ -7,6 +7,7 @@ This demonstrates the AI-powered SLOG3 to Rec709 conversion feature
 import sys
 from agent_demo.types import TaskSpec, Plan, Step
 from agent_demo.executor import Executor
+from agent_demo.render_cache import RenderCache
 from agent_demo.verifier import verify
 
 def main():
@@ -64,7 +65,9 @@ def main():
     print("=" * 60 + "\n")
     
     # Execute the plan
-    executor = Executor(input_file=input_file, segment=segment, out_dir="outputs")
+    # Re-running on the same footage reuses finished renders from .render_cache/
+    cache = RenderCache()
+    executor = Executor(input_file=input_file, segment=segment, out_dir="outputs", cache=cache)
     results = executor.execute(plan)
     
     print("\n" + "=" * 60)
@@ -90,7 +93,7 @@ def main():
         status_icon = "✅" if result.status == "ok" else "❌"
         print(f"{status_icon} {result.step_id}: {result.status}")
         if "file" in result.outputs:
-            print(f"   File: {result.outputs['file']}")
+            print(f"   File: {result.outputs['file']}" + (" (cached)" if result.outputs.get("cached") else ""))
     
     print("\n" + "=" * 60)
     print("🎬 Done!")